@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Lag del event loop con escrituras concurrentes: Session síncrona vs AsyncSession.
+Ejecutar: python benchmarks/db_event_loop_lag.py [--writers 20] [--writes 50] [--url sqlite:///...]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from core.database import Base, Trade, to_async_url
+
+
+async def probe(samples: list, stop: asyncio.Event, interval: float = 0.001):
+    """Medir cuánto tarda el loop en despertar un sleep de ``interval``"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append((time.perf_counter() - start - interval) * 1000)
+
+
+def make_trade(writer: int, i: int) -> Trade:
+    return Trade(
+        order_id=f"bench-{writer}-{i}-{time.perf_counter_ns()}",
+        exchange="bench",
+        symbol="BTC/USDT",
+        side="buy",
+        type="limit",
+        amount=0.001,
+        price=50000.0,
+        status="open"
+    )
+
+
+async def sync_writer(session_factory, writer: int, writes: int):
+    # Lo que hacían los endpoints: db.add + db.commit dentro de un async def
+    for i in range(writes):
+        db = session_factory()
+        try:
+            db.add(make_trade(writer, i))
+            db.commit()
+        finally:
+            db.close()
+        await asyncio.sleep(0)
+
+
+async def async_writer(session_factory, writer: int, writes: int):
+    for i in range(writes):
+        async with session_factory() as db:
+            db.add(make_trade(writer, i))
+            await db.commit()
+
+
+async def run(name: str, writer, session_factory, writers: int, writes: int) -> dict:
+    samples: list = []
+    stop = asyncio.Event()
+    probe_task = asyncio.create_task(probe(samples, stop))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(writer(session_factory, w, writes) for w in range(writers)))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await probe_task
+
+    samples.sort()
+    return {
+        "mode": name,
+        "writes/s": writers * writes / elapsed,
+        "lag p50 ms": statistics.median(samples) if samples else 0.0,
+        "lag p99 ms": samples[int(len(samples) * 0.99) - 1] if samples else 0.0,
+        "lag max ms": samples[-1] if samples else 0.0,
+        "probes": len(samples)
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--writers", type=int, default=20)
+    parser.add_argument("--writes", type=int, default=50)
+    parser.add_argument("--url", default=None, help="URL síncrona (por defecto un SQLite temporal)")
+    args = parser.parse_args()
+
+    tmpdir = None
+    url = args.url
+    if url is None:
+        tmpdir = tempfile.TemporaryDirectory()
+        url = f"sqlite:///{os.path.join(tmpdir.name, 'bench.db')}"
+
+    sync_engine = create_engine(url)
+    Base.metadata.create_all(bind=sync_engine)
+    async_engine = create_async_engine(to_async_url(url))
+
+    results = [
+        await run("sync Session", sync_writer, sessionmaker(bind=sync_engine), args.writers, args.writes),
+        await run("AsyncSession", async_writer,
+                  async_sessionmaker(async_engine, expire_on_commit=False), args.writers, args.writes),
+    ]
+
+    print(f"{args.writers} writers x {args.writes} commits ({url.split('://')[0]})")
+    print(f"{'mode':<14}{'writes/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}{'probes':>8}")
+    for r in results:
+        print(f"{r['mode']:<14}{r['writes/s']:>10.0f}{r['lag p50 ms']:>10.2f}"
+              f"{r['lag p99 ms']:>10.2f}{r['lag max ms']:>10.2f}{r['probes']:>8}")
+
+    await async_engine.dispose()
+    sync_engine.dispose()
+    if tmpdir:
+        tmpdir.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
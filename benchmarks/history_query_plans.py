@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Verifica que las consultas keyset del historial usan los índices compuestos
+y compara OFFSET vs cursor en páginas profundas (SQLite temporal).
+Ejecutar: python benchmarks/history_query_plans.py [--rows 200000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert, select, text
+from core.database import Base, CircuitBreakerEvent, Trade
+from core.repository import encode_cursor, keyset_query
+
+TRADE_COLUMNS = ("id", "exchange", "symbol", "side", "amount", "price", "timestamp")
+BREAKER_COLUMNS = ("id", "timestamp", "breaker_type", "trigger_value")
+
+
+def query_plan(conn, query) -> str:
+    compiled = query.compile(conn, compile_kwargs={"literal_binds": True})
+    return " | ".join(row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {compiled}")))
+
+
+def seed(conn, rows: int):
+    start = datetime(2025, 1, 1)
+    exchanges = ["binance", "kucoin", "okx", "bybit"]
+    symbols = ["BTC/USDT", "ETH/USDT", "SOL/USDT", "BNB/USDT", "ADA/USDT"]
+    conn.execute(insert(Trade), [
+        {
+            "order_id": f"o{i}",
+            "exchange": random.choice(exchanges),
+            "symbol": random.choice(symbols),
+            "side": "buy" if i % 2 else "sell",
+            "type": "limit",
+            "amount": 0.01,
+            "price": 50000.0,
+            "status": "filled",
+            "timestamp": start + timedelta(seconds=i)
+        }
+        for i in range(rows)
+    ])
+    conn.execute(insert(CircuitBreakerEvent), [
+        {
+            "timestamp": start + timedelta(seconds=i * 10),
+            "exchange": random.choice(exchanges),
+            "breaker_type": random.choice(["latency", "spread", "depth", "volatility"]),
+            "trigger_value": 1.0,
+            "threshold": 0.5,
+            "duration_seconds": 0,
+            "is_resolved": True
+        }
+        for i in range(rows // 10)
+    ])
+
+
+def timed(conn, query, repeat: int = 20) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        conn.execute(query).all()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        engine = create_engine(f"sqlite:///{os.path.join(tmpdir, 'plans.db')}")
+        Base.metadata.create_all(bind=engine)
+
+        failures = 0
+        with engine.begin() as conn:
+            seed(conn, args.rows)
+            conn.execute(text("ANALYZE"))
+
+            cursor = encode_cursor(datetime(2025, 1, 1) + timedelta(seconds=args.rows // 2), args.rows // 2)
+            checks = [
+                ("trades exchange+symbol", keyset_query(Trade, TRADE_COLUMNS, 100, cursor,
+                                                        exchange="binance", symbol="BTC/USDT"),
+                 "ix_trades_exchange_symbol_timestamp"),
+                ("breakers by type", keyset_query(CircuitBreakerEvent, BREAKER_COLUMNS, 50, cursor,
+                                                  breaker_type="spread"),
+                 "ix_circuit_breaker_events_type_timestamp"),
+            ]
+
+            for name, query, index in checks:
+                plan = query_plan(conn, query)
+                ok = index in plan and "TEMP B-TREE" not in plan
+                failures += not ok
+                print(f"{'OK  ' if ok else 'FAIL'} {name}: {plan}")
+
+            # Página profunda: OFFSET recorre y descarta, el cursor salta directo
+            offset_query = (
+                select(*(getattr(Trade, c) for c in TRADE_COLUMNS))
+                .order_by(Trade.timestamp.desc(), Trade.id.desc())
+                .offset(args.rows // 2).limit(100)
+            )
+            keyset = keyset_query(Trade, TRADE_COLUMNS, 100, cursor)
+            print(f"deep page OFFSET {args.rows // 2}: {timed(conn, offset_query):.2f} ms")
+            print(f"deep page cursor: {timed(conn, keyset):.2f} ms")
+
+        engine.dispose()
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Coste de importación (python -X importtime) y efectos secundarios al importar.
+Ejecutar: python benchmarks/import_time.py [--runs 7] [--budget main_v2=1.6]
+
+Cada módulo se importa en un intérprete limpio, alternando con una importación
+de referencia (numpy, sqlalchemy.orm y fastapi, que el proyecto no puede
+evitar). El presupuesto es relativo a esa referencia medida en la misma
+máquina y en el mismo momento, así que no depende de lo rápida o cargada que
+esté. Falla (exit 1) si la mediana del cociente supera su presupuesto, si
+arrastra un módulo que debe cargarse bajo demanda (ccxt) o si importar crea
+logs/ o modifica la base SQLite.
+"""
+
+import argparse
+import hashlib
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Importación de referencia: dependencias de terceros que el proyecto siempre carga
+REFERENCE = "numpy, sqlalchemy.orm, fastapi"
+
+# módulo -> presupuesto como múltiplo de la referencia (mediana de --runs del
+# cociente entre tiempos acumulados de -X importtime medidos por parejas)
+BUDGETS = {
+    "core.logger": 0.1,
+    "core.database": 1.0,
+    "exchanges.exchange_factory": 0.3,
+    "exchanges.multi_exchange_manager": 0.5,
+    "main_v2": 1.6,
+}
+
+# Módulos que ninguna importación debe cargar: ccxt al crear el primer cliente,
+# aiohttp al enviar la primera alerta
+FORBIDDEN = ("ccxt", "ccxt.async_support", "ccxt.pro", "aiohttp")
+
+# main_v2 construye la app al importarse (create_app registra la carga de config)
+LOGS_ALLOWED = {"main_v2"}
+
+MARKER = "FORBIDDEN:"
+
+
+def import_profile(module: str, cwd: str) -> dict:
+    """
+    Importar ``module`` (o varios separados por comas) en un intérprete nuevo
+    y parsear -X importtime
+    """
+    code = (
+        f"import sys, {module}\n"
+        f"print({MARKER!r} + ','.join(name for name in {FORBIDDEN!r} if name in sys.modules))"
+    )
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=cwd, env=env, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+
+    # Formato: "import time: self [us] | cumulative | imported package"
+    # (los anidados van indentados; los de primer nivel llevan un solo espacio)
+    entries = []
+    top_level = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        entries.append((name.strip(), int(self_us), int(cumulative_us)))
+        if not name.startswith("  "):
+            top_level[name.strip()] = int(cumulative_us)
+
+    total_us = sum(top_level.get(name.strip(), 0) for name in module.split(","))
+    heaviest = sorted(entries, key=lambda entry: entry[1], reverse=True)[:5]
+    marker = next(line for line in proc.stdout.splitlines() if line.startswith(MARKER))
+    forbidden = [name for name in marker[len(MARKER):].split(",") if name]
+    return {"total_ms": total_us / 1000, "heaviest": heaviest, "forbidden": forbidden}
+
+
+def digest(path: str) -> str:
+    if not os.path.exists(path):
+        return ""
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--budget", action="append", default=[], metavar="MODULE=RATIO",
+                        help="sobrescribir el presupuesto (múltiplo de la referencia) de un módulo")
+    args = parser.parse_args()
+
+    budgets = dict(BUDGETS)
+    for override in args.budget:
+        module, value = override.split("=", 1)
+        budgets[module] = float(value)
+
+    failures = []
+    db_path = os.path.join(ROOT, "marketmaker.db")
+    db_before = digest(db_path)
+
+    print(f"{'module':<34} {'median ms':>10} {'ref ms':>8} {'ratio':>6} {'budget':>6}  heaviest self-time imports")
+    for module, budget in budgets.items():
+        # Directorio de trabajo limpio con la config enlazada: los efectos en disco se ven ahí
+        with tempfile.TemporaryDirectory() as cwd:
+            for name in ("config.json", "secrets.json", "config"):
+                if os.path.exists(os.path.join(ROOT, name)):
+                    os.symlink(os.path.join(ROOT, name), os.path.join(cwd, name))
+
+            # Por parejas: la referencia ve la misma carga de máquina que el módulo
+            profiles, references = [], []
+            for _ in range(args.runs):
+                references.append(import_profile(REFERENCE, cwd)["total_ms"])
+                profiles.append(import_profile(module, cwd))
+            ratios = sorted(profile["total_ms"] / reference
+                            for profile, reference in zip(profiles, references) if reference)
+            ratio = ratios[len(ratios) // 2] if ratios else 0.0
+            median = sorted(profile["total_ms"] for profile in profiles)[len(profiles) // 2]
+            reference = sorted(references)[len(references) // 2]
+            heaviest = ", ".join(f"{name} {self_us / 1000:.1f}" for name, self_us, _ in profiles[-1]["heaviest"][:3])
+            print(f"{module:<34} {median:>10.1f} {reference:>8.1f} {ratio:>6.2f} {budget:>6.2f}  {heaviest}")
+
+            if ratio > budget:
+                failures.append(f"{module}: {ratio:.2f}x reference ({median:.1f} ms) > {budget:.2f}x")
+            if profiles[-1]["forbidden"]:
+                failures.append(f"{module} imports {', '.join(profiles[-1]['forbidden'])} eagerly")
+            if module not in LOGS_ALLOWED and os.path.exists(os.path.join(cwd, "logs")):
+                failures.append(f"{module} created logs/ at import (file handlers must open lazily)")
+            if os.path.exists(os.path.join(cwd, "marketmaker.db")):
+                failures.append(f"{module} created the database at import (init_db belongs to startup)")
+
+    if digest(db_path) != db_before:
+        failures.append("importing modified marketmaker.db (init_db belongs to startup)")
+
+    if failures:
+        print("\nFAIL")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+    print("\nOK")
+
+
+if __name__ == "__main__":
+    main()
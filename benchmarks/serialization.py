@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Coste de serialización de respuestas en µs/KB: jsonable_encoder + json vs orjson vs msgpack, compresión y bytes cacheados.
+Ejecutar: python benchmarks/serialization.py [--markets 1500] [--trades 1000] [--repeat 20]
+
+msgpack y brotli solo se miden si están instalados.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from core import responses
+from core.responses import JSON_MEDIA_TYPE, MSGPACK_MEDIA_TYPE, ResponseEncoder, dumps_json
+
+
+def market_payload(n: int) -> dict:
+    """Forma de /api/v1/kucoin/markets: mercados ccxt con su ``info`` crudo"""
+    markets = []
+    for i in range(n):
+        base = f"C{i:04d}"
+        markets.append({
+            "id": f"{base}-USDT", "symbol": f"{base}/USDT", "base": base, "quote": "USDT",
+            "settle": None, "type": "spot", "spot": True, "margin": i % 3 == 0, "swap": False,
+            "future": False, "option": False, "active": i % 10 != 0, "contract": False,
+            "linear": None, "inverse": None, "taker": 0.001, "maker": 0.001, "contractSize": None,
+            "expiry": None, "expiryDatetime": None, "strike": None, "optionType": None,
+            "precision": {"amount": 0.0001, "price": 1e-06},
+            "limits": {"leverage": {"min": None, "max": None}, "amount": {"min": 0.1, "max": 10000000.0},
+                       "price": {"min": None, "max": None}, "cost": {"min": 0.1, "max": 99999999.0}},
+            "info": {"symbol": f"{base}-USDT", "name": f"{base}-USDT", "baseCurrency": base,
+                     "quoteCurrency": "USDT", "feeCurrency": "USDT", "market": "USDS",
+                     "baseMinSize": "0.1", "quoteMinSize": "0.1", "baseMaxSize": "10000000000",
+                     "quoteMaxSize": "99999999", "baseIncrement": "0.0001", "quoteIncrement": "0.000001",
+                     "priceIncrement": "0.000001", "priceLimitRate": "0.1", "minFunds": "0.1",
+                     "isMarginEnabled": i % 3 == 0, "enableTrading": i % 10 != 0},
+        })
+    return {"success": True, "exchange": "kucoin", "total_markets": n, "markets": markets,
+            "timestamp": datetime.utcnow().isoformat()}
+
+
+def trade_rows(n: int) -> list:
+    """Forma de /api/v1/history/trades (datetime sin convertir)"""
+    start = datetime(2024, 1, 1)
+    return [
+        {"id": i, "order_id": f"ord-{i}", "exchange": "kucoin", "symbol": "BTC/USDT",
+         "side": "buy" if i % 2 else "sell", "type": "limit", "amount": 0.001 * (i % 7 + 1),
+         "price": 42000.0 + i % 500, "filled": 0.001, "fee": 0.0001, "pnl": None,
+         "status": "closed", "timestamp": start + timedelta(seconds=i)}
+        for i in range(n)
+    ]
+
+
+def stdlib_json(content) -> bytes:
+    # Camino por defecto de FastAPI: jsonable_encoder + JSONResponse.render
+    return json.dumps(jsonable_encoder(content), ensure_ascii=False, allow_nan=False,
+                      indent=None, separators=(",", ":")).encode("utf-8")
+
+
+class FakeRequest:
+    def __init__(self, accept: str = "", accept_encoding: str = ""):
+        self.headers = {"accept": accept, "accept-encoding": accept_encoding}
+
+
+def measure(fn, repeat: int) -> float:
+    fn()  # calentar
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--markets", type=int, default=1500)
+    parser.add_argument("--trades", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    encoder = ResponseEncoder({})
+    payloads = {"markets": market_payload(args.markets), "trades": trade_rows(args.trades)}
+
+    print(f"json: {'orjson' if responses.orjson else 'stdlib'}, "
+          f"msgpack: {bool(responses.msgpack)}, brotli: {bool(responses.brotli)}\n")
+    print(f"{'payload':<9} {'case':<28} {'out KB':>9} {'µs/call':>10} {'µs/KB':>8}")
+
+    for name, content in payloads.items():
+        json_kb = len(dumps_json(content)) / 1024
+        raw = dumps_json(content)
+
+        cases = [
+            ("jsonable_encoder + json", lambda: stdlib_json(content)),
+            ("dumps_json", lambda: dumps_json(content)),
+        ]
+        if responses.msgpack:
+            cases.append(("msgpack", lambda: encoder.serialize(content, MSGPACK_MEDIA_TYPE)))
+        cases.append(("gzip (json ya serializado)", lambda: encoder.compress(raw, "gzip")[0]))
+        if responses.brotli:
+            cases.append(("brotli (json ya serializado)", lambda: encoder.compress(raw, "br")[0]))
+
+        request = FakeRequest(accept=JSON_MEDIA_TYPE, accept_encoding="gzip")
+
+        async def build():
+            return content
+
+        async def cached():
+            return await encoder.cached(request, name, build, ttl=3600)
+
+        loop = asyncio.new_event_loop()
+        cases.append(("cached bytes (gzip)", lambda: loop.run_until_complete(cached()).body))
+
+        for case, fn in cases:
+            out_kb = len(fn()) / 1024
+            micros = measure(fn, args.repeat)
+            # µs por KB de JSON de entrada: comparable entre codecs y con la compresión
+            print(f"{name:<9} {case:<28} {out_kb:>9.1f} {micros:>10.1f} {micros / json_kb:>8.2f}")
+        loop.close()
+        print()
+
+
+if __name__ == "__main__":
+    main()
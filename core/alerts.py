@@ -2,12 +2,13 @@
 Sistema de alertas para MarketMaker Pro
 """
 
-import aiohttp
 import asyncio
+import time
 from typing import Dict, Any, Optional
 from enum import Enum
 from datetime import datetime
 from core.logger import get_logger
+from core.telemetry import telemetry
 
 logger = get_logger("alerts", "alerts.log")
 
@@ -37,6 +38,7 @@ class AlertManager:
         self.alerts_sent = 0
         self.alerts_throttled = 0
         self.alerts_failed = 0
+        self._telegram_metrics = telemetry.alert_channel("telegram")
         
         logger.info(f"Alert Manager initialized (enabled: {self.enabled}, min_level: {self.min_level.value})")
     
@@ -103,7 +105,11 @@ class AlertManager:
         success = False
         
         if self.telegram_config.get("bot_token") and self.telegram_config.get("chat_id"):
+            start = time.perf_counter()
             success = await self._send_telegram(formatted_message)
+            self._telegram_metrics.latency.observe(time.perf_counter() - start)
+            if not success:
+                self._telegram_metrics.errors.inc()
         
         # Actualizar estadísticas
         if success:
@@ -127,6 +133,9 @@ class AlertManager:
             "disable_web_page_preview": True
         }
         
+        # aiohttp solo se carga si hay alertas que enviar (~150 ms de import)
+        import aiohttp
+        
         try:
             async with aiohttp.ClientSession() as session:
                 async with session.post(url, json=payload, timeout=aiohttp.ClientTimeout(total=10)) as response:
@@ -291,6 +300,22 @@ class AlertManager:
             alert_key=f"risk_limit_{limit_type}"
         )
     
+    async def alert_funding_threshold(self, symbol: str, exchange: str,
+                                      rate_bps: float, threshold_bps: float):
+        """Alerta de funding rate fuera de umbral"""
+        await self.send_alert(
+            f"💸 Funding Rate Threshold Crossed\n\n"
+            f"Symbol: **{symbol}**\n"
+            f"Rate: `{rate_bps:.2f} bps` (threshold: `±{threshold_bps:.2f} bps`)",
+            AlertLevel.WARNING,
+            metadata={
+                "Exchange": exchange,
+                "Symbol": symbol,
+                "Rate (bps)": f"{rate_bps:.2f}"
+            },
+            alert_key=f"funding_{symbol}_{exchange}"
+        )
+    
     async def alert_system_error(self, error_message: str, exchange: str = None):
         """Alerta de error del sistema"""
         await self.send_alert(
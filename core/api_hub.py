@@ -0,0 +1,443 @@
+"""
+Hub de la topología multi-worker: dueño de exchanges y estado, atiende a los workers HTTP por socket local
+"""
+
+import asyncio
+import itertools
+import os
+import sys
+import threading
+import time
+from multiprocessing.connection import Listener
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from core.ipc import IPCChannel, IPCError
+from core.logger import get_logger
+from core.responses import JSON_MEDIA_TYPE, MSGPACK_MEDIA_TYPE, MSGPACK_MEDIA_TYPES, header_tokens
+
+logger = get_logger("api_hub", "main.log")
+
+# Rutas GET sin parámetros que el hub renderiza una vez por intervalo y los workers sirven sin consultarle
+DEFAULT_SNAPSHOT_ROUTES = (
+    "/health",
+    "/config",
+    "/api/v1/metrics",
+    "/api/v1/positions",
+    "/api/v1/orders",
+    "/api/v1/books",
+    "/api/v1/volatility",
+    "/api/v1/funding",
+    "/api/v1/equity",
+    "/api/v1/system/status",
+)
+
+# Rutas que salen del snapshot del MetricsAggregator: se renderizan con esta query (sin
+# fan-out a los exchanges) y solo cada metrics.refresh_interval, que es cuando cambian
+AGGREGATED_SNAPSHOT_ROUTES = {
+    "/api/v1/metrics": b"",
+    "/api/v1/positions": b"source=snapshot",
+    "/api/v1/orders": b"source=snapshot",
+}
+
+# CORS compartido por la app del hub y los workers (los workers responden snapshots sin pasar por el hub)
+CORS_OPTIONS = {
+    "allow_origins": ["http://localhost:5173", "https://localhost:5173", "http://localhost:3000"],
+    "allow_credentials": True,
+    "allow_methods": ["*"],
+    "allow_headers": ["*"],
+    "expose_headers": ["X-Next-Cursor", "X-Exchange-Status", "Content-Encoding", "ETag", "X-Snapshot-Age"],
+}
+
+# Respuesta HTTP serializable: (status, [(cabecera, valor)], cuerpo)
+HTTPResult = Tuple[int, List[Tuple[bytes, bytes]], bytes]
+
+# (Accept, Accept-Encoding) canónicos: las rutas de snapshot que negocian (Vary) se
+# renderizan una vez por variante y cada worker sirve la que corresponde al cliente
+SNAPSHOT_VARIANTS = tuple(
+    (accept.encode(), encoding.encode())
+    for accept in (JSON_MEDIA_TYPE, MSGPACK_MEDIA_TYPE)
+    for encoding in ("", "gzip", "br", "br, gzip")
+)
+
+# Respuestas reenviadas: hasta este tamaño viajan en la respuesta de ``http``;
+# el resto se pide al hub trozo a trozo (``http_next``)
+INLINE_BODY_LIMIT = 256 * 1024
+
+# Trozos de cuerpo en cola por respuesta en streaming antes de bloquear a la app
+STREAM_QUEUE_SIZE = 4
+
+
+def hub_address(api_cfg: dict) -> Tuple[str, str]:
+    """(dirección, familia) del socket del hub: Unix en POSIX, named pipe en Windows"""
+    if sys.platform == "win32":
+        return api_cfg.get("hub_pipe", r"\\.\pipe\marketmaker-hub"), "AF_PIPE"
+    return api_cfg.get("hub_socket", "/tmp/marketmaker-hub.sock"), "AF_UNIX"
+
+
+def hub_authkey() -> Optional[bytes]:
+    """Clave compartida hub/workers (``MARKETMAKER_HUB_AUTHKEY`` en hex)"""
+    key = os.getenv("MARKETMAKER_HUB_AUTHKEY")
+    return bytes.fromhex(key) if key else None
+
+
+def find_header(headers: Sequence[Tuple[bytes, bytes]], name: bytes) -> Optional[bytes]:
+    """Valor de una cabecera ASGI (``name`` en minúsculas)"""
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+def snapshot_variant(headers: Sequence[Tuple[bytes, bytes]]) -> Tuple[bytes, bytes]:
+    """
+    Variante de ``SNAPSHOT_VARIANTS`` que corresponde a una petición
+
+    Sigue la negociación de ``ResponseEncoder.variant``: MessagePack si el
+    cliente lo prefiere a JSON y las codificaciones br/gzip que acepta.
+    """
+    accept = header_tokens((find_header(headers, b"accept") or b"").decode("latin-1"))
+    media_type = JSON_MEDIA_TYPE
+    if any(accept.get(name, 0) > accept.get(JSON_MEDIA_TYPE, 0) for name in MSGPACK_MEDIA_TYPES):
+        media_type = MSGPACK_MEDIA_TYPE
+
+    encodings = header_tokens((find_header(headers, b"accept-encoding") or b"").decode("latin-1"))
+    accepted = [name for name in ("br", "gzip") if encodings.get(name, 0) > 0]
+    return media_type.encode(), ", ".join(accepted).encode()
+
+
+class ASGIStream:
+    """
+    Petición HTTP ejecutada contra una app ASGI dentro del proceso, con el
+    cuerpo de la respuesta leído por trozos
+
+    La cola de trozos está acotada: si nadie lee, la app queda bloqueada en
+    ``send``, así que un export enorme ocupa memoria constante.
+    """
+
+    def __init__(self, app, method: str, path: str, query_string: bytes = b"",
+                 headers: Sequence[Tuple[bytes, bytes]] = (), body: bytes = b"",
+                 queue_size: int = STREAM_QUEUE_SIZE):
+        self.status = 500
+        self.headers: List[Tuple[bytes, bytes]] = []
+        self.error: Optional[Exception] = None
+        self.last_read = time.monotonic()
+
+        self._started = asyncio.Event()
+        self._finished = asyncio.Event()
+        self._chunks: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._eof = False
+
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query_string,
+            "root_path": "",
+            "headers": list(headers),
+            "client": ("hub", 0),
+            "server": ("hub", 0),
+        }
+        self._task = asyncio.ensure_future(self._run(app, scope, body))
+
+    async def _run(self, app, scope: dict, body: bytes):
+        request_sent = False
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await self._finished.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                self.status = message["status"]
+                self.headers = list(message.get("headers", []))
+                self._started.set()
+            elif message["type"] == "http.response.body":
+                chunk = message.get("body", b"")
+                if chunk:
+                    await self._chunks.put(chunk)
+                if not message.get("more_body", False):
+                    self._finished.set()
+
+        try:
+            await app(scope, receive, send)
+        except Exception as e:
+            self.error = e
+        finally:
+            self._finished.set()
+            self._started.set()
+        # Fin del cuerpo (no se alcanza si la petición se cancela)
+        await self._chunks.put(None)
+
+    async def start(self) -> Tuple[int, List[Tuple[bytes, bytes]]]:
+        """Esperar a la cabecera de la respuesta: (status, cabeceras)"""
+        await self._started.wait()
+        return self.status, self.headers
+
+    async def read(self) -> Optional[bytes]:
+        """Siguiente trozo del cuerpo; None cuando ha terminado"""
+        if self._eof:
+            return None
+        chunk = await self._chunks.get()
+        self.last_read = time.monotonic()
+        if chunk is None:
+            self._eof = True
+        return chunk
+
+    def cancel(self):
+        """Abandonar la respuesta (el cliente se fue)"""
+        self._task.cancel()
+
+
+async def asgi_call(app, method: str, path: str, query_string: bytes = b"",
+                    headers: Sequence[Tuple[bytes, bytes]] = (), body: bytes = b"") -> HTTPResult:
+    """
+    Ejecutar una petición HTTP contra una app ASGI dentro del proceso
+
+    Las respuestas en streaming se acumulan enteras.
+    """
+    stream = ASGIStream(app, method, path, query_string, headers, body)
+    status, response_headers = await stream.start()
+    chunks: List[bytes] = []
+    while True:
+        chunk = await stream.read()
+        if chunk is None:
+            break
+        chunks.append(chunk)
+    if stream.error is not None:
+        raise stream.error
+    return status, response_headers, b"".join(chunks)
+
+
+class HubServer:
+    """
+    Expone la app del hub a los workers HTTP sin estado
+
+    El hub es el único proceso con conexiones ccxt, loops de fondo, base de
+    datos y estado de trading. Escucha en un socket local (``IPCChannel``
+    sobre ``multiprocessing.connection``) y:
+
+    - cada ``snapshot_interval`` renderiza ``snapshot_routes`` contra su
+      propia app y difunde los bytes a todos los workers (evento
+      ``snapshot``); las lecturas calientes no le llegan por cliente. Métricas,
+      posiciones y órdenes salen del snapshot del MetricsAggregator y solo se
+      re-renderizan a su ``refresh_interval``: el hub no consulta los
+      exchanges por tener workers conectados;
+    - atiende ``http`` (petición completa reenviada por un worker: órdenes,
+      riesgo, historial...) ejecutándola en su app, de modo que la lógica de
+      los endpoints vive en un solo sitio. Las respuestas de más de
+      ``INLINE_BODY_LIMIT`` (exports) quedan abiertas y el worker pide el
+      resto con ``http_next``; una respuesta sin lecturas durante
+      ``request_timeout`` se cancela.
+    """
+
+    def __init__(self, config: dict, app):
+        cfg = config.get("market_maker_v4_2", {})
+        api_cfg = cfg.get("api", {})
+
+        self.app = app
+        self.address, self.family = hub_address(api_cfg)
+        self.snapshot_interval = float(api_cfg.get("snapshot_interval", 0.5))
+        self.snapshot_routes = list(api_cfg.get("snapshot_routes", DEFAULT_SNAPSHOT_ROUTES))
+        self.aggregated_interval = float(cfg.get("metrics", {}).get("refresh_interval", 5))
+        self._rendered: Dict[str, Tuple[float, Dict[Any, HTTPResult]]] = {}
+        self.stream_timeout = float(api_cfg.get("request_timeout", 30))
+        self.streams: Dict[int, ASGIStream] = {}
+        self._stream_ids = itertools.count(1)
+
+        self.channels: Dict[int, IPCChannel] = {}
+        self._listener: Optional[Listener] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._next_id = 0
+        self._task: Optional[asyncio.Task] = None
+
+        self.snapshots = 0
+        self.forwarded = 0
+        self.errors = 0
+        self.last_snapshot_ms = 0.0
+
+    async def start(self):
+        """Abrir el socket y empezar a publicar snapshots"""
+        self._loop = asyncio.get_running_loop()
+        if self.family == "AF_UNIX" and os.path.exists(self.address):
+            os.unlink(self.address)  # socket de una ejecución anterior
+        self._listener = Listener(self.address, family=self.family, authkey=hub_authkey())
+        if self.family == "AF_UNIX":
+            os.chmod(self.address, 0o600)
+
+        threading.Thread(target=self._accept_loop, name="hub-accept", daemon=True).start()
+        self._task = asyncio.create_task(self._publish_snapshots())
+        logger.info(f"API hub listening on {self.address} ({len(self.snapshot_routes)} snapshot routes)")
+
+    def _accept_loop(self):
+        while True:
+            try:
+                conn = self._listener.accept()
+            except OSError:
+                return  # listener cerrado
+            except Exception as e:
+                # Handshake fallido (authkey incorrecta): seguir aceptando
+                logger.warning(f"API hub rejected a connection: {e}")
+                continue
+            self._loop.call_soon_threadsafe(self._attach, conn)
+
+    def _attach(self, conn):
+        self._next_id += 1
+        worker_id = self._next_id
+        channel = IPCChannel(conn, name=f"hub-worker-{worker_id}", request_handler=self._handle_request)
+        channel.start()
+        self.channels[worker_id] = channel
+        logger.info(f"API worker {worker_id} connected ({len(self.channels)} total)")
+
+        if self.snapshots:
+            try:
+                channel.publish("snapshot", self._last_snapshot)
+            except IPCError:
+                pass
+
+    async def _handle_request(self, method: str, args: tuple, kwargs: dict) -> Any:
+        if method == "http":
+            self.forwarded += 1
+            return await self._forward(*args)
+        if method == "http_next":
+            stream = self.streams.get(args[0])
+            if stream is None:
+                raise ValueError(f"Unknown or expired stream {args[0]}")
+            chunk = await stream.read()
+            if chunk is None:
+                self.streams.pop(args[0], None)
+            return chunk
+        if method == "http_close":
+            stream = self.streams.pop(args[0], None)
+            if stream is not None:
+                stream.cancel()
+            return True
+        if method == "status":
+            return self.get_status()
+        raise ValueError(f"Unknown hub method: {method}")
+
+    async def _forward(self, method: str, path: str, query_string: bytes,
+                       headers: List[Tuple[bytes, bytes]], body: bytes):
+        """
+        Ejecutar una petición reenviada
+
+        Returns:
+            (status, cabeceras, cuerpo, stream_id); ``stream_id`` es None si
+            el cuerpo está completo, o el id con el que pedir el resto
+        """
+        stream = ASGIStream(self.app, method, path, query_string, headers, body)
+        status, response_headers = await stream.start()
+        chunks: List[bytes] = []
+        size = 0
+        while size < INLINE_BODY_LIMIT:
+            chunk = await stream.read()
+            if chunk is None:
+                return status, response_headers, b"".join(chunks), None
+            chunks.append(chunk)
+            size += len(chunk)
+
+        stream_id = next(self._stream_ids)
+        self.streams[stream_id] = stream
+        return status, response_headers, b"".join(chunks), stream_id
+
+    def _expire_streams(self):
+        """Cancelar respuestas en streaming que ningún worker está leyendo"""
+        now = time.monotonic()
+        for stream_id, stream in list(self.streams.items()):
+            if now - stream.last_read > self.stream_timeout:
+                del self.streams[stream_id]
+                stream.cancel()
+                logger.warning(f"API hub dropped idle stream {stream_id}")
+
+    async def _render_route(self, path: str, query: bytes) -> Dict[Any, HTTPResult]:
+        """
+        Variantes de una ruta: ``{None: respuesta}`` si no negocia, o una por
+        cada ``SNAPSHOT_VARIANTS`` si la respuesta lleva ``Vary``
+        """
+        result = await asgi_call(self.app, "GET", path, query)
+        if find_header(result[1], b"vary") is None:
+            return {None: result}
+        return {
+            (accept, encoding): await asgi_call(
+                self.app, "GET", path, query, [(b"accept", accept), (b"accept-encoding", encoding)]
+            )
+            for accept, encoding in SNAPSHOT_VARIANTS
+        }
+
+    async def render_snapshot(self) -> dict:
+        """Renderizar todas las rutas de snapshot contra la app del hub"""
+        routes: Dict[str, Dict[Any, HTTPResult]] = {}
+        now = time.time()
+        for path in self.snapshot_routes:
+            query = AGGREGATED_SNAPSHOT_ROUTES.get(path)
+            if query is not None:
+                rendered = self._rendered.get(path)
+                if rendered is not None and now - rendered[0] < self.aggregated_interval:
+                    routes[path] = rendered[1]
+                    continue
+            try:
+                routes[path] = await self._render_route(path, query or b"")
+                if query is not None and all(result[0] == 200 for result in routes[path].values()):
+                    self._rendered[path] = (now, routes[path])
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"API hub could not render {path}: {e}")
+        return {"timestamp": time.time(), "routes": routes}
+
+    async def _publish_snapshots(self):
+        self._last_snapshot: dict = {}
+        while True:
+            try:
+                self._expire_streams()
+                # Sin workers conectados no hay a quién servir
+                if self.channels:
+                    start = time.perf_counter()
+                    self._last_snapshot = await self.render_snapshot()
+                    self.last_snapshot_ms = (time.perf_counter() - start) * 1000
+                    self.snapshots += 1
+                    for worker_id, channel in list(self.channels.items()):
+                        if channel.closed:
+                            del self.channels[worker_id]
+                            logger.warning(f"API worker {worker_id} disconnected")
+                            continue
+                        try:
+                            channel.publish("snapshot", self._last_snapshot)
+                        except IPCError:
+                            del self.channels[worker_id]
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"API hub snapshot error: {e}")
+            await asyncio.sleep(self.snapshot_interval)
+
+    async def stop(self):
+        """Cerrar el socket y los canales"""
+        if self._task:
+            self._task.cancel()
+        if self._listener:
+            self._listener.close()
+        for channel in self.channels.values():
+            channel.close()
+        self.channels.clear()
+        for stream in self.streams.values():
+            stream.cancel()
+        self.streams.clear()
+
+    def get_status(self) -> dict:
+        """Workers conectados y contadores"""
+        return {
+            "address": self.address,
+            "workers": len(self.channels),
+            "snapshot_interval": self.snapshot_interval,
+            "snapshot_routes": len(self.snapshot_routes),
+            "snapshots": self.snapshots,
+            "last_snapshot_ms": round(self.last_snapshot_ms, 3),
+            "forwarded": self.forwarded,
+            "open_streams": len(self.streams),
+            "errors": self.errors
+        }
@@ -0,0 +1,231 @@
+"""
+Worker HTTP sin estado: sirve snapshots del hub y le reenvía el resto de peticiones
+
+Ejecutar (lo hace ``python main_v2.py`` cuando ``api.workers > 1``):
+    uvicorn core.api_worker:app --workers N
+
+No importa main_v2 ni ccxt: cada worker es un proceso ligero sin
+conexiones a exchanges ni base de datos.
+"""
+
+import asyncio
+import json
+import time
+from multiprocessing.connection import Client
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from starlette.middleware.cors import CORSMiddleware
+from core.api_hub import CORS_OPTIONS, HTTPResult, find_header, hub_address, hub_authkey, snapshot_variant
+from core.ipc import IPCChannel, IPCError
+from core.logger import get_logger
+
+logger = get_logger("api_worker", "main.log")
+
+
+def load_api_config(path: str = "config.json") -> dict:
+    """Sección ``api`` de la configuración (sin validar el resto)"""
+    try:
+        with open(Path(path), "r") as f:
+            return json.load(f).get("market_maker_v4_2", {}).get("api", {})
+    except FileNotFoundError:
+        return {}
+
+
+def _etag_matches(if_none_match: Optional[bytes], etag: Optional[bytes]) -> bool:
+    if not if_none_match or not etag:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(b",")]
+    return b"*" in candidates or etag in candidates or etag.removeprefix(b"W/") in candidates
+
+
+class APIWorker:
+    """
+    App ASGI de un worker
+
+    - Las rutas de snapshot (GET sin query) se responden desde los bytes que
+      el hub difunde cada ``snapshot_interval``, respetando If-None-Match y,
+      en las rutas que negocian, la variante de Accept/Accept-Encoding del
+      cliente. Si el snapshot envejece más de ``max_snapshot_age`` se reenvían.
+    - El resto se reenvía completo al hub (``http``) y su respuesta se
+      devuelve tal cual: timeout -> 504, hub caído -> 502/503. Las
+      respuestas grandes se piden al hub trozo a trozo (``http_next``).
+    - WebSocket no se reenvía: se cierra con 1013 (el push vive en el hub,
+      en ``api.hub_port``).
+    """
+
+    def __init__(self, api_cfg: dict):
+        self.address, self.family = hub_address(api_cfg)
+        self.request_timeout = float(api_cfg.get("request_timeout", 30))
+        self.max_snapshot_age = float(api_cfg.get("max_snapshot_age",
+                                                  5 * float(api_cfg.get("snapshot_interval", 0.5))))
+        self.reconnect_interval = float(api_cfg.get("reconnect_interval", 1.0))
+
+        self.channel: Optional[IPCChannel] = None
+        self.routes: Dict[str, Dict[Any, HTTPResult]] = {}
+        self.snapshot_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+        self.served_from_snapshot = 0
+        self.forwarded = 0
+        self.errors = 0
+
+    def _on_event(self, topic: str, payload):
+        if topic == "snapshot" and payload:
+            self.routes = payload["routes"]
+            self.snapshot_at = payload["timestamp"]
+
+    async def _connect_loop(self):
+        """Conectar al hub y reconectar si se cae (el hub puede arrancar después)"""
+        loop = asyncio.get_running_loop()
+        while True:
+            if self.channel is None or self.channel.closed:
+                try:
+                    conn = await loop.run_in_executor(
+                        None, lambda: Client(self.address, family=self.family, authkey=hub_authkey())
+                    )
+                    self.channel = IPCChannel(conn, name="api-worker", event_handler=self._on_event)
+                    self.channel.start()
+                    logger.info(f"API worker connected to hub at {self.address}")
+                except (OSError, EOFError):
+                    pass  # el hub todavía no escucha
+            await asyncio.sleep(self.reconnect_interval)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "websocket":
+            await receive()  # websocket.connect
+            await send({"type": "websocket.close", "code": 1013,
+                        "reason": "Push API is served by the hub (api.hub_port)"})
+        else:
+            await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                self._task = asyncio.create_task(self._connect_loop())
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                if self._task:
+                    self._task.cancel()
+                if self.channel:
+                    self.channel.close()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _http(self, scope, receive, send):
+        method = scope["method"]
+        path = scope["path"]
+        headers = scope["headers"]
+
+        if method in ("GET", "HEAD") and not scope["query_string"]:
+            variants = self.routes.get(path)
+            cached = None
+            if variants is not None:
+                cached = variants.get(None) or variants.get(snapshot_variant(headers))
+            age = time.time() - self.snapshot_at
+            if cached is not None and age <= self.max_snapshot_age:
+                self.served_from_snapshot += 1
+                status, response_headers, body = cached
+                response_headers = response_headers + [(b"x-snapshot-age", f"{age:.3f}".encode())]
+                if status == 200 and _etag_matches(find_header(headers, b"if-none-match"),
+                                                   find_header(response_headers, b"etag")):
+                    status, body = 304, b""
+                    response_headers = [(key, value) for key, value in response_headers
+                                        if key.lower() not in (b"content-length", b"content-type")]
+                await self._respond(send, status, response_headers, b"" if method == "HEAD" else body)
+                return
+
+        # Cuerpo completo antes de reenviar
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+
+        if self.channel is None or self.channel.closed:
+            await self._error(send, 503, "API hub not connected")
+            return
+
+        # Sin Origin: el CORS de la respuesta lo pone el worker, no el hub
+        forwarded_headers = [(key, value) for key, value in headers if key.lower() != b"origin"]
+        try:
+            self.forwarded += 1
+            status, response_headers, body, stream_id = await self.channel.request(
+                "http", method, path, scope["query_string"], forwarded_headers, b"".join(chunks),
+                timeout=self.request_timeout
+            )
+        except asyncio.TimeoutError:
+            self.errors += 1
+            await self._error(send, 504, "API hub timed out")
+            return
+        except IPCError as e:
+            self.errors += 1
+            logger.error(f"API worker forward failed for {method} {path}: {e}")
+            await self._error(send, 502, "API hub error")
+            return
+
+        if stream_id is None:
+            await self._respond(send, status, response_headers, body)
+        else:
+            await self._stream(receive, send, status, response_headers, body, stream_id)
+
+    async def _stream(self, receive, send, status: int, headers: List[Tuple[bytes, bytes]],
+                      body: bytes, stream_id: int):
+        """
+        Respuesta grande: el resto del cuerpo se pide al hub trozo a trozo
+
+        Cada trozo se envía al cliente antes de pedir el siguiente, así que
+        ni el worker ni el hub acumulan la respuesta. Si el hub falla a mitad
+        la excepción corta la conexión (el cliente no recibe un cuerpo
+        truncado como si estuviera completo).
+        """
+        disconnected = asyncio.Event()
+
+        async def watch_disconnect():
+            while (await receive())["type"] != "http.disconnect":
+                pass
+            disconnected.set()
+
+        watcher = asyncio.ensure_future(watch_disconnect())
+        finished = False
+        try:
+            await send({"type": "http.response.start", "status": status, "headers": headers})
+            await send({"type": "http.response.body", "body": body, "more_body": True})
+            while not disconnected.is_set():
+                chunk = await self.channel.request("http_next", stream_id, timeout=self.request_timeout)
+                if chunk is None:
+                    finished = True
+                    break
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            await send({"type": "http.response.body", "body": b""})
+        except (asyncio.TimeoutError, IPCError) as e:
+            self.errors += 1
+            logger.error(f"API worker stream {stream_id} failed: {e}")
+            raise
+        finally:
+            watcher.cancel()
+            if not finished and self.channel is not None and not self.channel.closed:
+                try:
+                    await self.channel.request("http_close", stream_id, timeout=self.request_timeout)
+                except (asyncio.TimeoutError, IPCError):
+                    pass
+
+    @staticmethod
+    async def _respond(send, status: int, headers: List[Tuple[bytes, bytes]], body: bytes):
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+    async def _error(self, send, status: int, detail: str):
+        body = json.dumps({"detail": detail}).encode()
+        await self._respond(send, status, [(b"content-type", b"application/json"),
+                                           (b"content-length", str(len(body)).encode())], body)
+
+
+worker = APIWorker(load_api_config())
+app = CORSMiddleware(worker, **CORS_OPTIONS)
+
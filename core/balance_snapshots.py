@@ -0,0 +1,173 @@
+"""
+Snapshots de balance diferenciales en balance_snapshots
+"""
+
+import asyncio
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Tuple
+from sqlalchemy import insert
+from core.database import BalanceSnapshot
+from core.logger import get_logger
+
+logger = get_logger("balance_snapshots", "database.log")
+
+
+class BalanceSnapshotter:
+    """
+    Escribe solo las monedas cuyo free/used/total cambió más de un epsilon
+
+    Lee los balances que ya cachea el MultiExchangeManager (health check y
+    reconciliación de equity), así que no hace llamadas privadas propias. Cada
+    ciclo es un único INSERT multi-fila. Cada ``checkpoint_interval`` segundos
+    se escribe el estado completo (``snapshot_metadata.checkpoint``): el estado
+    en cualquier instante es el último checkpoint más los cambios posteriores,
+    aunque la retención de las filas crudas haya borrado los anteriores.
+    """
+
+    def __init__(self, config: dict, manager, session_factory: Callable):
+        cfg = config.get("market_maker_v4_2", {})
+        snap_cfg = cfg.get("balance_snapshots", {})
+
+        self.manager = manager
+        self.session_factory = session_factory
+        self.interval = float(snap_cfg.get("interval", 60))
+        self.epsilon = float(snap_cfg.get("epsilon", 1e-8))
+        self.relative_epsilon = float(snap_cfg.get("relative_epsilon", 1e-6))
+        self.checkpoint_interval = float(snap_cfg.get("checkpoint_interval", 3600))
+
+        # (exchange, currency) -> (free, used, total) último escrito
+        self._written: Dict[Tuple[str, str], Tuple[float, float, float]] = {}
+        self._last_checkpoint = 0.0
+
+        self.cycles = 0
+        self.rows_written = 0
+        self.rows_skipped = 0
+        self.checkpoints = 0
+        self.errors = 0
+
+    async def start(self):
+        """Bucle de snapshots en segundo plano"""
+        while True:
+            try:
+                await self.snapshot()
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Balance snapshot error: {e}")
+            await asyncio.sleep(self.interval)
+
+    def _changed(self, previous: Tuple[float, float, float], current: Tuple[float, float, float]) -> bool:
+        for before, after in zip(previous, current):
+            if abs(after - before) > max(self.epsilon, self.relative_epsilon * abs(before)):
+                return True
+        return False
+
+    def _usd_value(self, exchange: str, currency: str, total: float):
+        tracker = self.manager.equity_tracker
+        if currency == tracker.quote_currency:
+            return total
+        mark = tracker.marks.get((exchange, f"{currency}/{tracker.quote_currency}"))
+        return total * mark if mark else None
+
+    def collect(self, now: float, checkpoint: bool = False) -> Tuple[List[Dict[str, Any]], Dict[Tuple[str, str], Tuple[float, float, float]]]:
+        """
+        Filas a escribir en este ciclo
+
+        Args:
+            now: Marca de tiempo del ciclo
+            checkpoint: Incluir todas las monedas aunque no hayan cambiado
+
+        Returns:
+            (filas, nuevo estado escrito por clave)
+        """
+        timestamp = datetime.utcfromtimestamp(now)
+
+        rows: List[Dict[str, Any]] = []
+        state: Dict[Tuple[str, str], Tuple[float, float, float]] = {}
+
+        for exchange, balance in list(self.manager.balances.items()):
+            totals = balance.get("total") or {}
+            free = balance.get("free") or {}
+            used = balance.get("used") or {}
+
+            # Monedas con saldo más las que tenían saldo escrito (pasan a 0)
+            currencies = {currency for currency, total in totals.items() if total}
+            currencies.update(currency for (name, currency) in self._written if name == exchange)
+
+            for currency in currencies:
+                key = (exchange, currency)
+                current = (
+                    float(free.get(currency) or 0),
+                    float(used.get(currency) or 0),
+                    float(totals.get(currency) or 0)
+                )
+                previous = self._written.get(key)
+                if not checkpoint and previous is not None and not self._changed(previous, current):
+                    self.rows_skipped += 1
+                    continue
+
+                state[key] = current
+                rows.append({
+                    "timestamp": timestamp,
+                    "exchange": exchange,
+                    "currency": currency,
+                    "free": current[0],
+                    "used": current[1],
+                    "total": current[2],
+                    "usd_value": self._usd_value(exchange, currency, current[2]),
+                    "snapshot_metadata": {"checkpoint": True} if checkpoint else None
+                })
+
+        return rows, state
+
+    async def snapshot(self, now: float = None) -> int:
+        """
+        Un ciclo: diferencias (o checkpoint completo) en un solo INSERT
+
+        Returns:
+            Filas escritas
+        """
+        now = now or time.time()
+        checkpoint = now - self._last_checkpoint >= self.checkpoint_interval
+        rows, state = self.collect(now, checkpoint)
+
+        if rows:
+            await asyncio.get_running_loop().run_in_executor(None, self._write, rows)
+            self.rows_written += len(rows)
+
+        # Solo tras escribir: si falla, el siguiente ciclo reintenta las mismas diferencias
+        self._written.update(state)
+        for key, values in state.items():
+            if not values[2]:
+                del self._written[key]
+
+        if checkpoint and self.manager.balances:
+            self._last_checkpoint = now
+            self.checkpoints += 1
+        self.cycles += 1
+        return len(rows)
+
+    def _write(self, rows: List[Dict[str, Any]]):
+        session = self.session_factory()
+        try:
+            session.execute(insert(BalanceSnapshot), rows)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def get_status(self) -> dict:
+        """Contadores y último checkpoint"""
+        return {
+            "interval": self.interval,
+            "checkpoint_interval": self.checkpoint_interval,
+            "last_checkpoint": datetime.utcfromtimestamp(self._last_checkpoint).isoformat() if self._last_checkpoint else None,
+            "tracked_balances": len(self._written),
+            "cycles": self.cycles,
+            "rows_written": self.rows_written,
+            "rows_skipped": self.rows_skipped,
+            "checkpoints": self.checkpoints,
+            "errors": self.errors
+        }
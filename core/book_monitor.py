@@ -0,0 +1,202 @@
+"""
+Monitor de libros en vivo: spread y profundidad top-of-book por tick
+"""
+
+import asyncio
+import time
+from typing import Callable, Dict, List, Optional, Set, Tuple
+import numpy as np
+from core.circuit_breaker import ANY, BreakerType, CircuitBreaker, CircuitBreakerManager
+from core.logger import get_logger
+
+logger = get_logger("book_monitor", "book_monitor.log")
+
+# Tipos de breaker alimentados desde el libro; cualquiera abierto pausa el par
+BOOK_BREAKERS = (BreakerType.SPREAD, BreakerType.DEPTH)
+
+
+class BookMonitor:
+    """
+    Evalúa los breakers de spread y profundidad en cada actualización del libro.
+
+    ``on_book`` es O(1) por actualización: lee el top (``depth_levels`` niveles
+    por lado), calcula spread en bps y profundidad en USD y evalúa las dos filas
+    (exchange, símbolo) de la tabla de breakers, resueltas una sola vez por par.
+    Cuando alguno abre, el par queda en pausa hasta que se cierren todos; los
+    listeners reciben ``(action, exchange, symbol)`` con action ``pause`` o
+    ``resume``.
+    """
+
+    def __init__(self, config: dict, breaker_manager: CircuitBreakerManager):
+        cfg = config.get("market_maker_v4_2", {})
+        book_cfg = cfg.get("book_monitor", {})
+
+        self.breaker_manager = breaker_manager
+        self.depth_levels = max(1, int(book_cfg.get("depth_levels", 1)))
+        self.book_limit = int(book_cfg.get("book_limit", 5))
+        self.refresh_seconds = cfg.get("refresh_ms", 250) / 1000
+        self.stream = bool(book_cfg.get("stream", True))
+
+        # (exchange, symbol) -> filas [spread, depth] en la tabla de breakers
+        self._rows: Dict[Tuple[str, str], np.ndarray] = {}
+        # (exchange, symbol) -> [bid, ask, spread_bps, depth_usd, timestamp, updates, bids, asks]
+        # (bids/asks son referencias a los niveles recibidos, sin copiar)
+        self.tops: Dict[Tuple[str, str], list] = {}
+        # (exchange, symbol) -> tipos de breaker abiertos
+        self.paused: Dict[Tuple[str, str], Set[str]] = {}
+
+        self._values = np.empty(len(BOOK_BREAKERS), dtype=np.float64)
+        self._listeners: List[Callable] = []
+        breaker_manager.add_listener(self._on_breaker)
+
+        logger.info(
+            f"Book monitor initialized (levels: {self.depth_levels}, "
+            f"stream: {self.stream}, poll: {self.refresh_seconds}s)"
+        )
+
+    def add_listener(self, callback: Callable):
+        """Registrar un callback (sync o async) ``(action, exchange, symbol)``"""
+        self._listeners.append(callback)
+
+    def _rows_for(self, key: Tuple[str, str]) -> np.ndarray:
+        rows = self._rows.get(key)
+        if rows is None:
+            exchange, symbol = key
+            rows = self.breaker_manager.rows_for(
+                [(exchange, symbol, breaker_type.value) for breaker_type in BOOK_BREAKERS]
+            )
+            self._rows[key] = rows
+        return rows
+
+    def on_book(self, exchange: str, symbol: str, bids: list, asks: list,
+                contract_size: float = 1.0, timestamp: float = None) -> bool:
+        """
+        Procesar una actualización del libro
+
+        Args:
+            exchange: Nombre del exchange
+            symbol: Símbolo (formato de configuración)
+            bids, asks: Niveles [precio, cantidad, ...] ordenados desde el top
+            contract_size: Multiplicador de la cantidad (contratos -> base)
+            timestamp: Marca de tiempo del libro (ms); por defecto ahora
+
+        Returns:
+            True si el par queda en pausa tras la actualización
+        """
+        if not bids or not asks:
+            return self.is_paused(exchange, symbol)
+
+        key = (exchange, symbol)
+        bid, ask = bids[0][0], asks[0][0]
+        mid = (bid + ask) / 2
+        if mid <= 0:
+            return self.is_paused(exchange, symbol)
+
+        spread_bps = (ask - bid) / mid * 10000
+
+        # Lado más fino del top: es lo que realmente se puede ejecutar
+        levels = self.depth_levels
+        bid_depth = sum(price * amount for price, amount, *_ in bids[:levels])
+        ask_depth = sum(price * amount for price, amount, *_ in asks[:levels])
+        depth_usd = min(bid_depth, ask_depth) * contract_size
+
+        values = self._values
+        values[0] = spread_bps
+        values[1] = depth_usd
+        self.breaker_manager.check_rows(self._rows_for(key), values)
+
+        top = self.tops.get(key)
+        if top is None:
+            self.tops[key] = [bid, ask, spread_bps, depth_usd, timestamp or time.time() * 1000, 1, bids, asks]
+        else:
+            top[0], top[1], top[2], top[3] = bid, ask, spread_bps, depth_usd
+            top[4] = timestamp or time.time() * 1000
+            top[5] += 1
+            top[6], top[7] = bids, asks
+
+        return key in self.paused or self._remote_paused(exchange, symbol)
+
+    def _remote_paused(self, exchange: str, symbol: str) -> bool:
+        """Breaker de libro del par abierto en otro proceso (ver ``set_remote_open``)"""
+        remote = self.breaker_manager.remote_open
+        return bool(remote) and any(
+            (exchange, symbol, breaker_type.value) in remote for breaker_type in BOOK_BREAKERS
+        )
+
+    def _on_breaker(self, action: str, breaker: CircuitBreaker, **details):
+        """Listener de CircuitBreakerManager: pausar/reanudar el par afectado"""
+        if breaker.breaker_type not in BOOK_BREAKERS or breaker.symbol == ANY:
+            return
+
+        key = (breaker.exchange, breaker.symbol)
+        open_types = self.paused.get(key)
+
+        if action == "open":
+            if open_types is None:
+                self.paused[key] = {breaker.breaker_type.value}
+                logger.warning(f"⏸️ Quoting paused for {breaker.symbol} on {breaker.exchange} ({breaker.name})")
+                self._notify("pause", *key)
+            else:
+                open_types.add(breaker.breaker_type.value)
+
+        elif action == "close" and open_types is not None:
+            open_types.discard(breaker.breaker_type.value)
+            if not open_types:
+                del self.paused[key]
+                logger.info(f"▶️ Quoting resumed for {breaker.symbol} on {breaker.exchange}")
+                self._notify("resume", *key)
+
+    def _notify(self, action: str, exchange: str, symbol: str):
+        for callback in self._listeners:
+            try:
+                result = callback(action, exchange, symbol)
+                if asyncio.iscoroutine(result):
+                    asyncio.ensure_future(result)
+            except Exception as e:
+                logger.error(f"Error in book monitor listener: {e}")
+
+    def is_paused(self, exchange: str, symbol: str) -> bool:
+        """True si el par tiene abierto algún breaker de libro (aquí o en otro proceso)"""
+        return (exchange, symbol) in self.paused or self._remote_paused(exchange, symbol)
+
+    def get_top(self, exchange: str, symbol: str) -> Optional[dict]:
+        """Último top of book procesado"""
+        top = self.tops.get((exchange, symbol))
+        if top is None:
+            return None
+        return {
+            "bid": top[0],
+            "ask": top[1],
+            "spread_bps": round(top[2], 4),
+            "depth_usd": round(top[3], 2),
+            "timestamp": int(top[4]),
+            "updates": top[5],
+            "paused": self.is_paused(exchange, symbol)
+        }
+
+    def get_levels(self, exchange: str, symbol: str, depth: int) -> Optional[dict]:
+        """Últimos ``depth`` niveles por lado (como mucho ``book_limit``)"""
+        top = self.tops.get((exchange, symbol))
+        if top is None:
+            return None
+        return {
+            "bids": [[price, amount] for price, amount, *_ in top[6][:depth]],
+            "asks": [[price, amount] for price, amount, *_ in top[7][:depth]],
+            "timestamp": int(top[4])
+        }
+
+    def get_status(self) -> dict:
+        """Top of book y pausas por exchange y símbolo"""
+        books: Dict[str, Dict[str, dict]] = {}
+        for exchange, symbol in self.tops:
+            books.setdefault(exchange, {})[symbol] = self.get_top(exchange, symbol)
+
+        return {
+            "books": books,
+            "paused": [
+                {"exchange": exchange, "symbol": symbol, "breakers": sorted(types)}
+                for (exchange, symbol), types in self.paused.items()
+            ],
+            "depth_levels": self.depth_levels,
+            "stream": self.stream
+        }
@@ -0,0 +1,84 @@
+"""
+Historial de circuit breakers: escritura asíncrona por lotes en circuit_breaker_events
+"""
+
+from typing import Callable, Dict, List, Tuple
+from sqlalchemy import update
+from core.circuit_breaker import ANY, CircuitBreaker, transition_event
+from core.database import CircuitBreakerEvent
+from core.persistence import BatchWriter
+
+
+class BreakerEventWriter(BatchWriter):
+    """
+    Persiste las transiciones open/close de los breakers sin bloquear el loop
+
+    ``on_transition`` se registra como listener del CircuitBreakerManager y solo
+    encola; la tarea de fondo inserta las aperturas y, al resolverse, actualiza
+    la fila abierta con ``resolved_at`` y la duración.
+    """
+
+    def __init__(self, session_factory: Callable, config: dict = None):
+        cfg = (config or {}).get("market_maker_v4_2", {}).get("breaker_events", {})
+        super().__init__(
+            "breaker_events",
+            session_factory,
+            queue_size=cfg.get("queue_size", 10000),
+            batch_size=cfg.get("batch_size", 200),
+            flush_interval=cfg.get("flush_interval", 1.0)
+        )
+        # (exchange, symbol, breaker_type) -> id de la fila abierta
+        self._open_rows: Dict[Tuple[str, str, str], int] = {}
+
+    def on_transition(self, action: str, breaker: CircuitBreaker, **details):
+        """Listener de CircuitBreakerManager: encolar la transición"""
+        self.submit(transition_event(action, breaker, **details))
+
+    def write_batch(self, session, batch: List[dict]):
+        """Insertar aperturas y cerrar las filas abiertas en la misma transacción"""
+        opened: Dict[Tuple[str, str, str], CircuitBreakerEvent] = {}
+
+        for event in batch:
+            key = event["key"]
+            exchange, symbol, breaker_type = key
+
+            if event["action"] == "open":
+                row = CircuitBreakerEvent(
+                    timestamp=event["timestamp"],
+                    exchange=None if exchange == ANY else exchange,
+                    symbol=None if symbol == ANY else symbol,
+                    breaker_type=breaker_type,
+                    trigger_value=event["trigger_value"],
+                    threshold=event["threshold"],
+                    duration_seconds=0,
+                    is_resolved=False,
+                    event_metadata={"name": event["name"], "trigger_count": event["trigger_count"]}
+                )
+                session.add(row)
+                opened[key] = row
+                continue
+
+            resolution = {
+                "resolved_at": event["timestamp"],
+                "is_resolved": True,
+                "duration_seconds": int(event["duration"] or 0)
+            }
+
+            # Apertura en este mismo lote: actualizar el objeto pendiente
+            row = opened.pop(key, None)
+            if row is not None:
+                for field, value in resolution.items():
+                    setattr(row, field, value)
+                continue
+
+            row_id = self._open_rows.pop(key, None)
+            if row_id is not None:
+                session.execute(
+                    update(CircuitBreakerEvent)
+                    .where(CircuitBreakerEvent.id == row_id)
+                    .values(**resolution)
+                )
+
+        session.flush()
+        for key, row in opened.items():
+            self._open_rows[key] = row.id
@@ -0,0 +1,119 @@
+"""
+Ingesta masiva en Postgres con COPY (formato texto)
+"""
+
+import io
+import json
+from datetime import date, datetime
+from typing import Any, Dict, List, Sequence
+from sqlalchemy import UniqueConstraint
+
+# Escapes del formato texto de COPY
+_COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+def copy_value(value: Any) -> str:
+    """Un valor en formato texto de COPY (``\\N`` = NULL)"""
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value, default=str)
+    return str(value).translate(_COPY_ESCAPES)
+
+
+def copy_buffer(rows: Sequence[Dict[str, Any]], columns: Sequence[str],
+                defaults: Dict[str, Any] = None) -> io.StringIO:
+    """
+    Filas -> buffer listo para ``COPY ... FROM STDIN``
+
+    ``defaults``: valor (o callable sin argumentos) para columnas ausentes
+    """
+    defaults = defaults or {}
+    buffer = io.StringIO()
+    for row in rows:
+        values = []
+        for column in columns:
+            if column in row:
+                value = row[column]
+            else:
+                value = defaults.get(column)
+                value = value() if callable(value) else value
+            values.append(copy_value(value))
+        buffer.write("\t".join(values))
+        buffer.write("\n")
+    buffer.seek(0)
+    return buffer
+
+
+def _python_defaults(table, present: set) -> Dict[str, Any]:
+    """Defaults de Python (timestamp=utcnow, filled=0...) que COPY no aplica"""
+    defaults = {}
+    for column in table.columns:
+        default = column.default
+        if column.name in present or column.primary_key or default is None:
+            continue
+        if default.is_scalar:
+            defaults[column.name] = default.arg
+        elif default.is_callable:
+            defaults[column.name] = lambda fn=default.arg: fn(None)
+    return defaults
+
+
+def _has_unique(table) -> bool:
+    return any(index.unique for index in table.indexes) or any(
+        isinstance(constraint, UniqueConstraint) for constraint in table.constraints
+    )
+
+
+def copy_rows(session, model, rows: List[Dict[str, Any]]) -> int:
+    """
+    Insertar ``rows`` con COPY dentro de la transacción de ``session``
+
+    Tablas con restricción única (trades.order_id): COPY a una tabla temporal
+    y ``INSERT ... SELECT ... ON CONFLICT DO NOTHING``, mismo criterio que el
+    write-behind en SQLite. Tablas de series (métricas, health, balances):
+    COPY directo. Requiere psycopg2 (``session`` sobre el motor síncrono).
+
+    Returns:
+        Filas enviadas
+    """
+    if not rows:
+        return 0
+
+    if session.get_bind().dialect.name != "postgresql":
+        raise ValueError("COPY ingest requires PostgreSQL")
+
+    table = model.__table__
+    # Columnas presentes en algún dict más las que tienen default de Python;
+    # el resto toma su DEFAULT de servidor (id) o NULL
+    present = set().union(*(row.keys() for row in rows))
+    defaults = _python_defaults(table, present)
+    columns = [column.name for column in table.columns if column.name in present or column.name in defaults]
+    column_list = ", ".join(f'"{column}"' for column in columns)
+
+    buffer = copy_buffer(rows, columns, defaults)
+    raw = session.connection().connection.driver_connection
+    cursor = raw.cursor()
+    try:
+        if _has_unique(table):
+            # Solo las columnas copiadas y sin restricciones: id se asigna en el INSERT final
+            stage = f"_copy_stage_{table.name}"
+            cursor.execute(
+                f'CREATE TEMP TABLE "{stage}" AS '
+                f'SELECT {column_list} FROM "{table.name}" WITH NO DATA'
+            )
+            cursor.copy_expert(f'COPY "{stage}" ({column_list}) FROM STDIN', buffer)
+            cursor.execute(
+                f'INSERT INTO "{table.name}" ({column_list}) '
+                f'SELECT {column_list} FROM "{stage}" ON CONFLICT DO NOTHING'
+            )
+            cursor.execute(f'DROP TABLE "{stage}"')
+        else:
+            cursor.copy_expert(f'COPY "{table.name}" ({column_list}) FROM STDIN', buffer)
+    finally:
+        cursor.close()
+    return len(rows)
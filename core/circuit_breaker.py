@@ -2,14 +2,20 @@
 Sistema de Circuit Breakers para protección de riesgo
 """
 
-from dataclasses import dataclass, field
-from datetime import datetime, timedelta
-from typing import Dict, Optional, Callable, List
+import time
+from datetime import datetime
+from typing import Dict, Optional, Callable, List, Mapping, Sequence, Set, Tuple
 from enum import Enum
+import numpy as np
 from core.logger import get_logger
 
 logger = get_logger("circuit_breaker", "circuit_breaker.log")
 
+# Comodín para breakers globales o a nivel de exchange
+ANY = "*"
+
+BreakerKey = Tuple[str, str, str]  # (exchange, symbol, breaker_type)
+
 class BreakerType(Enum):
     """Tipos de circuit breakers"""
     LATENCY = "latency"
@@ -17,313 +23,586 @@ class BreakerType(Enum):
     VOLATILITY = "volatility"
     ERROR_RATE = "error_rate"
     DRAWDOWN = "drawdown"
+    DEPTH = "depth"
+
+# Sentido de la comparación por tipo: +1 abre por encima del umbral, -1 por debajo
+BREAKER_DIRECTIONS = {
+    BreakerType.DEPTH: -1.0,
+}
+
+class BreakerTable:
+    """
+    Estado columnar de todos los breakers: una fila por (exchange, símbolo, tipo)
+
+    Umbrales, contadores y timestamps viven en arrays NumPy para poder evaluar
+    miles de breakers en una sola operación vectorizada. Los tiempos de apertura
+    usan ``time.monotonic()``; el reloj de pared solo se guarda para reporting.
+    """
+
+    def __init__(self, capacity: int = 64):
+        self.keys: List[BreakerKey] = []
+        self.index: Dict[BreakerKey, int] = {}
+        # Copia de is_open como conjunto de filas para consultas escalares
+        self.open_rows: Set[int] = set()
+        self._capacity = 0
+        self._resize(capacity)
+
+    def _resize(self, capacity: int):
+        n = len(self.keys)
+
+        def grow(name: str, fill, dtype) -> np.ndarray:
+            new = np.full(capacity, fill, dtype=dtype)
+            if n:
+                new[:n] = getattr(self, name)[:n]
+            return new
+
+        self.threshold = grow("threshold", np.inf, np.float64)
+        self.direction = grow("direction", 1.0, np.float64)
+        self.cooldown = grow("cooldown", 0.0, np.float64)
+        self.max_consecutive = grow("max_consecutive", 1, np.int64)
+        self.consecutive = grow("consecutive", 0, np.int64)
+        self.is_open = grow("is_open", False, np.bool_)
+        self.opened_at = grow("opened_at", np.nan, np.float64)      # monotonic
+        self.opened_wall = grow("opened_wall", np.nan, np.float64)  # epoch, solo reporting
+        self.trigger_count = grow("trigger_count", 0, np.int64)
+        self.last_value = grow("last_value", np.nan, np.float64)
+        self._capacity = capacity
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def add(self, key: BreakerKey, threshold: float, cooldown: float, max_consecutive: int,
+            direction: float = 1.0) -> int:
+        """Añadir una fila (o devolver la existente)"""
+        row = self.index.get(key)
+        if row is not None:
+            return row
+        row = len(self.keys)
+        if row >= self._capacity:
+            self._resize(self._capacity * 2)
+        self.keys.append(key)
+        self.index[key] = row
+        self.threshold[row] = threshold
+        self.direction[row] = direction
+        self.cooldown[row] = cooldown
+        self.max_consecutive[row] = max_consecutive
+        return row
 
-@dataclass
 class CircuitBreaker:
-    """Circuit Breaker individual"""
-    name: str
-    breaker_type: BreakerType
-    threshold: float
-    cooldown_seconds: int
-    is_open: bool = False
-    opened_at: Optional[datetime] = None
-    trigger_count: int = 0
-    consecutive_violations: int = 0
-    max_consecutive: int = 3
-    on_open_callback: Optional[Callable] = None
-    on_close_callback: Optional[Callable] = None
-    metadata: Dict = field(default_factory=dict)
-    
+    """Circuit Breaker individual (vista sobre una fila de la BreakerTable)"""
+
+    def __init__(self, table: BreakerTable, row: int, name: str, breaker_type: BreakerType,
+                 exchange: str = ANY, symbol: str = ANY, listeners: List[Callable] = None):
+        self.table = table
+        self.row = row
+        self.name = name
+        self.breaker_type = breaker_type
+        self.exchange = exchange
+        self.symbol = symbol
+        self.on_open_callback: Optional[Callable] = None
+        self.on_close_callback: Optional[Callable] = None
+        self.listeners: List[Callable] = listeners if listeners is not None else []
+        self.metadata: Dict = {}
+
+    @property
+    def threshold(self) -> float:
+        return float(self.table.threshold[self.row])
+
+    @threshold.setter
+    def threshold(self, value: float):
+        self.table.threshold[self.row] = value
+
+    @property
+    def cooldown_seconds(self) -> float:
+        return float(self.table.cooldown[self.row])
+
+    @property
+    def max_consecutive(self) -> int:
+        return int(self.table.max_consecutive[self.row])
+
+    @property
+    def consecutive_violations(self) -> int:
+        return int(self.table.consecutive[self.row])
+
+    @property
+    def is_open(self) -> bool:
+        return bool(self.table.is_open[self.row])
+
+    @property
+    def trigger_count(self) -> int:
+        return int(self.table.trigger_count[self.row])
+
+    @property
+    def opened_at(self) -> Optional[datetime]:
+        wall = self.table.opened_wall[self.row]
+        return None if np.isnan(wall) else datetime.fromtimestamp(wall)
+
     def should_open(self, current_value: float) -> bool:
         """
         Verificar si debe abrirse el breaker
-        
+
         Args:
             current_value: Valor actual a comparar con threshold
-            
+
         Returns:
             True si debe abrirse
         """
-        violation = False
-        
-        if self.breaker_type == BreakerType.LATENCY:
-            violation = current_value > self.threshold
-        elif self.breaker_type == BreakerType.SPREAD:
-            violation = current_value > self.threshold
-        elif self.breaker_type == BreakerType.VOLATILITY:
-            violation = current_value > self.threshold
-        elif self.breaker_type == BreakerType.ERROR_RATE:
-            violation = current_value > self.threshold
-        elif self.breaker_type == BreakerType.DRAWDOWN:
-            violation = current_value > self.threshold
-        
-        if violation:
-            self.consecutive_violations += 1
+        t, row = self.table, self.row
+        if current_value * t.direction[row] > t.threshold[row] * t.direction[row]:
+            t.consecutive[row] += 1
         else:
-            self.consecutive_violations = max(0, self.consecutive_violations - 1)
-        
-        return self.consecutive_violations >= self.max_consecutive
-    
+            t.consecutive[row] = max(0, t.consecutive[row] - 1)
+        t.last_value[row] = current_value
+
+        return t.consecutive[row] >= t.max_consecutive[row]
+
     def open(self, trigger_value: float = None):
         """Abrir circuit breaker"""
-        if not self.is_open:
-            self.is_open = True
-            self.opened_at = datetime.now()
-            self.trigger_count += 1
-            self.metadata['last_trigger_value'] = trigger_value
-            self.metadata['last_opened'] = self.opened_at.isoformat()
-            
-            logger.warning(
-                f"🔴 Circuit breaker OPENED: {self.name} (type: {self.breaker_type.value})",
-                extra={
-                    'breaker_name': self.name,
-                    'breaker_type': self.breaker_type.value,
-                    'trigger_value': trigger_value,
-                    'threshold': self.threshold,
-                    'trigger_count': self.trigger_count
-                }
-            )
-            
-            # Ejecutar callback
-            if self.on_open_callback:
-                try:
-                    self.on_open_callback(self)
-                except Exception as e:
-                    logger.error(f"Error in on_open_callback: {e}")
-    
+        t, row = self.table, self.row
+        if t.is_open[row]:
+            return
+
+        t.is_open[row] = True
+        t.open_rows.add(row)
+        t.opened_at[row] = time.monotonic()
+        t.opened_wall[row] = time.time()
+        t.trigger_count[row] += 1
+        self.metadata['last_trigger_value'] = trigger_value
+        self.metadata['last_opened'] = self.opened_at.isoformat()
+
+        logger.warning(
+            f"🔴 Circuit breaker OPENED: {self.name} (type: {self.breaker_type.value})",
+            extra={
+                'breaker_name': self.name,
+                'breaker_type': self.breaker_type.value,
+                'exchange': self.exchange,
+                'symbol': self.symbol,
+                'trigger_value': trigger_value,
+                'threshold': self.threshold,
+                'trigger_count': self.trigger_count
+            }
+        )
+
+        # Ejecutar callback
+        if self.on_open_callback:
+            try:
+                self.on_open_callback(self)
+            except Exception as e:
+                logger.error(f"Error in on_open_callback: {e}")
+
+        self._notify("open", trigger_value=trigger_value)
+
     def can_close(self) -> bool:
         """Verificar si puede cerrarse (cooldown terminado)"""
-        if not self.is_open:
+        t, row = self.table, self.row
+        if not t.is_open[row] or np.isnan(t.opened_at[row]):
             return False
-        
-        if self.opened_at is None:
-            return False
-        
-        elapsed = (datetime.now() - self.opened_at).total_seconds()
-        return elapsed >= self.cooldown_seconds
-    
+
+        return time.monotonic() - t.opened_at[row] >= t.cooldown[row]
+
     def close(self):
         """Cerrar circuit breaker"""
-        if self.is_open:
-            duration = None
-            if self.opened_at:
-                duration = (datetime.now() - self.opened_at).total_seconds()
-            
-            self.is_open = False
-            self.consecutive_violations = 0
-            self.metadata['last_closed'] = datetime.now().isoformat()
-            self.metadata['last_duration'] = duration
-            
-            logger.info(
-                f"🟢 Circuit breaker CLOSED: {self.name} (duration: {duration:.0f}s)",
-                extra={
-                    'breaker_name': self.name,
-                    'breaker_type': self.breaker_type.value,
-                    'duration_seconds': duration
-                }
-            )
-            
-            # Ejecutar callback
-            if self.on_close_callback:
-                try:
-                    self.on_close_callback(self)
-                except Exception as e:
-                    logger.error(f"Error in on_close_callback: {e}")
-            
-            self.opened_at = None
-    
+        t, row = self.table, self.row
+        if not t.is_open[row]:
+            return
+
+        duration = time.monotonic() - t.opened_at[row] if not np.isnan(t.opened_at[row]) else 0.0
+
+        t.is_open[row] = False
+        t.open_rows.discard(row)
+        t.consecutive[row] = 0
+        self.metadata['last_closed'] = datetime.now().isoformat()
+        self.metadata['last_duration'] = duration
+
+        logger.info(
+            f"🟢 Circuit breaker CLOSED: {self.name} (duration: {duration:.0f}s)",
+            extra={
+                'breaker_name': self.name,
+                'breaker_type': self.breaker_type.value,
+                'exchange': self.exchange,
+                'symbol': self.symbol,
+                'duration_seconds': duration
+            }
+        )
+
+        # Ejecutar callback
+        if self.on_close_callback:
+            try:
+                self.on_close_callback(self)
+            except Exception as e:
+                logger.error(f"Error in on_close_callback: {e}")
+
+        self._notify("close", duration=duration)
+
+        t.opened_at[row] = np.nan
+        t.opened_wall[row] = np.nan
+
+    def _notify(self, action: str, **details):
+        """Avisar a los listeners del manager de una transición"""
+        for listener in self.listeners:
+            try:
+                listener(action, self, **details)
+            except Exception as e:
+                logger.error(f"Error in breaker listener: {e}")
+
     def force_close(self):
         """Forzar cierre del breaker (ignora cooldown)"""
         if self.is_open:
             logger.warning(f"⚠️ Force closing circuit breaker: {self.name}")
             self.close()
 
+    def to_dict(self) -> dict:
+        """Estado serializable"""
+        return {
+            "is_open": self.is_open,
+            "trigger_count": self.trigger_count,
+            "opened_at": self.opened_at.isoformat() if self.opened_at else None,
+            "threshold": self.threshold,
+            "metadata": self.metadata
+        }
+
+def transition_event(action: str, breaker: CircuitBreaker, **details) -> dict:
+    """
+    Transición de un breaker como dict serializable (historial, IPC entre procesos)
+
+    Args:
+        action: ``open`` o ``close``
+        breaker: Breaker que cambió de estado
+        **details: trigger_value (open) o duration (close)
+    """
+    return {
+        "action": action,
+        "key": (breaker.exchange, breaker.symbol, breaker.breaker_type.value),
+        "name": breaker.name,
+        "timestamp": datetime.utcnow(),
+        "trigger_value": details.get("trigger_value"),
+        "threshold": breaker.threshold,
+        "duration": details.get("duration"),
+        "trigger_count": breaker.trigger_count
+    }
+
 class CircuitBreakerManager:
-    """Gestor centralizado de circuit breakers"""
-    
+    """
+    Gestor centralizado de circuit breakers
+
+    Hay un breaker global por tipo y, si se configuran (``circuit_breaker_overrides``)
+    o se crean explícitamente (``create_breaker``, ``rows_for``), uno por
+    (exchange, tipo) y por (exchange, símbolo, tipo), todos en la misma
+    BreakerTable. ``check`` evalúa un valor contra los niveles existentes;
+    ``check_many`` evalúa un lote arbitrario de breakers en un solo paso
+    vectorizado.
+    """
+
     def __init__(self, config: dict):
         self.config = config
+        self.table = BreakerTable()
+        self._handles: List[CircuitBreaker] = []
         self.breakers: Dict[str, CircuitBreaker] = {}
-        self.exchange_breakers: Dict[str, Dict[str, CircuitBreaker]] = {}
+        self._defaults: Dict[BreakerType, Tuple[float, float, int]] = {}
+        self._listeners: List[Callable] = []
+        # Filas por (tipo, exchange, símbolo) para check/is_open escalares
+        self._check_rows: Dict[Tuple[str, Optional[str], Optional[str]], Tuple[int, ...]] = {}
+        self._open_rows: Dict[Tuple[str, Optional[str], Optional[str]], Tuple[int, ...]] = {}
+        # Claves abiertas en otro proceso (shards): solo se consultan, sin filas ni listeners
+        self.remote_open: Set[BreakerKey] = set()
         self._initialize_breakers()
-        
+
         logger.info("Circuit Breaker Manager initialized")
-    
+
     def _initialize_breakers(self):
         """Inicializar breakers desde configuración"""
         cfg = self.config.get("market_maker_v4_2", {})
-        
+        cooldown = cfg.get("circuit_cooldown_seconds", 300)
+        max_consecutive = cfg.get("circuit_max_consecutive", 3)
+
+        thresholds = {
+            BreakerType.LATENCY: cfg.get("latency_threshold_ms", 500),
+            BreakerType.SPREAD: cfg.get("spread_threshold_bps", 20),
+            BreakerType.VOLATILITY: cfg.get("volatility_threshold", 0.05),
+            BreakerType.ERROR_RATE: cfg.get("error_rate_threshold", 0.1),
+            BreakerType.DRAWDOWN: cfg.get("drawdown_threshold_bps", 100),
+            BreakerType.DEPTH: cfg.get("depth_threshold_usd", 1000),
+        }
+
         # Breakers globales
-        self.breakers["latency"] = CircuitBreaker(
-            name="Global Latency",
-            breaker_type=BreakerType.LATENCY,
-            threshold=cfg.get("latency_threshold_ms", 500),
-            cooldown_seconds=cfg.get("circuit_cooldown_seconds", 300)
-        )
-        
-        self.breakers["spread"] = CircuitBreaker(
-            name="Global Spread",
-            breaker_type=BreakerType.SPREAD,
-            threshold=cfg.get("spread_threshold_bps", 20),
-            cooldown_seconds=cfg.get("circuit_cooldown_seconds", 300)
-        )
-        
-        self.breakers["volatility"] = CircuitBreaker(
-            name="Global Volatility",
-            breaker_type=BreakerType.VOLATILITY,
-            threshold=cfg.get("volatility_threshold", 0.05),
-            cooldown_seconds=cfg.get("circuit_cooldown_seconds", 300)
-        )
-        
-        self.breakers["error_rate"] = CircuitBreaker(
-            name="Global Error Rate",
-            breaker_type=BreakerType.ERROR_RATE,
-            threshold=cfg.get("error_rate_threshold", 0.1),
-            cooldown_seconds=cfg.get("circuit_cooldown_seconds", 300)
-        )
-        
-        self.breakers["drawdown"] = CircuitBreaker(
-            name="Global Drawdown",
-            breaker_type=BreakerType.DRAWDOWN,
-            threshold=cfg.get("drawdown_threshold_bps", 100),
-            cooldown_seconds=cfg.get("circuit_cooldown_seconds", 300)
+        for breaker_type, threshold in thresholds.items():
+            self._defaults[breaker_type] = (threshold, cooldown, max_consecutive)
+            self.breakers[breaker_type.value] = self._create(ANY, ANY, breaker_type)
+
+        # Breakers por exchange / símbolo: solo los configurados explícitamente
+        for override in cfg.get("circuit_breaker_overrides", []):
+            self.create_breaker(
+                override["exchange"],
+                override.get("symbol"),
+                BreakerType(override["type"]),
+                override.get("threshold"),
+                override.get("cooldown_seconds"),
+                override.get("max_consecutive")
+            )
+
+    def _create(self, exchange: str, symbol: str, breaker_type: BreakerType,
+                threshold: float = None, cooldown: float = None,
+                max_consecutive: int = None) -> CircuitBreaker:
+        key = (exchange, symbol, breaker_type.value)
+        row = self.table.index.get(key)
+        if row is not None:
+            return self._handles[row]
+
+        default_threshold, default_cooldown, default_consecutive = self._defaults[breaker_type]
+        row = self.table.add(
+            key,
+            default_threshold if threshold is None else threshold,
+            default_cooldown if cooldown is None else cooldown,
+            default_consecutive if max_consecutive is None else max_consecutive,
+            BREAKER_DIRECTIONS.get(breaker_type, 1.0)
         )
-    
-    def create_exchange_breaker(self, exchange: str, breaker_type: BreakerType, 
+
+        if exchange == ANY:
+            name = f"Global {breaker_type.value.replace('_', ' ').title()}"
+        elif symbol == ANY:
+            name = f"{exchange} {breaker_type.value}"
+        else:
+            name = f"{exchange} {symbol} {breaker_type.value}"
+
+        breaker = CircuitBreaker(self.table, row, name, breaker_type, exchange, symbol, self._listeners)
+        self._handles.append(breaker)
+        # Una fila nueva puede cambiar los niveles existentes de una consulta check/is_open
+        self._check_rows.clear()
+        self._open_rows.clear()
+        return breaker
+
+    def add_listener(self, callback: Callable):
+        """
+        Registrar un listener de transiciones de cualquier breaker
+
+        El callback recibe ``(action, breaker, **details)`` con action ``open``
+        (details: trigger_value) o ``close`` (details: duration).
+        """
+        self._listeners.append(callback)
+
+    def create_breaker(self, exchange: str, symbol: Optional[str], breaker_type: BreakerType,
+                       threshold: float = None, cooldown: int = None,
+                       max_consecutive: int = None) -> CircuitBreaker:
+        """Crear (u obtener) el breaker de un (exchange, símbolo, tipo)"""
+        return self._create(exchange or ANY, symbol or ANY, breaker_type, threshold, cooldown, max_consecutive)
+
+    def create_exchange_breaker(self, exchange: str, breaker_type: BreakerType,
                                 threshold: float, cooldown: int) -> CircuitBreaker:
         """Crear breaker específico para un exchange"""
-        if exchange not in self.exchange_breakers:
-            self.exchange_breakers[exchange] = {}
-        
-        breaker = CircuitBreaker(
-            name=f"{exchange} {breaker_type.value}",
-            breaker_type=breaker_type,
-            threshold=threshold,
-            cooldown_seconds=cooldown
-        )
-        
-        self.exchange_breakers[exchange][breaker_type.value] = breaker
+        breaker = self.create_breaker(exchange, None, breaker_type, threshold, cooldown)
         logger.info(f"Created exchange-specific breaker: {breaker.name}")
-        
         return breaker
-    
-    def check(self, breaker_name: str, current_value: float, 
+
+    def get_breaker(self, breaker_name: str, exchange: str = None, symbol: str = None) -> Optional[CircuitBreaker]:
+        """Obtener un breaker existente"""
+        row = self.table.index.get((exchange or ANY, symbol or ANY, breaker_name))
+        return None if row is None else self._handles[row]
+
+    def set_remote_open(self, keys: Set[BreakerKey]):
+        """
+        Reemplazar el conjunto de breakers abiertos en otros procesos
+
+        ``is_open`` y las pausas los tienen en cuenta, pero no se crean ni
+        modifican filas: no se notifica a los listeners y ``check`` no puede
+        cerrarlos al vencer el cooldown local. Los cierra su dueño.
+        """
+        self.remote_open = set(keys)
+
+    def is_remote_open(self, breaker_name: str, exchange: str = None, symbol: str = None) -> bool:
+        """True si otro proceso tiene abierto el breaker (global, de exchange o de símbolo)"""
+        remote = self.remote_open
+        if not remote:
+            return False
+        if (ANY, ANY, breaker_name) in remote:
+            return True
+        if exchange:
+            if (exchange, ANY, breaker_name) in remote:
+                return True
+            if symbol and (exchange, symbol, breaker_name) in remote:
+                return True
+        return False
+
+    def rows_for(self, keys: Sequence[BreakerKey]) -> np.ndarray:
+        """
+        Resolver (y crear si hace falta) las filas de una lista de claves
+        (exchange, símbolo, tipo). El resultado se puede cachear y reutilizar
+        con ``check_rows`` en cada tick.
+        """
+        return np.fromiter(
+            (self._create(exchange or ANY, symbol or ANY, BreakerType(breaker_name)).row
+             for exchange, symbol, breaker_name in keys),
+            dtype=np.int64, count=len(keys)
+        )
+
+    def check_rows(self, rows: np.ndarray, values: np.ndarray) -> np.ndarray:
+        """
+        Evaluar un lote de breakers en un solo paso vectorizado
+
+        Args:
+            rows: Filas de la tabla (sin repetidos)
+            values: Valor actual para cada fila
+
+        Returns:
+            Array booleano con el estado abierto de cada fila tras la evaluación
+        """
+        t = self.table
+        rows = np.asarray(rows, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        now = time.monotonic()
+
+        was_open = t.is_open[rows]
+        consecutive = t.consecutive[rows]
+        direction = t.direction[rows]
+        violation = values * direction > t.threshold[rows] * direction
+
+        # Breakers cerrados: contar violaciones consecutivas (con decay)
+        updated = np.where(violation, consecutive + 1, np.maximum(consecutive - 1, 0))
+        consecutive = np.where(was_open, consecutive, updated)
+        t.consecutive[rows] = consecutive
+        t.last_value[rows] = values
+
+        to_open = ~was_open & (consecutive >= t.max_consecutive[rows])
+        to_close = was_open & (now - t.opened_at[rows] >= t.cooldown[rows])
+
+        # Solo las transiciones (raras) pasan por Python: logging y callbacks
+        for i in np.flatnonzero(to_open):
+            self._handles[rows[i]].open(float(values[i]))
+        for i in np.flatnonzero(to_close):
+            self._handles[rows[i]].close()
+
+        return t.is_open[rows]
+
+    def check_many(self, values: Mapping[BreakerKey, float]) -> Dict[BreakerKey, bool]:
+        """
+        Evaluar muchos breakers a la vez
+
+        Args:
+            values: {(exchange, símbolo, tipo): valor}; None en exchange/símbolo
+                    se interpreta como breaker global / de exchange
+
+        Returns:
+            {(exchange, símbolo, tipo): is_open}
+        """
+        keys = list(values.keys())
+        rows = self.rows_for(keys)
+        states = self.check_rows(rows, np.fromiter(values.values(), dtype=np.float64, count=len(keys)))
+        return dict(zip(keys, states.tolist()))
+
+    def check(self, breaker_name: str, current_value: float,
               exchange: str = None, symbol: str = None):
         """
         Verificar un circuit breaker
-        
+
         Args:
             breaker_name: Nombre del breaker (latency, spread, etc)
             current_value: Valor actual a verificar
             exchange: Exchange opcional para breakers específicos
-            symbol: Símbolo opcional para logging
+            symbol: Símbolo opcional (breaker por exchange y símbolo)
+
+        Se evalúan, en orden, el breaker global y los de exchange y símbolo
+        que existan (``circuit_breaker_overrides``, ``create_breaker`` o
+        ``rows_for``); aquí no se crean. El primer nivel abierto corta la
+        evaluación: solo se comprueba si puede cerrarse. Un ``breaker_name``
+        que no corresponde a ningún BreakerType se ignora.
         """
-        # Verificar breaker global
-        if breaker_name in self.breakers:
-            breaker = self.breakers[breaker_name]
-            
-            # Si ya está abierto, verificar si puede cerrarse
-            if breaker.is_open:
-                if breaker.can_close():
-                    breaker.close()
+        cache_key = (breaker_name, exchange, symbol)
+        rows = self._check_rows.get(cache_key)
+        if rows is None:
+            keys = [(ANY, ANY, breaker_name)]
+            if exchange:
+                keys.append((exchange, ANY, breaker_name))
+                if symbol:
+                    keys.append((exchange, symbol, breaker_name))
+            index = self.table.index
+            rows = tuple(index[key] for key in keys if key in index)
+            self._check_rows[cache_key] = rows
+
+        # Camino escalar: 1-3 filas no compensan el coste de crear arrays NumPy
+        t = self.table
+        value = float(current_value)
+        for row in rows:
+            t.last_value[row] = value
+            if row in t.open_rows:
+                if time.monotonic() - t.opened_at.item(row) >= t.cooldown.item(row):
+                    self._handles[row].close()
                 return
-            
-            # Verificar si debe abrirse
-            if breaker.should_open(current_value):
-                breaker.open(current_value)
-        
-        # Verificar breaker específico de exchange si existe
-        if exchange and exchange in self.exchange_breakers:
-            if breaker_name in self.exchange_breakers[exchange]:
-                breaker = self.exchange_breakers[exchange][breaker_name]
-                
-                if breaker.is_open:
-                    if breaker.can_close():
-                        breaker.close()
-                    return
-                
-                if breaker.should_open(current_value):
-                    breaker.open(current_value)
-    
-    def is_open(self, breaker_name: str, exchange: str = None) -> bool:
+            direction = t.direction.item(row)
+            previous = t.consecutive.item(row)
+            if value * direction > t.threshold.item(row) * direction:
+                consecutive = previous + 1
+            else:
+                consecutive = previous - 1 if previous else 0
+            if consecutive != previous:
+                t.consecutive[row] = consecutive
+            if consecutive >= t.max_consecutive.item(row):
+                self._handles[row].open(value)
+
+    def is_open(self, breaker_name: str, exchange: str = None, symbol: str = None) -> bool:
         """
         Verificar si un breaker está abierto
-        
+
         Args:
             breaker_name: Nombre del breaker
             exchange: Exchange opcional
-            
+            symbol: Símbolo opcional
+
         Returns:
-            True si está abierto
+            True si está abierto (a nivel global, de exchange o de símbolo),
+            aquí o en otro proceso (``remote_open``)
         """
-        # Verificar breaker global
-        if breaker_name in self.breakers and self.breakers[breaker_name].is_open:
+        if self.remote_open and self.is_remote_open(breaker_name, exchange, symbol):
             return True
-        
-        # Verificar breaker de exchange
-        if exchange and exchange in self.exchange_breakers:
-            if breaker_name in self.exchange_breakers[exchange]:
-                return self.exchange_breakers[exchange][breaker_name].is_open
-        
-        return False
-    
+
+        open_rows = self.table.open_rows
+        if not open_rows:
+            return False
+
+        cache_key = (breaker_name, exchange, symbol)
+        rows = self._open_rows.get(cache_key)
+        if rows is None:
+            keys = [(ANY, ANY, breaker_name)]
+            if exchange:
+                keys.append((exchange, ANY, breaker_name))
+                if symbol:
+                    keys.append((exchange, symbol, breaker_name))
+            index = self.table.index
+            rows = tuple(index[key] for key in keys if key in index)
+            self._open_rows[cache_key] = rows
+
+        return not open_rows.isdisjoint(rows)
+
     def get_open_count(self) -> int:
         """Contar breakers abiertos"""
-        count = sum(1 for b in self.breakers.values() if b.is_open)
-        
-        for exchange_breakers in self.exchange_breakers.values():
-            count += sum(1 for b in exchange_breakers.values() if b.is_open)
-        
-        return count
-    
+        return int(self.table.is_open[:len(self.table)].sum())
+
     def get_status(self) -> dict:
         """Obtener estado de todos los breakers"""
         status = {
-            "global": {
-                name: {
-                    "is_open": breaker.is_open,
-                    "trigger_count": breaker.trigger_count,
-                    "opened_at": breaker.opened_at.isoformat() if breaker.opened_at else None,
-                    "threshold": breaker.threshold,
-                    "metadata": breaker.metadata
-                }
-                for name, breaker in self.breakers.items()
-            },
-            "exchanges": {}
+            "global": {name: breaker.to_dict() for name, breaker in self.breakers.items()},
+            "exchanges": {},
+            "symbols": {}
         }
-        
-        for exchange, breakers in self.exchange_breakers.items():
-            status["exchanges"][exchange] = {
-                name: {
-                    "is_open": breaker.is_open,
-                    "trigger_count": breaker.trigger_count,
-                    "opened_at": breaker.opened_at.isoformat() if breaker.opened_at else None,
-                    "threshold": breaker.threshold
-                }
-                for name, breaker in breakers.items()
-            }
-        
+
+        for breaker in self._handles:
+            if breaker.exchange == ANY:
+                continue
+            entry = breaker.to_dict()
+            entry.pop("metadata")
+            if breaker.symbol == ANY:
+                status["exchanges"].setdefault(breaker.exchange, {})[breaker.breaker_type.value] = entry
+            else:
+                (status["symbols"].setdefault(breaker.exchange, {})
+                 .setdefault(breaker.symbol, {})[breaker.breaker_type.value]) = entry
+
         return status
-    
+
     def get_open_breakers(self) -> List[CircuitBreaker]:
         """Obtener lista de breakers abiertos"""
-        open_breakers = [b for b in self.breakers.values() if b.is_open]
-        
-        for exchange_breakers in self.exchange_breakers.values():
-            open_breakers.extend([b for b in exchange_breakers.values() if b.is_open])
-        
-        return open_breakers
-    
+        return [self._handles[row] for row in np.flatnonzero(self.table.is_open[:len(self.table)])]
+
     def close_all(self):
         """Cerrar todos los breakers (emergencia)"""
         logger.warning("🚨 Force closing ALL circuit breakers")
-        
-        for breaker in self.breakers.values():
-            if breaker.is_open:
-                breaker.force_close()
-        
-        for exchange_breakers in self.exchange_breakers.values():
-            for breaker in exchange_breakers.values():
-                if breaker.is_open:
-                    breaker.force_close()
 
+        for breaker in self.get_open_breakers():
+            breaker.force_close()
@@ -2,26 +2,116 @@
 Sistema de base de datos con SQLAlchemy
 """
 
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Boolean, JSON, Text
+from sqlalchemy import create_engine, event, insert, select, Column, Integer, BigInteger, String, Float, DateTime, Boolean, JSON, Text, Index
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime
+import hashlib
 import os
 
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./marketmaker.db")
+def normalize_url(url: str) -> str:
+    """``postgres://`` (Heroku/Supabase) -> ``postgresql://``, que es lo que acepta SQLAlchemy"""
+    if url.startswith("postgres://"):
+        return "postgresql://" + url.split("://", 1)[1]
+    return url
 
-engine = create_engine(
-    DATABASE_URL,
-    echo=False,
-    connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
-)
+DATABASE_URL = normalize_url(os.getenv("DATABASE_URL", "sqlite:///./marketmaker.db"))
+
+# Pool para backends con servidor (Postgres). pre_ping descarta conexiones
+# cortadas por el servidor o un pgbouncer antes de usarlas; recycle las
+# renueva antes de que las cierre un idle timeout intermedio.
+POOL_SETTINGS = {
+    "pool_size": int(os.getenv("DB_POOL_SIZE", "10")),
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20")),
+    "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+    "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    "pool_pre_ping": True,
+}
+
+# Sentencias preparadas cacheadas por conexión en asyncpg (0 = desactivar,
+# necesario detrás de pgbouncer en modo transaction)
+PREPARED_STATEMENT_CACHE_SIZE = int(os.getenv("DB_PREPARED_STATEMENT_CACHE_SIZE", "500"))
+
+def engine_options(url: str, is_async: bool = False) -> dict:
+    """Argumentos de create_engine según el backend de ``url``"""
+    if url.startswith("sqlite"):
+        return {} if is_async else {"connect_args": {"check_same_thread": False}}
+
+    options = dict(POOL_SETTINGS)
+    if is_async and "+asyncpg" in url:
+        options["connect_args"] = {"prepared_statement_cache_size": PREPARED_STATEMENT_CACHE_SIZE}
+    return options
+
+engine = create_engine(DATABASE_URL, echo=False, **engine_options(DATABASE_URL))
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Pragmas SQLite aplicados a cada conexión nueva (sync y async).
+# synchronous=NORMAL en WAL: un corte de luz puede perder las últimas
+# transacciones pero nunca corrompe la base; FULL = fsync en cada commit.
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "mmap_size_mb": int(os.getenv("SQLITE_MMAP_SIZE_MB", "256")),
+    "cache_size_mb": int(os.getenv("SQLITE_CACHE_SIZE_MB", "64")),
+    "busy_timeout_ms": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+}
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA journal_mode={SQLITE_PRAGMAS['journal_mode']}")
+        cursor.execute(f"PRAGMA synchronous={SQLITE_PRAGMAS['synchronous']}")
+        cursor.execute(f"PRAGMA mmap_size={int(SQLITE_PRAGMAS['mmap_size_mb']) * 1024 * 1024}")
+        # cache_size negativo = KiB
+        cursor.execute(f"PRAGMA cache_size={-int(SQLITE_PRAGMAS['cache_size_mb']) * 1024}")
+        cursor.execute(f"PRAGMA busy_timeout={int(SQLITE_PRAGMAS['busy_timeout_ms'])}")
+    finally:
+        cursor.close()
+
+def configure_sqlite(settings: dict):
+    """
+    Sobrescribir los pragmas desde la configuración (sección persistence.sqlite)
+
+    Recicla el pool síncrono para que las conexiones abiertas los tomen;
+    llamar antes de abrir conexiones con el motor asíncrono.
+    """
+    SQLITE_PRAGMAS.update({key: value for key, value in settings.items() if key in SQLITE_PRAGMAS})
+    if engine.dialect.name == "sqlite":
+        engine.dispose()
+
+if engine.dialect.name == "sqlite":
+    event.listen(engine, "connect", _apply_sqlite_pragmas)
+
+def to_async_url(url: str) -> str:
+    """URL síncrona -> driver asíncrono (aiosqlite / asyncpg)"""
+    if url.startswith("sqlite:"):
+        return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+    if url.startswith("postgres://"):
+        return url.replace("postgres://", "postgresql+asyncpg://", 1)
+    if url.startswith("postgresql://") or url.startswith("postgresql+psycopg2://"):
+        return "postgresql+asyncpg://" + url.split("://", 1)[1]
+    return url
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", to_async_url(DATABASE_URL))
+
+# Motor asíncrono para los endpoints: nunca bloquea el event loop
+async_engine = create_async_engine(ASYNC_DATABASE_URL, echo=False, **engine_options(ASYNC_DATABASE_URL, is_async=True))
+
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
+if async_engine.dialect.name == "sqlite":
+    event.listen(async_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+
 class Trade(Base):
     """Registro de trades ejecutados"""
     __tablename__ = "trades"
+    __table_args__ = (
+        Index("ix_trades_exchange_symbol_timestamp", "exchange", "symbol", "timestamp"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     order_id = Column(String, unique=True, index=True)
@@ -81,6 +171,9 @@ class SystemMetric(Base):
 class CircuitBreakerEvent(Base):
     """Eventos de circuit breakers"""
     __tablename__ = "circuit_breaker_events"
+    __table_args__ = (
+        Index("ix_circuit_breaker_events_type_timestamp", "breaker_type", "timestamp"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     timestamp = Column(DateTime, default=datetime.utcnow, index=True)
@@ -138,19 +231,117 @@ class BalanceSnapshot(Base):
     usd_value = Column(Float, nullable=True)
     snapshot_metadata = Column(JSON, nullable=True)
 
+class EquityPoint(Base):
+    """Curva de equity muestreada (mark-to-market)"""
+    __tablename__ = "equity_curve"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    timestamp = Column(DateTime, default=datetime.utcnow, index=True)
+    equity = Column(Float)
+    peak = Column(Float)
+    drawdown_bps = Column(Float)
+    fees = Column(Float, default=0)
+    point_metadata = Column(JSON, nullable=True)
+
+class MetricRollup(Base):
+    """Agregados por bucket temporal (1m/5m/1h/1d) de las tablas de series"""
+    __tablename__ = "metric_rollups"
+    __table_args__ = (
+        Index("ix_metric_rollups_lookup", "source", "metric", "resolution", "series", "bucket_start", unique=True),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    source = Column(String)  # system_metrics/exchange_health/balance_snapshots
+    series = Column(String, default="")  # exchange, exchange:currency o "" (global)
+    metric = Column(String)
+    resolution = Column(Integer)  # segundos por bucket
+    bucket_start = Column(DateTime)
+    count = Column(Integer)
+    min = Column(Float)
+    max = Column(Float)
+    sum = Column(Float)
+    last = Column(Float)
+
+class FillWatermark(Base):
+    """Marca de sincronización de fills por (exchange, símbolo)"""
+    __tablename__ = "fill_watermarks"
+    __table_args__ = (
+        Index("ix_fill_watermarks_exchange_symbol", "exchange", "symbol", unique=True),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    exchange = Column(String)
+    symbol = Column(String)
+    since_ms = Column(BigInteger)  # timestamp (ms) del último fill aplicado
+    boundary_ids = Column(JSON, nullable=True)  # ids de fills ya aplicados con ese mismo timestamp
+    fills_synced = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class SchemaVersion(Base):
+    """Huella del esquema aplicado por init_db"""
+    __tablename__ = "schema_version"
+    
+    id = Column(Integer, primary_key=True)
+    version = Column(String)
+    applied_at = Column(DateTime, default=datetime.utcnow)
+
+def schema_version() -> str:
+    """Huella del esquema declarado: cambia al añadir tablas, columnas o índices"""
+    parts = []
+    for table in Base.metadata.sorted_tables:
+        parts.append(table.name)
+        parts.extend(f"{column.name}:{column.type}" for column in table.columns)
+        parts.extend(sorted(index.name for index in table.indexes))
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()[:16]
+
+def _applied_version():
+    try:
+        with engine.connect() as conn:
+            return conn.execute(
+                select(SchemaVersion.version).order_by(SchemaVersion.id.desc()).limit(1)
+            ).scalar()
+    except DBAPIError:
+        # Base nueva: todavía no hay tabla schema_version
+        return None
+
+_schema_ready = False
+
 # Crear todas las tablas
-def init_db():
-    """Inicializar base de datos"""
+def init_db(force: bool = False) -> bool:
+    """
+    Inicializar base de datos (idempotente)
+
+    Solo ejecuta create_all y la creación de índices si la huella del esquema
+    declarado difiere de la sellada en la base; en el mismo proceso, las
+    llamadas siguientes no tocan la base.
+
+    Returns:
+        True si se aplicaron cambios de esquema
+    """
+    global _schema_ready
+    if _schema_ready and not force:
+        return False
+    
+    version = schema_version()
+    if not force and _applied_version() == version:
+        _schema_ready = True
+        return False
+    
     Base.metadata.create_all(bind=engine)
+    # create_all no añade índices nuevos a tablas que ya existen
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+    
+    if _applied_version() != version:
+        with engine.begin() as conn:
+            conn.execute(insert(SchemaVersion).values(version=version, applied_at=datetime.utcnow()))
+    
+    _schema_ready = True
+    return True
 
-def get_db():
-    """Dependency para FastAPI"""
-    db = SessionLocal()
-    try:
+async def get_async_db():
+    """Dependency asíncrona para FastAPI"""
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
-
-# Inicializar al importar
-init_db()
 
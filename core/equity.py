@@ -0,0 +1,246 @@
+"""
+Equity mark-to-market incremental, pico y drawdown en O(1)
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Tuple
+import numpy as np
+from core.circuit_breaker import ANY, BreakerType, CircuitBreakerManager
+from core.logger import get_logger
+
+logger = get_logger("equity", "equity.log")
+
+
+class EquityTracker:
+    """
+    Mantiene la equity como ``Σ cash + Σ tamaño · mark`` y la actualiza por eventos:
+
+    - ``on_price``: un tick mueve la equity en ``tamaño · Δmark`` de ese par
+    - ``on_fill``: un fill mueve la equity en ``qty · (mark - precio) - fee``
+    - ``set_account``: re-ancla un exchange con su balance y posiciones reales
+      (reconciliación periódica, corrige la deriva de los incrementos)
+
+    Cada cambio actualiza el pico, el drawdown en bps y el breaker global de
+    drawdown, todo en O(1). La curva se muestrea como mucho una vez cada
+    ``curve_interval`` segundos; los listeners reciben cada punto muestreado.
+    """
+
+    def __init__(self, config: dict, breaker_manager: CircuitBreakerManager):
+        cfg = config.get("market_maker_v4_2", {})
+        equity_cfg = cfg.get("equity", {})
+
+        self.quote_currency = equity_cfg.get("quote_currency", "USDT")
+        self.reconcile_interval = float(equity_cfg.get("reconcile_interval", 60))
+        self.curve_interval = float(equity_cfg.get("curve_interval", 60))
+
+        self.breaker_manager = breaker_manager
+        self._rows = breaker_manager.rows_for([(ANY, ANY, BreakerType.DRAWDOWN.value)])
+        self._value = np.zeros(1, dtype=np.float64)
+
+        self.cash: Dict[str, float] = {}
+        # (exchange, symbol) -> tamaño en unidades base (negativo = short)
+        self.positions: Dict[Tuple[str, str], float] = {}
+        self.marks: Dict[Tuple[str, str], float] = {}
+        # exchange -> epoch (ms) del último re-anclaje; fills anteriores ya están en el balance
+        self.anchored_at: Dict[str, int] = {}
+
+        self.equity = 0.0
+        self.peak = 0.0
+        self.drawdown_bps = 0.0
+        self.max_drawdown_bps = 0.0
+        self.fees = 0.0
+        self.updates = 0
+
+        self.curve: Deque[dict] = deque(maxlen=int(equity_cfg.get("curve_size", 1440)))
+        self._last_sample = 0.0
+        self._listeners: List[Callable] = []
+
+        logger.info(
+            f"Equity tracker initialized (reconcile: {self.reconcile_interval}s, "
+            f"curve: {self.curve_interval}s)"
+        )
+
+    @property
+    def initialized(self) -> bool:
+        """True tras la primera reconciliación de algún exchange"""
+        return bool(self.cash)
+
+    def add_listener(self, callback: Callable):
+        """Registrar un callback (sync o async) que recibe cada punto de la curva"""
+        self._listeners.append(callback)
+
+    # ------------------------------------------------------------------
+    # Eventos
+    # ------------------------------------------------------------------
+
+    def on_price(self, exchange: str, symbol: str, price: float):
+        """Nuevo mark para un (exchange, símbolo)"""
+        key = (exchange, symbol)
+        previous = self.marks.get(key)
+        self.marks[key] = price
+
+        size = self.positions.get(key)
+        if size and previous is not None and price != previous:
+            self._apply(size * (price - previous))
+
+    def on_tops(self, books: Dict[str, Dict[str, dict]]):
+        """Marks desde un snapshot de tops ({exchange: {símbolo: {bid, ask}}})"""
+        for exchange, symbols in books.items():
+            for symbol, top in symbols.items():
+                if top and top.get("bid") and top.get("ask"):
+                    self.on_price(exchange, symbol, (top["bid"] + top["ask"]) / 2)
+
+    def on_fill(self, exchange: str, symbol: str, side: str, amount: float,
+                price: float, fee: float = 0.0, timestamp: int = None):
+        """
+        Aplicar un fill
+
+        Los fills de un exchange aún sin anclar, o anteriores a su último
+        ``set_account``, ya están reflejados en el balance y se ignoran.
+
+        Args:
+            exchange: Nombre del exchange
+            symbol: Símbolo (formato de configuración)
+            side: buy | sell
+            amount: Cantidad en unidades base
+            price: Precio de ejecución
+            fee: Comisión en la moneda de cotización
+            timestamp: Momento del fill (epoch ms)
+        """
+        anchored_at = self.anchored_at.get(exchange)
+        if anchored_at is None or (timestamp is not None and timestamp <= anchored_at):
+            return
+
+        key = (exchange, symbol)
+        qty = amount if side == "buy" else -amount
+        mark = self.marks.setdefault(key, price)
+
+        self.positions[key] = self.positions.get(key, 0.0) + qty
+        self.cash[exchange] = self.cash.get(exchange, 0.0) - qty * price - fee
+        self.fees += fee
+        self._apply(qty * (mark - price) - fee)
+
+    def set_account(self, exchange: str, balance_total: float, positions: List[dict]):
+        """
+        Re-anclar un exchange con datos del exchange
+
+        La equity del exchange queda igual al balance total en la moneda de
+        cotización (mismo criterio que /metrics) y las posiciones se valoran a
+        partir de aquí con los marks en vivo.
+
+        Args:
+            exchange: Nombre del exchange
+            balance_total: Balance total en ``quote_currency``
+            positions: Posiciones en formato ccxt (``fetch_positions``)
+        """
+        for key in [key for key in self.positions if key[0] == exchange]:
+            del self.positions[key]
+
+        value = 0.0
+        for position in positions:
+            contracts = position.get("contracts") or 0
+            if not contracts:
+                continue
+            symbol = position.get("symbol", "").split(":")[0]
+            key = (exchange, symbol)
+            size = float(contracts) * float(position.get("contractSize") or 1)
+            if position.get("side") == "short":
+                size = -size
+            mark = self.marks.get(key) or position.get("markPrice") or position.get("entryPrice") or 0.0
+            self.marks[key] = float(mark)
+            self.positions[key] = size
+            value += size * self.marks[key]
+
+        self.cash[exchange] = float(balance_total) - value
+        self.anchored_at[exchange] = int(time.time() * 1000)
+
+        # Recalcular desde cero (O(posiciones), solo en la reconciliación)
+        self.equity = sum(self.cash.values()) + sum(
+            size * self.marks.get(key, 0.0) for key, size in self.positions.items()
+        )
+        self._apply(0.0)
+
+    def reset_peak(self):
+        """Reiniciar el pico a la equity actual (p.ej. tras un depósito/retiro)"""
+        self.peak = self.equity
+        self._apply(0.0)
+
+    # ------------------------------------------------------------------
+    # Drawdown y curva
+    # ------------------------------------------------------------------
+
+    def _apply(self, delta: float):
+        if not self.cash:
+            return
+
+        self.equity += delta
+        self.updates += 1
+        if self.equity > self.peak:
+            self.peak = self.equity
+
+        drawdown = (self.peak - self.equity) / self.peak * 10000 if self.peak > 0 else 0.0
+        self.drawdown_bps = drawdown
+        if drawdown > self.max_drawdown_bps:
+            self.max_drawdown_bps = drawdown
+
+        self._value[0] = drawdown
+        self.breaker_manager.check_rows(self._rows, self._value)
+
+        now = time.time()
+        if now - self._last_sample >= self.curve_interval:
+            self._sample(now)
+
+    def _sample(self, now: float):
+        self._last_sample = now
+        point = {
+            "timestamp": now,
+            "equity": self.equity,
+            "peak": self.peak,
+            "drawdown_bps": self.drawdown_bps,
+            "fees": self.fees
+        }
+        self.curve.append(point)
+
+        for callback in self._listeners:
+            try:
+                result = callback(point)
+                if asyncio.iscoroutine(result):
+                    asyncio.ensure_future(result)
+            except Exception as e:
+                logger.error(f"Error in equity listener: {e}")
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+
+    def exchange_equity(self, exchange: str) -> float:
+        """Equity de un exchange (cash + posiciones a mark)"""
+        return self.cash.get(exchange, 0.0) + sum(
+            size * self.marks.get(key, 0.0) for key, size in self.positions.items() if key[0] == exchange
+        )
+
+    def get_curve(self, limit: int = 100) -> List[dict]:
+        """Últimos puntos muestreados (más antiguo primero)"""
+        points = list(self.curve)
+        return points[-limit:] if limit else points
+
+    def get_status(self) -> dict:
+        """Equity, pico, drawdown y desglose por exchange"""
+        return {
+            "initialized": self.initialized,
+            "equity": self.equity,
+            "peak": self.peak,
+            "drawdown_bps": round(self.drawdown_bps, 4),
+            "max_drawdown_bps": round(self.max_drawdown_bps, 4),
+            "fees": self.fees,
+            "exchanges": {exchange: self.exchange_equity(exchange) for exchange in self.cash},
+            "positions": [
+                {"exchange": exchange, "symbol": symbol, "size": size, "mark": self.marks.get((exchange, symbol))}
+                for (exchange, symbol), size in self.positions.items() if size
+            ],
+            "updates": self.updates,
+            "curve_points": len(self.curve),
+            "quote_currency": self.quote_currency
+        }
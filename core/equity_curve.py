@@ -0,0 +1,41 @@
+"""
+Curva de equity: escritura asíncrona por lotes en equity_curve
+"""
+
+from datetime import datetime
+from typing import Callable, List
+from core.database import EquityPoint
+from core.persistence import BatchWriter
+
+
+class EquityCurveWriter(BatchWriter):
+    """
+    Persiste los puntos muestreados por EquityTracker
+
+    ``submit`` se registra como listener del tracker; como los puntos ya llegan
+    a lo sumo uno por ``curve_interval``, los lotes son pequeños y el flush por
+    tiempo domina.
+    """
+
+    def __init__(self, session_factory: Callable, config: dict = None):
+        cfg = (config or {}).get("market_maker_v4_2", {}).get("equity", {})
+        super().__init__(
+            "equity_curve",
+            session_factory,
+            queue_size=cfg.get("queue_size", 1000),
+            batch_size=cfg.get("batch_size", 100),
+            flush_interval=cfg.get("flush_interval", 5.0)
+        )
+
+    def write_batch(self, session, batch: List[dict]):
+        """Insertar los puntos del lote"""
+        session.add_all([
+            EquityPoint(
+                timestamp=datetime.utcfromtimestamp(point["timestamp"]),
+                equity=point["equity"],
+                peak=point["peak"],
+                drawdown_bps=point["drawdown_bps"],
+                fees=point["fees"]
+            )
+            for point in batch
+        ])
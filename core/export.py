@@ -0,0 +1,69 @@
+"""
+Exportación en streaming (NDJSON / CSV, gzip opcional) con memoria constante
+"""
+
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, Sequence, Tuple
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+# Bytes acumulados antes de emitir un chunk
+CHUNK_SIZE = 64 * 1024
+
+
+def _plain(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+async def encode_rows(rows: AsyncIterator[Tuple], columns: Sequence[str], fmt: str = "ndjson",
+                      compress: bool = False) -> AsyncIterator[bytes]:
+    """
+    Serializar filas a chunks de bytes a medida que llegan
+
+    Args:
+        rows: Iterador asíncrono de tuplas (mismo orden que ``columns``)
+        columns: Nombres de columna (claves NDJSON / cabecera CSV)
+        fmt: ``ndjson`` o ``csv``
+        compress: Comprimir con gzip sobre la marcha
+
+    Yields:
+        Chunks de ~CHUNK_SIZE bytes (comprimidos si ``compress``)
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    text = io.StringIO()
+    writer = csv.writer(text) if fmt == "csv" else None
+
+    if writer:
+        writer.writerow(columns)
+
+    async for row in rows:
+        if writer:
+            writer.writerow([_plain(value) for value in row])
+        else:
+            text.write(json.dumps({column: _plain(value) for column, value in zip(columns, row)}))
+            text.write("\n")
+
+        if text.tell() >= CHUNK_SIZE:
+            chunk = text.getvalue().encode()
+            text.seek(0)
+            text.truncate()
+            if compressor:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+
+    chunk = text.getvalue().encode()
+    if compressor:
+        chunk = compressor.compress(chunk) + compressor.flush()
+    if chunk:
+        yield chunk
@@ -0,0 +1,281 @@
+"""
+Sincronización incremental de fills (fetch_my_trades) hacia la tabla trades
+"""
+
+import asyncio
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Tuple
+from sqlalchemy import case, func, select
+from core.database import FillWatermark, Trade
+from core.logger import get_logger
+from core.persistence import upsert_insert
+
+logger = get_logger("fill_sync", "database.log")
+
+
+def _fill_key(fill: dict) -> str:
+    """Id del fill; si el exchange no lo da, uno derivado de sus campos"""
+    if fill.get("id"):
+        return str(fill["id"])
+    return f"{fill.get('order')}:{fill.get('timestamp')}:{fill.get('amount')}:{fill.get('price')}"
+
+
+def aggregate_fills(fills: List[dict], exchange: str, symbol: str) -> List[Dict[str, Any]]:
+    """
+    Agrupar fills por orden: cantidad total, precio medio ponderado y comisión
+
+    Returns:
+        Filas para ``trades`` (una por order_id)
+    """
+    orders: Dict[str, Dict[str, Any]] = {}
+    for fill in fills:
+        order_id = str(fill.get("order") or _fill_key(fill))
+        amount = float(fill.get("amount") or 0)
+        price = float(fill.get("price") or 0)
+        fee = fill.get("fee") or {}
+        filled_at = datetime.utcfromtimestamp(fill["timestamp"] / 1000)
+
+        row = orders.get(order_id)
+        if row is None:
+            orders[order_id] = {
+                "order_id": order_id,
+                "exchange": exchange,
+                "symbol": symbol,
+                "side": fill.get("side"),
+                "type": fill.get("type") or "limit",
+                "amount": amount,
+                "price": price,
+                "filled": amount,
+                "fee": float(fee.get("cost") or 0),
+                "fee_currency": fee.get("currency") or "USDT",
+                "status": "filled",
+                "timestamp": filled_at,
+                "filled_at": filled_at,
+            }
+        else:
+            total = row["filled"] + amount
+            if total > 0:
+                row["price"] = (row["price"] * row["filled"] + price * amount) / total
+            row["filled"] = row["amount"] = total
+            row["fee"] += float(fee.get("cost") or 0)
+            row["filled_at"] = max(row["filled_at"], filled_at)
+
+    return list(orders.values())
+
+
+def upsert_fills(session, rows: List[Dict[str, Any]]):
+    """
+    Aplicar fills agregados a ``trades`` con un único INSERT ... ON CONFLICT
+
+    Las órdenes conocidas (creadas por la API) acumulan cantidad, precio medio
+    y comisión, y pasan a ``filled`` al completarse; las desconocidas se
+    insertan ya como ejecutadas.
+    """
+    stmt = upsert_insert(Trade, session.get_bind().dialect.name)
+    if stmt is None:
+        raise ValueError("Fill sync requires SQLite or PostgreSQL (ON CONFLICT)")
+
+    stmt = stmt.values(rows)
+    excluded = stmt.excluded
+    previous = func.coalesce(Trade.filled, 0)
+    filled = previous + excluded.filled
+
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Trade.order_id],
+        set_={
+            "filled": filled,
+            # Órdenes externas: la cantidad conocida crece con cada fill
+            "amount": case((filled > Trade.amount, filled), else_=Trade.amount),
+            "price": (func.coalesce(Trade.price, 0) * previous + excluded.price * excluded.filled) / filled,
+            "fee": func.coalesce(Trade.fee, 0) + excluded.fee,
+            "fee_currency": excluded.fee_currency,
+            "status": case((filled >= Trade.amount * (1 - 1e-9), "filled"), else_=Trade.status),
+            "filled_at": excluded.filled_at,
+        }
+    )
+    session.execute(stmt)
+
+
+class FillSync:
+    """
+    Trae solo los fills nuevos de cada (exchange, símbolo) y los aplica a trades
+
+    Cada par guarda en ``fill_watermarks`` el timestamp del último fill aplicado
+    y los ids de los fills con ese mismo timestamp (``since`` es inclusivo en
+    ccxt, así que se descartan al volver a pedirlos). Las páginas se recorren
+    hasta vaciar el hueco; cada página se aplica junto con su marca en una sola
+    transacción, de modo que un corte nunca deja fills aplicados dos veces.
+    Tras confirmarla, sus fills se pasan al EquityTracker del manager.
+    """
+
+    def __init__(self, config: dict, manager, session_factory: Callable):
+        cfg = config.get("market_maker_v4_2", {})
+        sync_cfg = cfg.get("fill_sync", {})
+
+        self.manager = manager
+        self.session_factory = session_factory
+        self.default_symbols = cfg.get("symbols", [])
+        self.interval = float(sync_cfg.get("interval", 30))
+        self.page_size = int(sync_cfg.get("page_size", 100))
+        self.max_pages = int(sync_cfg.get("max_pages", 20))
+        self.lookback_ms = int(float(sync_cfg.get("lookback_hours", 24)) * 3600 * 1000)
+
+        # (exchange, symbol) -> (since_ms, ids en el borde)
+        self._watermarks: Dict[Tuple[str, str], Tuple[int, List[str]]] = {}
+        self._loaded = False
+
+        self.cycles = 0
+        self.fills_synced = 0
+        self.orders_updated = 0
+        self.errors = 0
+        self.last_cycle_ms = 0.0
+
+    async def start(self):
+        """Bucle de sincronización en segundo plano"""
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                start = loop.time()
+                await self.sync_all()
+                self.last_cycle_ms = (loop.time() - start) * 1000
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Fill sync error: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def sync_all(self):
+        """Un ciclo: exchanges en paralelo, símbolos de cada exchange en serie"""
+        loop = asyncio.get_running_loop()
+        if not self._loaded:
+            await loop.run_in_executor(None, self._load_watermarks)
+
+        await asyncio.gather(
+            *(self._sync_exchange(name, exchange) for name, exchange in self.manager.exchanges.items()),
+            return_exceptions=True
+        )
+        self.cycles += 1
+
+    async def _sync_exchange(self, exchange_name: str, exchange):
+        symbols = self.manager.get_symbols_for_exchange(exchange_name) or self.default_symbols
+        for symbol in symbols:
+            if not self.manager._symbol_supported(exchange_name, symbol):
+                continue
+            try:
+                await self.sync_symbol(exchange_name, exchange, symbol)
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"Fill sync failed for {symbol} on {exchange_name}: {e}")
+
+    async def sync_symbol(self, exchange_name: str, exchange, symbol: str) -> int:
+        """
+        Traer y aplicar los fills nuevos de un par
+
+        Returns:
+            Número de fills aplicados
+        """
+        loop = asyncio.get_running_loop()
+        key = (exchange_name, symbol)
+        since, boundary = self._watermarks.get(key, (int(time.time() * 1000) - self.lookback_ms, []))
+        applied = 0
+
+        for _ in range(self.max_pages):
+            page = await exchange.fetch_my_trades(symbol, since=since, limit=self.page_size)
+            seen = set(boundary)
+            fills = [
+                fill for fill in page
+                if fill.get("timestamp") is not None and _fill_key(fill) not in seen
+            ]
+            if not fills:
+                break
+
+            fills.sort(key=lambda fill: fill["timestamp"])
+            last = fills[-1]["timestamp"]
+            at_last = [_fill_key(fill) for fill in fills if fill["timestamp"] == last]
+            new_boundary = boundary + at_last if last == since else at_last
+
+            rows = aggregate_fills(fills, exchange_name, symbol)
+            await loop.run_in_executor(
+                None, self._apply_page, exchange_name, symbol, rows, last, new_boundary, len(fills)
+            )
+
+            self._watermarks[key] = (last, new_boundary)
+            since, boundary = last, new_boundary
+            self._apply_equity(exchange_name, exchange, symbol, fills)
+            applied += len(fills)
+            self.fills_synced += len(fills)
+            self.orders_updated += len(rows)
+
+            if len(page) < self.page_size:
+                break
+
+        if applied:
+            logger.info(f"Synced {applied} fills for {symbol} on {exchange_name}")
+        return applied
+
+    def _apply_page(self, exchange_name: str, symbol: str, rows: List[Dict[str, Any]],
+                    since_ms: int, boundary: List[str], count: int):
+        """Fills de una página + marca, en una transacción"""
+        session = self.session_factory()
+        try:
+            upsert_fills(session, rows)
+
+            watermark = session.execute(
+                select(FillWatermark).where(FillWatermark.exchange == exchange_name, FillWatermark.symbol == symbol)
+            ).scalar_one_or_none()
+            if watermark is None:
+                watermark = FillWatermark(exchange=exchange_name, symbol=symbol, fills_synced=0)
+                session.add(watermark)
+            watermark.since_ms = since_ms
+            watermark.boundary_ids = boundary
+            watermark.fills_synced = (watermark.fills_synced or 0) + count
+            watermark.updated_at = datetime.utcnow()
+
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def _apply_equity(self, exchange_name: str, exchange, symbol: str, fills: List[dict]):
+        """Pasar al EquityTracker los fills de una página ya confirmada"""
+        tracker = self.manager.equity_tracker
+        markets = exchange.exchange.markets or {}
+        for fill in fills:
+            # En derivados ccxt da la cantidad en contratos
+            market = markets.get(fill.get("symbol")) or {}
+            fee = fill.get("fee") or {}
+            tracker.on_fill(
+                exchange_name, symbol, fill.get("side"),
+                float(fill.get("amount") or 0) * float(market.get("contractSize") or 1),
+                float(fill.get("price") or 0),
+                float(fee.get("cost") or 0) if fee.get("currency") in (None, tracker.quote_currency) else 0.0,
+                timestamp=fill["timestamp"]
+            )
+
+    def _load_watermarks(self):
+        session = self.session_factory()
+        try:
+            for watermark in session.execute(select(FillWatermark)).scalars():
+                self._watermarks[(watermark.exchange, watermark.symbol)] = (
+                    watermark.since_ms, list(watermark.boundary_ids or [])
+                )
+        finally:
+            session.close()
+        self._loaded = True
+
+    def get_status(self) -> dict:
+        """Marcas por par y contadores"""
+        return {
+            "interval": self.interval,
+            "watermarks": {
+                f"{exchange}:{symbol}": datetime.utcfromtimestamp(since / 1000).isoformat()
+                for (exchange, symbol), (since, _) in self._watermarks.items()
+            },
+            "cycles": self.cycles,
+            "fills_synced": self.fills_synced,
+            "orders_updated": self.orders_updated,
+            "errors": self.errors,
+            "last_cycle_ms": round(self.last_cycle_ms, 3)
+        }
@@ -0,0 +1,170 @@
+"""
+Monitor de funding rates con fetch por lotes, caché e histórico en memoria
+"""
+
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, List, Optional, Set, Tuple
+from core.logger import get_logger
+
+logger = get_logger("funding", "funding.log")
+
+
+@dataclass(frozen=True)
+class FundingEvent:
+    """Cruce del umbral de funding para un (exchange, símbolo)"""
+    exchange: str
+    symbol: str
+    rate: float
+    rate_bps: float
+    threshold_bps: float
+    state: str  # above | below | normal
+    timestamp: float
+    next_funding_time: Optional[int] = None
+
+
+class FundingMonitor:
+    """
+    Cachea el último funding rate y un histórico compacto por (exchange, símbolo).
+
+    Los rates se piden por lotes a cada exchange (``fetch_funding_rates``) en el
+    intervalo ``funding_check_interval``; los endpoints leen de la caché. Cuando
+    un rate cruza ``funding_threshold_bps`` (en cualquier sentido) se notifica a
+    los listeners registrados, una sola vez por cruce.
+    """
+
+    def __init__(self, config: dict):
+        cfg = config.get("market_maker_v4_2", {})
+
+        self.threshold_bps = float(cfg.get("funding_threshold_bps", 0.01))
+        self.check_interval = int(cfg.get("funding_check_interval", 300))
+        self.history_size = int(cfg.get("funding_history_size", 1000))
+
+        # (exchange, symbol) -> deque[(timestamp_ms, rate)]
+        self.history: Dict[Tuple[str, str], Deque[Tuple[int, float]]] = {}
+        self.latest: Dict[Tuple[str, str], dict] = {}
+        self.states: Dict[Tuple[str, str], str] = {}
+        self.last_refresh: Dict[str, float] = {}
+
+        self._listeners: List[Callable] = []
+        # Referencias a las tareas de listeners async hasta que terminan
+        self._listener_tasks: Set[asyncio.Task] = set()
+
+        logger.info(
+            f"Funding monitor initialized (threshold: {self.threshold_bps} bps, "
+            f"interval: {self.check_interval}s)"
+        )
+
+    def add_listener(self, callback: Callable):
+        """Registrar un callback (sync o async) que recibe cada FundingEvent"""
+        self._listeners.append(callback)
+
+    async def refresh(self, exchange_name: str, exchange, symbols: List[str]):
+        """
+        Traer en un solo lote los funding rates de un exchange
+
+        Args:
+            exchange_name: Nombre del exchange
+            exchange: ExchangeWrapper
+            symbols: Símbolos a consultar (formato de configuración, p.ej. BTC/USDT)
+        """
+        rates = await exchange.fetch_funding_rates(symbols)
+        now = time.time()
+
+        for symbol, data in rates.items():
+            rate = data.get('fundingRate')
+            if rate is None:
+                continue
+            self._record(exchange_name, symbol, float(rate), data, now)
+
+        self.last_refresh[exchange_name] = now
+
+    def _record(self, exchange_name: str, symbol: str, rate: float, data: dict, now: float):
+        key = (exchange_name, symbol)
+        timestamp = data.get('timestamp') or int(now * 1000)
+
+        history = self.history.get(key)
+        if history is None:
+            history = self.history[key] = deque(maxlen=self.history_size)
+        if history and history[-1][0] == timestamp:
+            # Mismo dato del exchange (timestamp sin cambios): no duplicar la muestra
+            history[-1] = (timestamp, rate)
+        else:
+            history.append((timestamp, rate))
+
+        rate_bps = rate * 10_000
+        self.latest[key] = {
+            "exchange": exchange_name,
+            "symbol": symbol,
+            "funding_rate": rate,
+            "funding_rate_bps": rate_bps,
+            "timestamp": timestamp,
+            "funding_timestamp": data.get('fundingTimestamp'),
+            "next_funding_time": data.get('nextFundingTimestamp') or data.get('fundingTimestamp'),
+        }
+
+        # Detección de cruce de umbral
+        if rate_bps > self.threshold_bps:
+            state = "above"
+        elif rate_bps < -self.threshold_bps:
+            state = "below"
+        else:
+            state = "normal"
+
+        previous = self.states.get(key, "normal")
+        self.states[key] = state
+        if state != previous:
+            self._emit(FundingEvent(
+                exchange=exchange_name,
+                symbol=symbol,
+                rate=rate,
+                rate_bps=rate_bps,
+                threshold_bps=self.threshold_bps,
+                state=state,
+                timestamp=now,
+                next_funding_time=self.latest[key]["next_funding_time"]
+            ))
+
+    def _emit(self, event: FundingEvent):
+        logger.info(
+            f"Funding {event.state} threshold: {event.symbol} on {event.exchange} ({event.rate_bps:.2f} bps)",
+            extra={'exchange': event.exchange, 'symbol': event.symbol}
+        )
+        for callback in self._listeners:
+            try:
+                result = callback(event)
+                if asyncio.iscoroutine(result):
+                    task = asyncio.ensure_future(result)
+                    self._listener_tasks.add(task)
+                    task.add_done_callback(self._listener_tasks.discard)
+            except Exception as e:
+                logger.error(f"Error in funding listener: {e}")
+
+    def get_latest(self, exchange_name: str, symbol: str) -> Optional[dict]:
+        """Último funding rate cacheado"""
+        return self.latest.get((exchange_name, symbol))
+
+    def get_history(self, exchange_name: str, symbol: str, limit: int = 100) -> List[dict]:
+        """Histórico cacheado (más antiguo primero), formato compatible con ccxt"""
+        history = self.history.get((exchange_name, symbol))
+        if not history:
+            return []
+        samples = list(history)[-limit:] if limit else list(history)
+        return [
+            {"symbol": symbol, "fundingRate": rate, "timestamp": timestamp}
+            for timestamp, rate in samples
+        ]
+
+    def get_status(self) -> dict:
+        """Últimos rates y estado de umbral de todos los símbolos"""
+        return {
+            "threshold_bps": self.threshold_bps,
+            "check_interval": self.check_interval,
+            "last_refresh": dict(self.last_refresh),
+            "rates": [
+                {**latest, "state": self.states.get(key, "normal")}
+                for key, latest in self.latest.items()
+            ]
+        }
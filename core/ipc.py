@@ -0,0 +1,160 @@
+"""
+Canal IPC ligero (request/response + eventos) sobre multiprocessing.connection
+"""
+
+import asyncio
+import itertools
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional
+from core.logger import get_logger
+
+logger = get_logger("ipc", "ipc.log")
+
+RequestHandler = Callable[[str, tuple, dict], Awaitable[Any]]
+EventHandler = Callable[[str, Any], None]
+
+
+class IPCError(Exception):
+    """Error remoto propagado a través del canal"""
+    pass
+
+
+class IPCChannel:
+    """
+    Canal asíncrono sobre una ``multiprocessing.connection.Connection``
+    (``Pipe``, ``Listener``/``Client`` sobre socket Unix, etc.)
+
+    Los mensajes son dicts pequeños serializados con pickle:
+
+    - ``request``:  {"type", "id", "method", "args", "kwargs"}
+    - ``response``: {"type", "id", "result"} o {"type", "id", "error"}
+    - ``event``:    {"type", "topic", "payload"} (fire-and-forget)
+
+    La lectura ocurre en un hilo dedicado (funciona igual con el event loop
+    de Windows) y los mensajes se despachan en el loop con
+    ``call_soon_threadsafe``. Los envíos se hacen siempre desde el loop.
+    """
+
+    def __init__(self, conn, name: str = "ipc",
+                 request_handler: Optional[RequestHandler] = None,
+                 event_handler: Optional[EventHandler] = None):
+        self.conn = conn
+        self.name = name
+        self.request_handler = request_handler
+        self.event_handler = event_handler
+
+        self._ids = itertools.count(1)
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._reader: Optional[threading.Thread] = None
+        self._send_lock = threading.Lock()
+        self.closed = False
+
+        # Estadísticas
+        self.messages_sent = 0
+        self.messages_received = 0
+
+    def start(self):
+        """Empezar a leer mensajes (debe llamarse desde el event loop)"""
+        self._loop = asyncio.get_running_loop()
+        self._reader = threading.Thread(target=self._read_loop, name=f"{self.name}-reader", daemon=True)
+        self._reader.start()
+
+    def _read_loop(self):
+        while not self.closed:
+            try:
+                message = self.conn.recv()
+            except (EOFError, OSError, TypeError):
+                break  # TypeError: la conexión se cerró desde otro hilo durante recv
+            self._loop.call_soon_threadsafe(self._dispatch, message)
+        try:
+            self._loop.call_soon_threadsafe(self._on_disconnect)
+        except RuntimeError:
+            pass  # el loop ya se cerró
+
+    def _on_disconnect(self):
+        self.closed = True
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(IPCError(f"{self.name}: channel closed"))
+        self._pending.clear()
+
+    def _send(self, message: dict):
+        if self.closed:
+            raise IPCError(f"{self.name}: channel closed")
+        with self._send_lock:
+            self.conn.send(message)
+        self.messages_sent += 1
+
+    def _dispatch(self, message: dict):
+        self.messages_received += 1
+        kind = message.get("type")
+
+        if kind == "response":
+            future = self._pending.pop(message["id"], None)
+            if future is None or future.done():
+                return
+            if "error" in message:
+                future.set_exception(IPCError(message["error"]))
+            else:
+                future.set_result(message.get("result"))
+
+        elif kind == "request":
+            asyncio.ensure_future(self._handle_request(message))
+
+        elif kind == "event":
+            if self.event_handler:
+                try:
+                    self.event_handler(message["topic"], message.get("payload"))
+                except Exception as e:
+                    logger.error(f"{self.name}: error handling event {message.get('topic')}: {e}")
+
+    async def _handle_request(self, message: dict):
+        response = {"type": "response", "id": message["id"]}
+        try:
+            if self.request_handler is None:
+                raise IPCError("no request handler")
+            response["result"] = await self.request_handler(
+                message["method"], message.get("args", ()), message.get("kwargs", {})
+            )
+        except Exception as e:
+            response["error"] = f"{type(e).__name__}: {e}"
+        try:
+            self._send(response)
+        except Exception as e:
+            logger.error(f"{self.name}: could not send response for {message.get('method')}: {e}")
+
+    async def request(self, method: str, *args, timeout: float = 30, **kwargs) -> Any:
+        """
+        Invocar un método en el otro extremo y esperar la respuesta
+
+        Raises:
+            IPCError: si el remoto falla o el canal se cierra
+            asyncio.TimeoutError: si no hay respuesta en ``timeout`` segundos
+        """
+        request_id = next(self._ids)
+        future = self._loop.create_future()
+        self._pending[request_id] = future
+        try:
+            self._send({
+                "type": "request",
+                "id": request_id,
+                "method": method,
+                "args": args,
+                "kwargs": kwargs
+            })
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._pending.pop(request_id, None)
+
+    def publish(self, topic: str, payload: Any = None):
+        """Enviar un evento sin esperar respuesta"""
+        self._send({"type": "event", "topic": topic, "payload": payload})
+
+    def close(self):
+        """Cerrar el canal"""
+        self.closed = True
+        try:
+            self.conn.close()
+        except Exception:
+            pass
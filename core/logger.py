@@ -68,6 +68,16 @@ class ColoredFormatter(logging.Formatter):
         
         return result
 
+class LazyFileHandler(logging.FileHandler):
+    """FileHandler que crea el directorio y abre el archivo con el primer registro"""
+    
+    def __init__(self, filename, encoding=None):
+        super().__init__(filename, encoding=encoding, delay=True)
+    
+    def _open(self):
+        Path(self.baseFilename).parent.mkdir(parents=True, exist_ok=True)
+        return super()._open()
+
 def get_logger(name: str, log_file: str = None, level=logging.INFO) -> logging.Logger:
     """
     Crear logger con formato estructurado
@@ -99,17 +109,16 @@ def get_logger(name: str, log_file: str = None, level=logging.INFO) -> logging.L
     console_handler.setFormatter(console_format)
     logger.addHandler(console_handler)
     
-    # File handler (formato JSON estructurado)
+    # File handler (formato JSON estructurado); el archivo se abre al primer registro,
+    # así importar un módulo no toca el disco
     if log_file:
-        log_dir = Path("logs")
-        log_dir.mkdir(exist_ok=True)
-        
-        file_handler = logging.FileHandler(log_dir / log_file, encoding='utf-8')
+        file_handler = LazyFileHandler(Path("logs") / log_file, encoding='utf-8')
         file_handler.setLevel(level)
         file_handler.setFormatter(StructuredFormatter())
         logger.addHandler(file_handler)
     
     return logger
 
-# Logger por defecto
-default_logger = get_logger("marketmaker", "marketmaker.log")
+def get_default_logger() -> logging.Logger:
+    """Logger por defecto (se configura en la primera llamada)"""
+    return get_logger("marketmaker", "marketmaker.log")
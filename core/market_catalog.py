@@ -0,0 +1,277 @@
+"""
+Catálogo de mercados en memoria: índices por quote/base/tipo/activo, búsqueda por prefijo y paginación
+"""
+
+import asyncio
+import base64
+import json
+import time
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence, Tuple
+from core.logger import get_logger
+from core.responses import content_etag
+
+logger = get_logger("market_catalog", "main.log")
+
+# Flags de ccxt que clasifican un mercado (uno puede tener varios: spot + margin)
+MARKET_TYPES = ("spot", "margin", "swap", "future", "option")
+
+# Índice: posiciones en orden (para recorrer y acotar por rango) y como conjunto (para pertenencia)
+Index = Tuple[Tuple[int, ...], FrozenSet[int]]
+
+_EMPTY: Index = ((), frozenset())
+
+
+def _index(positions: Sequence[int]) -> Index:
+    ordered = tuple(sorted(positions))
+    return ordered, frozenset(ordered)
+
+
+def encode_after(symbol: str) -> str:
+    """Cursor opaco a partir del último símbolo devuelto"""
+    raw = json.dumps([symbol], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_after(cursor: str) -> str:
+    """
+    Decodificar un cursor de ``encode_after``
+
+    Raises:
+        ValueError: si el cursor no es válido
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        (symbol,) = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return str(symbol)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def project(market: dict, fields: Optional[Sequence[str]]) -> dict:
+    """Solo los campos pedidos; ``precision.price`` navega dicts anidados"""
+    if not fields:
+        return market
+    projected = {}
+    for field in fields:
+        value: Any = market
+        for part in field.split("."):
+            value = value.get(part) if isinstance(value, dict) else None
+        projected[field] = value
+    return projected
+
+
+class ExchangeCatalog:
+    """
+    Mercados de un exchange con índices invertidos
+
+    Inmutable: un refresco con cambios construye un catálogo nuevo. Las filas
+    van ordenadas por símbolo (en mayúsculas), así que un prefijo es un rango
+    contiguo que se localiza con bisect y el cursor es el último símbolo
+    devuelto. Cada filtro es una lista ordenada de posiciones más su
+    conjunto: se recorre la lista más corta (ya en orden, acotada al rango
+    del prefijo) filtrando por pertenencia a las demás.
+    """
+
+    def __init__(self, exchange: str, markets: Dict[str, dict], version: int, fingerprint: str):
+        self.exchange = exchange
+        self.version = version
+        self.fingerprint = fingerprint
+        self.built_at = time.time()
+
+        self.rows: List[dict] = sorted(markets.values(), key=lambda market: market["symbol"].upper())
+        self.keys: List[str] = [market["symbol"].upper() for market in self.rows]
+
+        by_quote: Dict[str, set] = {}
+        by_base: Dict[str, set] = {}
+        by_type: Dict[str, set] = {}
+        active = set()
+        for position, market in enumerate(self.rows):
+            by_quote.setdefault((market.get("quote") or "").upper(), set()).add(position)
+            by_base.setdefault((market.get("base") or "").upper(), set()).add(position)
+            for market_type in MARKET_TYPES:
+                if market.get(market_type) or market.get("type") == market_type:
+                    by_type.setdefault(market_type, set()).add(position)
+            # ccxt usa None cuando el exchange no informa: se considera activo
+            if market.get("active") is not False:
+                active.add(position)
+
+        self.by_quote: Dict[str, Index] = {key: _index(value) for key, value in by_quote.items()}
+        self.by_base: Dict[str, Index] = {key: _index(value) for key, value in by_base.items()}
+        self.by_type: Dict[str, Index] = {key: _index(value) for key, value in by_type.items()}
+        self.active: Index = _index(active)
+        self.inactive: Index = _index(set(range(len(self.rows))) - active)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def _matches(self, quote: str = None, base: str = None, market_type: str = None,
+                 active: bool = None, prefix: str = None) -> List[int]:
+        """Posiciones (ordenadas por símbolo) que cumplen todos los filtros"""
+        lo, hi = 0, len(self.rows)
+        if prefix:
+            prefix = prefix.upper()
+            lo = bisect_left(self.keys, prefix)
+            hi = bisect_left(self.keys, prefix + "\U0010ffff", lo)
+
+        filters = []
+        if quote:
+            filters.append(self.by_quote.get(quote.upper(), _EMPTY))
+        if base:
+            filters.append(self.by_base.get(base.upper(), _EMPTY))
+        if market_type:
+            filters.append(self.by_type.get(market_type, _EMPTY))
+        if active is not None:
+            filters.append(self.active if active else self.inactive)
+
+        if not filters:
+            return list(range(lo, hi))
+
+        filters.sort(key=lambda index: len(index[0]))
+        ordered = filters[0][0]
+        others = [members for _, members in filters[1:]]
+        matches = list(ordered[bisect_left(ordered, lo):bisect_left(ordered, hi)])
+        for members in others:
+            matches = [position for position in matches if position in members]
+        return matches
+
+    def count(self, **filters) -> int:
+        """Número de mercados que cumplen los filtros de ``query``"""
+        return len(self._matches(**filters))
+
+    def query(self, quote: str = None, base: str = None, market_type: str = None,
+              active: bool = None, prefix: str = None, fields: Sequence[str] = None,
+              limit: int = 100, cursor: str = None) -> Tuple[List[dict], int, Optional[str]]:
+        """
+        Una página de mercados
+
+        Args:
+            quote, base: Moneda (sin distinguir mayúsculas)
+            market_type: spot, margin, swap, future u option
+            active: Solo activos (True) o inactivos (False)
+            prefix: Prefijo del símbolo (``BTC/``, ``ETH``)
+            fields: Proyección de campos (por defecto el mercado ccxt completo)
+            limit: Tamaño de página
+            cursor: ``next_cursor`` de la página anterior
+
+        Returns:
+            (mercados, total que cumple los filtros, cursor siguiente o None)
+
+        Raises:
+            ValueError: Tipo de mercado o cursor no válidos
+        """
+        if market_type and market_type not in MARKET_TYPES:
+            raise ValueError(f"Unknown market type: {market_type} (expected one of {', '.join(MARKET_TYPES)})")
+
+        matches = self._matches(quote, base, market_type, active, prefix)
+        start = 0
+        if cursor:
+            # Posición de la primera fila con símbolo posterior al cursor
+            after = bisect_right(self.keys, decode_after(cursor).upper())
+            start = bisect_left(matches, after)
+
+        page = matches[start:start + limit]
+        next_cursor = None
+        if start + limit < len(matches):
+            next_cursor = encode_after(self.rows[page[-1]]["symbol"])
+
+        return [project(self.rows[position], fields) for position in page], len(matches), next_cursor
+
+
+class MarketCatalog:
+    """
+    Catálogo por exchange construido desde ``load_markets`` (caché de ccxt)
+
+    Al arrancar usa los mercados que ya cargó ``connect``; después un bucle
+    los recarga cada ``refresh_interval`` segundos. Solo si el contenido
+    cambia (huella distinta) se reconstruyen los índices y sube ``version``,
+    que los endpoints incluyen en la clave de caché de la respuesta.
+    """
+
+    def __init__(self, config: dict, manager):
+        cfg = config.get("market_maker_v4_2", {})
+        catalog_cfg = cfg.get("catalog", {})
+
+        self.manager = manager
+        self.refresh_interval = float(catalog_cfg.get("refresh_interval", 3600))
+        self.default_limit = int(catalog_cfg.get("default_limit", 100))
+        self.max_limit = int(catalog_cfg.get("max_limit", 1000))
+
+        self.catalogs: Dict[str, ExchangeCatalog] = {}
+        self.refreshes = 0
+        self.rebuilds = 0
+        self.errors = 0
+
+    def build(self, exchange_name: str, markets: Dict[str, dict]) -> bool:
+        """
+        Indexar ``markets`` si cambiaron
+
+        Returns:
+            True si se construyó un catálogo nuevo
+        """
+        fingerprint = content_etag(markets, volatile=())
+        current = self.catalogs.get(exchange_name)
+        if current is not None and current.fingerprint == fingerprint:
+            return False
+
+        version = current.version + 1 if current else 1
+        self.catalogs[exchange_name] = ExchangeCatalog(exchange_name, markets, version, fingerprint)
+        self.rebuilds += 1
+        logger.info(f"Market catalog for {exchange_name}: {len(markets)} markets (version {version})")
+        return True
+
+    def load_all(self):
+        """Indexar los mercados que ccxt ya tiene cargados (sin llamadas de red)"""
+        for exchange_name, exchange in self.manager.get_all_exchanges().items():
+            markets = exchange.exchange.markets
+            if markets:
+                self.build(exchange_name, markets)
+
+    async def refresh(self, exchange_name: str) -> bool:
+        """Recargar los mercados de un exchange desde la red"""
+        exchange = self.manager.get_all_exchanges()[exchange_name]
+        markets = await exchange.load_markets(reload=True)
+        self.refreshes += 1
+        return self.build(exchange_name, markets or {})
+
+    async def start(self):
+        """Bucle de refresco en segundo plano"""
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            for exchange_name in list(self.manager.get_all_exchanges()):
+                try:
+                    await self.refresh(exchange_name)
+                except Exception as e:
+                    self.errors += 1
+                    logger.error(f"Market catalog refresh failed for {exchange_name}: {e}")
+
+    def get(self, exchange_name: str) -> Optional[ExchangeCatalog]:
+        """Catálogo de un exchange (None si no está conectado o no tiene mercados)"""
+        catalog = self.catalogs.get(exchange_name)
+        if catalog is None:
+            exchange = self.manager.get_all_exchanges().get(exchange_name)
+            if exchange is not None and exchange.exchange.markets:
+                self.build(exchange_name, exchange.exchange.markets)
+                catalog = self.catalogs.get(exchange_name)
+        return catalog
+
+    def clamp_limit(self, limit: Optional[int]) -> int:
+        return max(1, min(limit or self.default_limit, self.max_limit))
+
+    def get_status(self) -> dict:
+        """Tamaño y versión por exchange"""
+        return {
+            "refresh_interval": self.refresh_interval,
+            "exchanges": {
+                name: {
+                    "markets": len(catalog),
+                    "active": len(catalog.active[0]),
+                    "version": catalog.version,
+                    "built_at": catalog.built_at
+                }
+                for name, catalog in self.catalogs.items()
+            },
+            "refreshes": self.refreshes,
+            "rebuilds": self.rebuilds,
+            "errors": self.errors
+        }
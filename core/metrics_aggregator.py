@@ -0,0 +1,228 @@
+"""
+Agregador de métricas en segundo plano: snapshot inmutable servido en O(1)
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from core.database import SystemMetric
+from core.logger import get_logger
+
+logger = get_logger("metrics_aggregator", "main.log")
+
+
+def format_position(exchange_name: str, position: dict) -> Optional[dict]:
+    """Posición ccxt -> formato de la API (None si está vacía)"""
+    contracts = position.get('contracts', 0)
+    if not contracts:
+        return None
+    return {
+        "symbol": position.get('symbol'),
+        "side": 'long' if position.get('side') == 'long' else 'short',
+        "size": abs(contracts),
+        "entryPrice": position.get('entryPrice', 0),
+        "markPrice": position.get('markPrice', 0),
+        "liquidationPrice": position.get('liquidationPrice'),
+        "leverage": position.get('leverage', 1),
+        "pnl": position.get('realizedPnl', 0),
+        "unrealizedPnl": position.get('unrealizedPnl', 0),
+        "exchange": exchange_name,
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+def format_order(exchange_name: str, order) -> dict:
+    """Order del wrapper -> formato de la API"""
+    return {
+        "id": order.id,
+        "symbol": order.symbol,
+        "side": order.side.value,
+        "type": order.type.value,
+        "amount": order.amount,
+        "price": order.price,
+        "status": order.status,
+        "timestamp": order.timestamp,
+        "exchange": exchange_name
+    }
+
+
+@dataclass(frozen=True)
+class MetricsSnapshot:
+    """Estado agregado en un instante; nunca se modifica, se reemplaza entero"""
+    payload: Dict[str, Any]
+    positions: Tuple[dict, ...] = ()
+    orders: Tuple[dict, ...] = ()
+    # exchange -> estado del fan-out de posiciones/órdenes (ok/stale/timeout/error)
+    venues: Dict[str, Dict[str, str]] = field(default_factory=dict)
+    created_at: float = 0.0
+    refresh_ms: float = 0.0
+
+
+class MetricsAggregator:
+    """
+    Refresca equity, PnL, órdenes y posiciones con cadencia propia
+
+    Cada ciclo consulta todos los exchanges con ``MultiExchangeManager.fan_out``
+    (posiciones y órdenes abiertas, con plazo por exchange y último valor
+    conocido para los que no llegan; la equity sale del EquityTracker o de los
+    balances ya cacheados, sin ``fetch_balance`` extra) y publica un
+    ``MetricsSnapshot`` nuevo. Los
+    lectores solo leen la referencia actual: el coste por request no depende
+    del número de exchanges. ``SystemMetric`` se persiste cada
+    ``persist_interval`` segundos, con independencia de cuántos clientes lean.
+    """
+
+    def __init__(self, config: dict, manager, session_factory: Callable, row_writer=None):
+        cfg = config.get("market_maker_v4_2", {})
+        metrics_cfg = cfg.get("metrics", {})
+
+        self.config = config
+        self.manager = manager
+        self.session_factory = session_factory
+        self.row_writer = row_writer
+        self.refresh_interval = float(metrics_cfg.get("refresh_interval", 5))
+        self.persist_interval = float(metrics_cfg.get("persist_interval", 60))
+
+        self.snapshot: Optional[MetricsSnapshot] = None
+        self._lock = asyncio.Lock()
+        self._last_persist = 0.0
+
+        self.refreshes = 0
+        self.persisted = 0
+        self.errors = 0
+
+    async def start(self):
+        """Bucle de refresco y persistencia"""
+        while True:
+            try:
+                await self.refresh()
+                if time.time() - self._last_persist >= self.persist_interval:
+                    await self.persist()
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Metrics refresh error: {e}")
+            await asyncio.sleep(self.refresh_interval)
+
+    async def get_snapshot(self) -> MetricsSnapshot:
+        """Snapshot actual; solo el primer lector antes del primer ciclo espera un refresco"""
+        if self.snapshot is None:
+            await self.refresh()
+        return self.snapshot
+
+    async def refresh(self) -> MetricsSnapshot:
+        """Consultar todos los exchanges a la vez y publicar un snapshot nuevo"""
+        async with self._lock:
+            # Otro lector pudo refrescar mientras esperábamos el lock
+            if self.snapshot is not None and time.time() - self.snapshot.created_at < 0.5:
+                return self.snapshot
+
+            start = time.perf_counter()
+            position_result, order_result = await asyncio.gather(
+                self.manager.fan_out("positions", lambda name, exchange: exchange.fetch_positions()),
+                self.manager.fan_out("orders", lambda name, exchange: exchange.fetch_open_orders())
+            )
+
+            positions: List[dict] = []
+            for exchange_name, exchange_positions in position_result.values.items():
+                formatted = (format_position(exchange_name, position) for position in exchange_positions or [])
+                positions.extend(position for position in formatted if position)
+
+            orders: List[dict] = [
+                format_order(exchange_name, order)
+                for exchange_name, exchange_orders in order_result.values.items()
+                for order in exchange_orders or []
+            ]
+
+            venues = {
+                name: {"positions": state, "orders": order_result.states().get(name)}
+                for name, state in position_result.states().items()
+            }
+
+            self.snapshot = MetricsSnapshot(
+                payload=self._build_payload(positions, orders),
+                positions=tuple(positions),
+                orders=tuple(orders),
+                venues=venues,
+                created_at=time.time(),
+                refresh_ms=(time.perf_counter() - start) * 1000
+            )
+            self.refreshes += 1
+            return self.snapshot
+
+    def _equity(self) -> float:
+        tracker = self.manager.equity_tracker
+        if tracker.initialized:
+            return tracker.equity
+        # Antes de la primera reconciliación: balances cacheados por el health check
+        return sum(
+            balance.get('total', {}).get(tracker.quote_currency, 0) or 0
+            for balance in self.manager.balances.values()
+        )
+
+    def _build_payload(self, positions: List[dict], orders: List[dict]) -> Dict[str, Any]:
+        health = self.manager.get_exchange_health()
+        return {
+            "equity": self._equity(),
+            "totalPnl": sum(position['pnl'] or 0 for position in positions),
+            "dailyPnl": sum(position['unrealizedPnl'] or 0 for position in positions),
+            "totalFees": self.manager.equity_tracker.fees,
+            "openOrders": len(orders),
+            "openPositions": len(positions),
+            "healthyExchanges": len([h for h in health.values() if h.connected]),
+            "totalExchanges": len(self.manager.exchanges),
+            "openCircuits": self.manager.circuit_breaker_manager.get_open_count(),
+            "riskMode": self.config.get("market_maker_v4_2", {}).get("risk_mode", "conservative"),
+            "timestamp": datetime.now().isoformat()
+        }
+
+    async def persist(self):
+        """Guardar el snapshot actual como SystemMetric (write-behind si está activo)"""
+        snapshot = self.snapshot
+        if snapshot is None:
+            return
+
+        payload = snapshot.payload
+        fields = {
+            "timestamp": datetime.utcfromtimestamp(snapshot.created_at),
+            "equity": payload["equity"],
+            "total_pnl": payload["totalPnl"],
+            "daily_pnl": payload["dailyPnl"],
+            "total_fees": payload["totalFees"],
+            "open_orders": payload["openOrders"],
+            "open_positions": payload["openPositions"],
+            "healthy_exchanges": payload["healthyExchanges"],
+            "open_circuits": payload["openCircuits"],
+            "risk_mode": payload["riskMode"]
+        }
+
+        self._last_persist = time.time()
+        if not (self.row_writer and self.row_writer.submit_row(SystemMetric, fields)):
+            await asyncio.get_running_loop().run_in_executor(None, self._write, fields)
+        self.persisted += 1
+
+    def _write(self, fields: Dict[str, Any]):
+        session = self.session_factory()
+        try:
+            session.add(SystemMetric(**fields))
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def get_status(self) -> dict:
+        """Edad del snapshot y contadores"""
+        snapshot = self.snapshot
+        return {
+            "refresh_interval": self.refresh_interval,
+            "persist_interval": self.persist_interval,
+            "snapshot_age_seconds": round(time.time() - snapshot.created_at, 3) if snapshot else None,
+            "last_refresh_ms": round(snapshot.refresh_ms, 3) if snapshot else None,
+            "venues": dict(snapshot.venues) if snapshot else {},
+            "refreshes": self.refreshes,
+            "persisted": self.persisted,
+            "errors": self.errors
+        }
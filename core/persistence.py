@@ -0,0 +1,223 @@
+"""
+Escritura diferida en base de datos: colas acotadas con flush por lotes
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+from sqlalchemy import insert
+from core.bulk_ingest import copy_rows
+from core.logger import get_logger
+from core.telemetry import telemetry
+
+logger = get_logger("persistence", "database.log")
+
+
+class BatchWriter:
+    """
+    Cola acotada + tarea de fondo que escribe en lotes transaccionales
+
+    Los productores llaman a ``submit()`` (no bloquea; si la cola está llena el
+    item se descarta y se contabiliza). ``run()`` agrupa hasta ``batch_size``
+    items o lo acumulado en ``flush_interval`` segundos y los escribe en una sola
+    transacción en un thread del executor, así que el event loop nunca espera
+    al disco. Las subclases implementan ``write_batch``.
+    """
+
+    def __init__(self, name: str, session_factory: Callable, queue_size: int = 10000,
+                 batch_size: int = 200, flush_interval: float = 1.0):
+        self.name = name
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+        self._running = False
+        self._task: Optional[asyncio.Task] = None
+
+        # Estadísticas
+        self.items_submitted = 0
+        self.items_written = 0
+        self.items_dropped = 0
+        self.batches_written = 0
+        self.errors = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+        # (timestamp, items) de los commits recientes, para la tasa de commits
+        self._recent: Deque[Tuple[float, int]] = deque()
+        self.rate_window = 60.0
+        self._metrics = telemetry.writer(name)
+
+    def submit(self, item: Any) -> bool:
+        """Encolar un item sin bloquear (False si la cola está llena)"""
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self.items_dropped += 1
+            if self.items_dropped % 1000 == 1:
+                logger.warning(f"{self.name}: queue full, dropped {self.items_dropped} items so far")
+            return False
+        self.items_submitted += 1
+        return True
+
+    def start(self) -> asyncio.Task:
+        """Lanzar la tarea de flush en el event loop actual"""
+        # El flag se activa aquí: un stop() antes de que la tarea arranque no se pierde
+        self._running = True
+        self._task = asyncio.create_task(self.run())
+        return self._task
+
+    async def run(self):
+        """Bucle de flush: por tamaño de lote o por tiempo"""
+        logger.info(f"{self.name} writer started (batch: {self.batch_size}, interval: {self.flush_interval}s)")
+
+        while self._running:
+            try:
+                first = await asyncio.wait_for(self.queue.get(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                continue
+
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                if self.queue.empty():
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self.queue.get(), timeout=remaining))
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    batch.append(self.queue.get_nowait())
+
+            await self.flush(batch)
+
+    async def flush(self, batch: List[Any]):
+        """Escribir un lote en un thread del executor"""
+        if not batch:
+            return
+
+        start = time.perf_counter()
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self._write, batch)
+        except Exception as e:
+            self.errors += 1
+            self._metrics.errors.inc()
+            logger.error(f"{self.name}: failed to write batch of {len(batch)}: {e}")
+            return
+
+        elapsed = time.perf_counter() - start
+        self._metrics.latency.observe(elapsed)
+        elapsed_ms = elapsed * 1000
+        self.batches_written += 1
+        self.items_written += len(batch)
+        self.last_flush_ms = elapsed_ms
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+        self._total_flush_ms += elapsed_ms
+
+        now = time.monotonic()
+        self._recent.append((now, len(batch)))
+        while self._recent and now - self._recent[0][0] > self.rate_window:
+            self._recent.popleft()
+
+    def _write(self, batch: List[Any]):
+        session = self.session_factory()
+        try:
+            self.write_batch(session, batch)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def write_batch(self, session, batch: List[Any]):
+        """Escribir un lote dentro de la transacción abierta (implementar en subclases)"""
+        raise NotImplementedError
+
+    async def stop(self):
+        """Detener el bucle y vaciar la cola"""
+        # El bucle termina solo como mucho en flush_interval
+        self._running = False
+        if self._task:
+            await self._task
+
+        pending = []
+        while not self.queue.empty():
+            pending.append(self.queue.get_nowait())
+        for i in range(0, len(pending), self.batch_size):
+            await self.flush(pending[i:i + self.batch_size])
+
+        logger.info(f"{self.name} writer stopped ({self.items_written} items written)")
+
+    def get_stats(self) -> dict:
+        """Profundidad de cola, tasa de commits y latencias de flush"""
+        now = time.monotonic()
+        recent = [(ts, items) for ts, items in self._recent if now - ts <= self.rate_window]
+        return {
+            "queue_depth": self.queue.qsize(),
+            "queue_size": self.queue.maxsize,
+            "items_submitted": self.items_submitted,
+            "items_written": self.items_written,
+            "items_dropped": self.items_dropped,
+            "batches_written": self.batches_written,
+            "errors": self.errors,
+            "commits_per_sec": round(len(recent) / self.rate_window, 3),
+            "items_per_sec": round(sum(items for _, items in recent) / self.rate_window, 3),
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "avg_flush_ms": round(self._total_flush_ms / self.batches_written, 3) if self.batches_written else 0.0,
+            "max_flush_ms": round(self.max_flush_ms, 3)
+        }
+
+
+
+def upsert_insert(model, dialect_name: str):
+    """``INSERT`` con soporte ``ON CONFLICT`` del dialecto (None si no lo tiene)"""
+    if dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        return None
+    return dialect_insert(model)
+
+
+def insert_ignore(model, dialect_name: str):
+    """``INSERT`` que ignora filas que violan una restricción única (SQLite/Postgres)"""
+    stmt = upsert_insert(model, dialect_name)
+    if stmt is None:
+        return insert(model)
+    return stmt.on_conflict_do_nothing()
+
+
+class RowWriter(BatchWriter):
+    """
+    Write-behind genérico: ``submit_row(Model, campos)`` y el lote se inserta
+    con un ``INSERT`` multi-fila por modelo (``COPY`` en Postgres si ``use_copy``)
+
+    Las filas que violan una restricción única (p.ej. un order_id repetido) se
+    ignoran en lugar de tumbar el lote entero.
+    """
+
+    def __init__(self, name: str, session_factory: Callable, use_copy: bool = True, **kwargs):
+        super().__init__(name, session_factory, **kwargs)
+        self.use_copy = use_copy
+
+    def submit_row(self, model, fields: Dict[str, Any]) -> bool:
+        """Encolar una fila de ``model``"""
+        return self.submit((model, fields))
+
+    def write_batch(self, session, batch: List[Tuple[Any, Dict[str, Any]]]):
+        by_model: Dict[Any, List[Dict[str, Any]]] = {}
+        for model, fields in batch:
+            by_model.setdefault(model, []).append(fields)
+
+        dialect_name = session.get_bind().dialect.name
+        for model, rows in by_model.items():
+            if self.use_copy and dialect_name == "postgresql":
+                copy_rows(session, model, rows)
+            else:
+                session.execute(insert_ignore(model, dialect_name), rows)
@@ -0,0 +1,470 @@
+"""
+Push de estado por WebSocket: tópicos con conflación por suscriptor y deltas
+"""
+
+import asyncio
+import json
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from core.logger import get_logger
+
+logger = get_logger("push_hub", "main.log")
+
+CHANNELS = ("ticker", "book", "orders", "positions", "metrics", "breakers")
+
+# Canales por (exchange, símbolo); el resto son globales
+MARKET_CHANNELS = ("ticker", "book")
+
+
+def diff_state(old: Any, new: Any, path: tuple = ()) -> Tuple[List[list], List[list]]:
+    """
+    Diferencia entre dos estados JSON
+
+    Los dicts se comparan por clave y las listas de igual longitud por
+    posición; cualquier otro cambio reemplaza el valor entero.
+
+    Returns:
+        (changes [[ruta, valor], ...], removed [ruta, ...])
+    """
+    changes: List[list] = []
+    removed: List[list] = []
+
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key, value in new.items():
+            if key not in old:
+                changes.append([list(path + (key,)), value])
+            elif old[key] != value:
+                sub_changes, sub_removed = diff_state(old[key], value, path + (key,))
+                changes.extend(sub_changes)
+                removed.extend(sub_removed)
+        removed.extend(list(path + (key,)) for key in old if key not in new)
+    elif isinstance(old, list) and isinstance(new, list) and len(old) == len(new):
+        for index, (before, after) in enumerate(zip(old, new)):
+            if before != after:
+                sub_changes, sub_removed = diff_state(before, after, path + (index,))
+                changes.extend(sub_changes)
+                removed.extend(sub_removed)
+    elif old != new:
+        changes.append([list(path), new])
+
+    return changes, removed
+
+
+def apply_delta(state: Any, changes: List[list], removed: List[list]) -> Any:
+    """Aplicar un delta de ``diff_state`` (lo mismo que hace el cliente)"""
+    for path in removed:
+        target = state
+        for key in path[:-1]:
+            target = target[key]
+        del target[path[-1]]
+
+    for path, value in changes:
+        if not path:
+            state = value
+            continue
+        target = state
+        for key in path[:-1]:
+            target = target[key]
+        target[path[-1]] = value
+
+    return state
+
+
+class Subscription:
+    """Estado de un tópico para un suscriptor: último seq enviado y ritmo máximo"""
+
+    __slots__ = ("min_interval", "last_seq", "last_sent")
+
+    def __init__(self, min_interval: float):
+        self.min_interval = min_interval
+        self.last_seq = 0
+        self.last_sent = 0.0
+
+
+class Subscriber:
+    """
+    Un cliente conectado
+
+    ``run`` envía, para cada tópico suscrito, solo la última versión
+    disponible (las intermedias se descartan) y como mucho una vez cada
+    ``min_interval``. Un cliente lento no acumula cola: mientras su envío
+    está bloqueado, el hub sigue publicando y al volver recibe directamente
+    el estado más reciente.
+    """
+
+    def __init__(self, hub: "PushHub", send: Callable[[str], Awaitable[Any]]):
+        self.hub = hub
+        self._send = send
+        self._send_lock = asyncio.Lock()
+        self.topics: Dict[str, Subscription] = {}
+        self.wake = asyncio.Event()
+
+        self.messages_sent = 0
+
+    async def send(self, text: str):
+        """Enviar un mensaje ya serializado (respuestas y actualizaciones comparten socket)"""
+        async with self._send_lock:
+            await self._send(text)
+        self.messages_sent += 1
+
+    async def run(self):
+        """Bucle de envío hasta que el socket falle o se cancele la tarea"""
+        hub = self.hub
+        timeout = None
+        while True:
+            try:
+                await asyncio.wait_for(self.wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            self.wake.clear()
+
+            timeout = None
+            for topic, subscription in list(self.topics.items()):
+                seq = hub.seq(topic)
+                if seq <= subscription.last_seq:
+                    continue
+
+                wait = subscription.last_sent + subscription.min_interval - time.monotonic()
+                if wait > 0:
+                    timeout = wait if timeout is None else min(timeout, wait)
+                    continue
+
+                if subscription.last_seq:
+                    hub.conflated += seq - subscription.last_seq - 1
+                text = hub.encode(topic, subscription.last_seq)
+                await self.send(text)
+                subscription.last_seq = seq
+                subscription.last_sent = time.monotonic()
+
+
+class PushHub:
+    """
+    Tópicos de estado compartidos por todos los clientes WebSocket
+
+    Un único bucle muestrea cada ``sample_interval`` los tópicos con algún
+    suscriptor a partir de estado que ya mantienen otros componentes (libro
+    del BookMonitor o de los shards, snapshot del MetricsAggregator,
+    breakers abiertos), sin llamadas REST por cliente. Cada cambio crea una
+    versión nueva (``seq``); se guardan las últimas ``history`` para calcular
+    deltas contra lo último que recibió cada cliente. El mensaje de cada par
+    (seq base, seq actual) se serializa una sola vez y se comparte entre
+    todos los clientes que están en la misma base.
+
+    Tópicos: ``ticker:<exchange>:<symbol>``, ``book:<exchange>:<symbol>:<depth>``,
+    ``orders``, ``positions``, ``metrics`` y ``breakers``.
+    """
+
+    def __init__(self, config: dict, manager, metrics_aggregator=None, shard_supervisor=None):
+        cfg = config.get("market_maker_v4_2", {})
+        push_cfg = cfg.get("push", {})
+
+        self.manager = manager
+        self.metrics_aggregator = metrics_aggregator
+        self.shard_supervisor = shard_supervisor
+        self.sample_interval = float(push_cfg.get("sample_interval", 0.1))
+        self.default_rate = float(push_cfg.get("default_rate", 4))
+        self.max_rate = float(push_cfg.get("max_rate", 20))
+        self.history = max(1, int(push_cfg.get("history", 32)))
+        self.max_topics = int(push_cfg.get("max_topics_per_client", 64))
+        self.max_depth = manager.book_monitor.book_limit
+
+        # tópico -> (canal, exchange, símbolo, depth)
+        self._specs: Dict[str, tuple] = {}
+        self._seq: Dict[str, int] = {}
+        # tópico -> {seq: valor} con las últimas ``history`` versiones
+        self._values: Dict[str, Dict[int, Any]] = {}
+        # tópico -> {seq base: mensaje serializado hacia el seq actual}
+        self._encoded: Dict[str, Dict[int, str]] = {}
+        self._subscribers: Dict[str, Set[Subscriber]] = {}
+        self.clients: Set[Subscriber] = set()
+
+        # Vistas derivadas del último snapshot de métricas (se recalculan al cambiar)
+        self._snapshot_views: Tuple[Any, Dict[str, Any]] = (None, {})
+
+        self.samples = 0
+        self.published = 0
+        self.encoded = 0
+        self.conflated = 0
+        self.errors = 0
+
+    async def start(self):
+        """Bucle de muestreo"""
+        while True:
+            try:
+                if self._subscribers:
+                    self.sample()
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Push sample error: {e}")
+            await asyncio.sleep(self.sample_interval)
+
+    # ------------------------------------------------------------------
+    # Clientes
+
+    def connect(self, send: Callable[[str], Awaitable[Any]]) -> Subscriber:
+        """Registrar un cliente; ``send`` envía un mensaje de texto"""
+        subscriber = Subscriber(self, send)
+        self.clients.add(subscriber)
+        return subscriber
+
+    def disconnect(self, subscriber: Subscriber):
+        """Quitar un cliente y todas sus suscripciones"""
+        for topic in list(subscriber.topics):
+            self.unsubscribe(subscriber, topic)
+        self.clients.discard(subscriber)
+
+    def topic_for(self, message: dict) -> Tuple[str, tuple]:
+        """
+        Tópico canónico de una petición de suscripción
+
+        Raises:
+            ValueError: Canal desconocido o faltan exchange/símbolo
+        """
+        channel = message.get("channel")
+        if channel not in CHANNELS:
+            raise ValueError(f"Unknown channel: {channel!r} (expected one of {', '.join(CHANNELS)})")
+        if channel not in MARKET_CHANNELS:
+            return channel, (channel, None, None, None)
+
+        exchange, symbol = message.get("exchange"), message.get("symbol")
+        if not exchange or not symbol:
+            raise ValueError(f"Channel {channel} requires exchange and symbol")
+        if channel == "ticker":
+            return f"ticker:{exchange}:{symbol}", (channel, exchange, symbol, None)
+
+        depth = max(1, min(int(message.get("depth") or self.max_depth), self.max_depth))
+        return f"book:{exchange}:{symbol}:{depth}", (channel, exchange, symbol, depth)
+
+    def subscribe(self, subscriber: Subscriber, message: dict) -> dict:
+        """Suscribir a un tópico; el primer envío es un snapshot completo"""
+        topic, spec = self.topic_for(message)
+        if topic not in subscriber.topics and len(subscriber.topics) >= self.max_topics:
+            raise ValueError(f"Too many subscriptions (max {self.max_topics})")
+
+        rate = min(float(message.get("max_rate") or self.default_rate), self.max_rate)
+        if rate <= 0:
+            raise ValueError("max_rate must be positive")
+
+        subscription = subscriber.topics.get(topic)
+        if subscription is None:
+            subscriber.topics[topic] = Subscription(1 / rate)
+        else:
+            subscription.min_interval = 1 / rate
+
+        if topic not in self._subscribers:
+            self._specs[topic] = spec
+            self._subscribers[topic] = set()
+            # Primer suscriptor: muestrear ya para no esperar al siguiente ciclo
+            self._sample_topic(topic, {})
+        self._subscribers[topic].add(subscriber)
+        subscriber.wake.set()
+
+        return {"type": "subscribed", "topic": topic, "max_rate": rate}
+
+    def unsubscribe(self, subscriber: Subscriber, topic: str) -> dict:
+        """Cancelar una suscripción; el estado del tópico se libera con el último cliente"""
+        subscriber.topics.pop(topic, None)
+        subscribers = self._subscribers.get(topic)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                for state in (self._subscribers, self._specs, self._seq, self._values, self._encoded):
+                    state.pop(topic, None)
+        return {"type": "unsubscribed", "topic": topic}
+
+    def resync(self, subscriber: Subscriber, topic: str) -> dict:
+        """Forzar un snapshot completo en el siguiente envío"""
+        subscription = subscriber.topics.get(topic)
+        if subscription is None:
+            raise ValueError(f"Not subscribed to {topic}")
+        subscription.last_seq = 0
+        subscription.last_sent = 0.0
+        subscriber.wake.set()
+        return {"type": "resync", "topic": topic}
+
+    def handle(self, subscriber: Subscriber, message: dict) -> dict:
+        """
+        Procesar un mensaje del cliente
+
+        ``{"op": "subscribe", "channel": ..., "exchange"?, "symbol"?, "depth"?, "max_rate"?}``,
+        ``{"op": "unsubscribe", "topic": ...}``, ``{"op": "resync", "topic": ...}``
+        o ``{"op": "ping"}``. Los errores se devuelven como ``{"type": "error"}``.
+        """
+        if not isinstance(message, dict):
+            return {"type": "error", "op": None, "error": "Expected a JSON object"}
+        op = message.get("op")
+        try:
+            if op == "subscribe":
+                return self.subscribe(subscriber, message)
+            if op == "unsubscribe":
+                return self.unsubscribe(subscriber, message.get("topic"))
+            if op == "resync":
+                return self.resync(subscriber, message.get("topic"))
+            if op == "ping":
+                return {"type": "pong", "timestamp": time.time()}
+            raise ValueError(f"Unknown op: {op!r}")
+        except (ValueError, TypeError) as e:
+            return {"type": "error", "op": op, "error": str(e)}
+
+    # ------------------------------------------------------------------
+    # Publicación
+
+    def seq(self, topic: str) -> int:
+        """Versión actual del tópico (0 = sin datos todavía)"""
+        return self._seq.get(topic, 0)
+
+    def publish(self, topic: str, value: Any) -> bool:
+        """
+        Registrar el valor actual de un tópico
+
+        Returns:
+            True si cambió y se creó una versión nueva
+        """
+        seq = self._seq.get(topic, 0)
+        values = self._values.setdefault(topic, {})
+        if seq and values[seq] == value:
+            return False
+
+        seq += 1
+        self._seq[topic] = seq
+        values[seq] = value
+        values.pop(seq - self.history, None)
+        self._encoded[topic] = {}
+        self.published += 1
+
+        for subscriber in self._subscribers.get(topic, ()):
+            subscriber.wake.set()
+        return True
+
+    def encode(self, topic: str, base_seq: int) -> str:
+        """
+        Mensaje para llevar a un cliente de ``base_seq`` a la versión actual
+
+        Delta si ``base_seq`` sigue en el historial; si no (cliente nuevo,
+        resync o demasiado atrasado), snapshot completo.
+        """
+        cache = self._encoded.setdefault(topic, {})
+        text = cache.get(base_seq)
+        if text is not None:
+            return text
+
+        seq = self._seq[topic]
+        values = self._values[topic]
+        if base_seq in values:
+            changes, removed = diff_state(values[base_seq], values[seq])
+            message = {"type": "delta", "topic": topic, "seq": seq, "base": base_seq,
+                       "changes": changes, "removed": removed}
+        else:
+            message = {"type": "snapshot", "topic": topic, "seq": seq, "data": values[seq]}
+
+        text = json.dumps(message, separators=(",", ":"), default=str)
+        cache[base_seq] = text
+        self.encoded += 1
+        return text
+
+    # ------------------------------------------------------------------
+    # Lectura de las fuentes
+
+    def sample(self):
+        """Leer el valor actual de cada tópico con suscriptores y publicar los cambios"""
+        cache: Dict[str, Any] = {}
+        for topic in list(self._subscribers):
+            self._sample_topic(topic, cache)
+        self.samples += 1
+
+    def _sample_topic(self, topic: str, cache: Dict[str, Any]):
+        value = self._read(self._specs[topic], cache)
+        if value is not None:
+            self.publish(topic, value)
+
+    def _read(self, spec: tuple, cache: Dict[str, Any]) -> Any:
+        channel, exchange, symbol, depth = spec
+        if channel == "ticker":
+            return self._ticker(exchange, symbol)
+        if channel == "book":
+            return self._book(exchange, symbol, depth)
+        if channel == "breakers":
+            if "breakers" not in cache:
+                cache["breakers"] = self._breakers()
+            return cache["breakers"]
+        return self._metrics_views().get(channel)
+
+    def _top(self, exchange: str, symbol: str) -> Optional[dict]:
+        if self.shard_supervisor:
+            return self.shard_supervisor.get_snapshot()["books"].get(exchange, {}).get(symbol)
+        return self.manager.book_monitor.get_top(exchange, symbol)
+
+    def _ticker(self, exchange: str, symbol: str) -> Optional[dict]:
+        """Ticker derivado del top of book (sin ``fetch_ticker``)"""
+        top = self._top(exchange, symbol)
+        if top is None:
+            return None
+        return {
+            "bid": top["bid"],
+            "ask": top["ask"],
+            "mid": (top["bid"] + top["ask"]) / 2,
+            "spread_bps": top["spread_bps"],
+            "paused": top.get("paused", False),
+            "timestamp": top["timestamp"]
+        }
+
+    def _book(self, exchange: str, symbol: str, depth: int) -> Optional[dict]:
+        if not self.shard_supervisor:
+            return self.manager.book_monitor.get_levels(exchange, symbol, depth)
+        # Los shards solo publican el top; la cantidad no viaja en su snapshot
+        top = self._top(exchange, symbol)
+        if top is None:
+            return None
+        return {"bids": [[top["bid"], None]], "asks": [[top["ask"], None]], "timestamp": top["timestamp"]}
+
+    def _breakers(self) -> dict:
+        breakers = {
+            breaker.name: {
+                "type": breaker.breaker_type.value,
+                "exchange": breaker.exchange,
+                "symbol": breaker.symbol,
+                "opened_at": breaker.opened_at.isoformat() if breaker.opened_at else None,
+                "trigger_count": breaker.trigger_count,
+                "threshold": breaker.threshold
+            }
+            for breaker in self.manager.circuit_breaker_manager.get_open_breakers()
+        }
+        value = {"open": breakers, "open_count": len(breakers)}
+        if self.shard_supervisor:
+            value["shards"] = self.shard_supervisor.get_snapshot()["circuit_breakers"]
+        return value
+
+    def _metrics_views(self) -> Dict[str, Any]:
+        """orders/positions/metrics del snapshot actual, indexados por id para los deltas"""
+        snapshot = self.metrics_aggregator.snapshot if self.metrics_aggregator else None
+        if snapshot is None:
+            return {}
+        if self._snapshot_views[0] is snapshot:
+            return self._snapshot_views[1]
+
+        views = {
+            "metrics": dict(snapshot.payload),
+            # Sin el timestamp de formateo: cambiaría en cada posición en cada refresco
+            "positions": {
+                f"{position['exchange']}:{position['symbol']}:{position['side']}":
+                    {key: value for key, value in position.items() if key != "timestamp"}
+                for position in snapshot.positions
+            },
+            "orders": {f"{order['exchange']}:{order['id']}": order for order in snapshot.orders}
+        }
+        self._snapshot_views = (snapshot, views)
+        return views
+
+    def get_status(self) -> dict:
+        """Clientes, tópicos activos y contadores"""
+        return {
+            "clients": len(self.clients),
+            "topics": {topic: len(subscribers) for topic, subscribers in self._subscribers.items()},
+            "sample_interval": self.sample_interval,
+            "samples": self.samples,
+            "published": self.published,
+            "encoded": self.encoded,
+            "messages_sent": sum(subscriber.messages_sent for subscriber in self.clients),
+            "conflated": self.conflated,
+            "errors": self.errors
+        }
@@ -0,0 +1,141 @@
+"""
+Lecturas y escrituras asíncronas de los modelos (AsyncSession)
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple, Type
+from sqlalchemy import and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+from core.database import Base
+
+
+async def add_row(db: AsyncSession, model: Type[Base], commit: bool = True, **fields) -> Base:
+    """
+    Insertar una fila de cualquier modelo
+
+    Args:
+        db: Sesión asíncrona
+        model: Clase del modelo (Trade, SystemMetric, ...)
+        commit: Confirmar la transacción al terminar
+        **fields: Columnas de la fila
+
+    Returns:
+        Instancia insertada (con id si se confirmó)
+    """
+    row = model(**fields)
+    db.add(row)
+    if commit:
+        await db.commit()
+    return row
+
+
+# ----------------------------------------------------------------------
+# Paginación keyset
+# ----------------------------------------------------------------------
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    """Cursor opaco a partir de la última fila devuelta (timestamp, id)"""
+    raw = json.dumps([timestamp.isoformat(), row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Decodificar un cursor de ``encode_cursor``
+
+    Raises:
+        ValueError: si el cursor no es válido
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def keyset_query(model: Type[Base], columns: Sequence[str], limit: int, cursor: Optional[str] = None,
+                 since: Optional[datetime] = None, until: Optional[datetime] = None,
+                 **filters: Any) -> Select:
+    """
+    SELECT proyectado (solo ``columns``) ordenado por (timestamp, id) descendente
+
+    El cursor se traduce a ``timestamp <= t AND (timestamp < t OR id < i)``,
+    que deja al índice (…, timestamp) resolver el rango sin OFFSET.
+    """
+    query = select(*(getattr(model, column) for column in columns))
+
+    for column, value in filters.items():
+        if value is not None:
+            query = query.where(getattr(model, column) == value)
+    if since is not None:
+        query = query.where(model.timestamp >= since)
+    if until is not None:
+        query = query.where(model.timestamp < until)
+
+    if cursor:
+        timestamp, row_id = decode_cursor(cursor)
+        query = query.where(
+            model.timestamp <= timestamp,
+            or_(model.timestamp < timestamp, and_(model.timestamp == timestamp, model.id < row_id))
+        )
+
+    return query.order_by(model.timestamp.desc(), model.id.desc()).limit(limit)
+
+
+async def keyset_page(db: AsyncSession, model: Type[Base], columns: Sequence[str], limit: int = 100,
+                      cursor: Optional[str] = None, **filters: Any) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Una página de filas como dicts (sin construir objetos ORM)
+
+    ``columns`` debe incluir ``id`` y ``timestamp``.
+
+    Returns:
+        (filas, cursor de la página siguiente o None si no hay más)
+    """
+    limit = max(0, limit)
+    result = await db.execute(keyset_query(model, columns, limit + 1, cursor, **filters))
+    rows = [dict(row._mapping) for row in result]
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        if rows:
+            last = rows[-1]
+            next_cursor = encode_cursor(last["timestamp"], last["id"])
+    return rows, next_cursor
+
+
+async def stream_rows(db: AsyncSession, model: Type[Base], columns: Sequence[str],
+                      since: Optional[datetime] = None, until: Optional[datetime] = None,
+                      batch_size: int = 1000, **filters: Any) -> AsyncIterator[Tuple]:
+    """
+    Recorrer todas las filas en orden cronológico con un cursor del servidor
+
+    Solo hay ``batch_size`` filas en memoria a la vez, sin importar el total.
+
+    Yields:
+        Tuplas con los valores de ``columns``
+    """
+    query = select(*(getattr(model, column) for column in columns))
+
+    for column, value in filters.items():
+        if value is not None:
+            query = query.where(getattr(model, column) == value)
+    if since is not None:
+        query = query.where(model.timestamp >= since)
+    if until is not None:
+        query = query.where(model.timestamp < until)
+
+    query = query.order_by(model.timestamp, model.id).execution_options(yield_per=batch_size)
+
+    result = await db.stream(query)
+    try:
+        async for partition in result.partitions():
+            for row in partition:
+                yield tuple(row)
+    finally:
+        await result.close()
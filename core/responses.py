@@ -0,0 +1,319 @@
+"""
+Capa de respuestas: JSON con orjson, MessagePack opcional, compresión y bytes precalculados
+"""
+
+import asyncio
+import gzip
+import hashlib
+import json
+import time
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+from fastapi.responses import JSONResponse, Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+MSGPACK_MEDIA_TYPES = (MSGPACK_MEDIA_TYPE, "application/x-msgpack")
+
+# Las respuestas dependen de estas cabeceras de la petición
+VARY = "Accept, Accept-Encoding"
+
+# Campos de primer nivel que no cuentan para el ETag (hora de construcción)
+VOLATILE_FIELDS = ("timestamp",)
+
+
+def _default(value: Any) -> Any:
+    """Tipos que ni orjson ni msgpack serializan por sí mismos"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    if hasattr(value, "tolist"):
+        # numpy: escalares y arrays
+        return value.tolist()
+    raise TypeError(f"Type is not serializable: {type(value).__name__}")
+
+
+def dumps_json(content: Any) -> bytes:
+    """JSON compacto en UTF-8 (orjson si está instalado)"""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default,
+                            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def dumps_msgpack(content: Any) -> bytes:
+    """MessagePack (requiere el paquete msgpack)"""
+    return msgpack.packb(content, default=_default, use_bin_type=True)
+
+
+def content_etag(content: Any, volatile: Tuple[str, ...] = VOLATILE_FIELDS) -> str:
+    """ETag fuerte: hash del contenido canónico (claves ordenadas, sin campos volátiles)"""
+    if isinstance(content, dict) and volatile:
+        content = {key: value for key, value in content.items() if key not in volatile}
+    if orjson is not None:
+        canonical = orjson.dumps(content, default=_default,
+                                 option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_SORT_KEYS)
+    else:
+        canonical = json.dumps(content, default=_default, sort_keys=True, separators=(",", ":")).encode()
+    return '"' + hashlib.blake2b(canonical, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """``If-None-Match`` (lista, ``*`` o validadores débiles ``W/``) contra un ETag"""
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse serializada con ``dumps_json`` (default_response_class de la app)"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps_json(content)
+
+
+def header_tokens(header: str) -> Dict[str, float]:
+    """``a/b;q=0.5, c`` -> {"a/b": 0.5, "c": 1.0}"""
+    tokens = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        tokens[name.strip().lower()] = quality
+    return tokens
+
+
+class EncodedPayload:
+    """Contenido de una respuesta cacheada con su ETag y sus cuerpos ya serializados por variante"""
+
+    __slots__ = ("content", "etag", "created_at", "checked_at", "bodies")
+
+    def __init__(self, content: Any, created_at: float):
+        self.content = content
+        self.etag = content_etag(content)
+        # created_at: último cambio real del contenido; checked_at: última reconstrucción
+        self.created_at = created_at
+        self.checked_at = created_at
+        # (media_type, encoding) -> (cuerpo, encoding aplicado)
+        self.bodies: Dict[Tuple[str, Optional[str]], Tuple[bytes, Optional[str]]] = {}
+
+
+class ResponseEncoder:
+    """
+    Serializa respuestas según ``Accept`` / ``Accept-Encoding``
+
+    JSON con orjson por defecto, MessagePack si el cliente lo pide y el
+    paquete está instalado, y brotli (si está instalado) o gzip para cuerpos
+    de al menos ``compress_threshold`` bytes. Los datos de referencia
+    (mercados, símbolos, config) pasan por ``cached``: el contenido se
+    construye una vez por ``reference_ttl`` y cada variante se serializa y
+    comprime una sola vez; las peticiones siguientes solo copian bytes.
+
+    Cada contenido cacheado lleva un ETag (hash del contenido sin su
+    ``timestamp``). Si una reconstrucción da el mismo hash se conserva la
+    entrada anterior (bytes y ETag), así que el ETag solo cambia cuando los
+    datos cambian de verdad; ``If-None-Match`` con el ETag vigente recibe un
+    304 sin cuerpo y ``Cache-Control: max-age`` es lo que falta para la
+    siguiente reconstrucción.
+    """
+
+    def __init__(self, config: dict):
+        cfg = config.get("market_maker_v4_2", {})
+        responses_cfg = cfg.get("responses", {})
+
+        self.compress_threshold = int(responses_cfg.get("compress_threshold", 1024))
+        self.gzip_level = int(responses_cfg.get("gzip_level", 6))
+        self.brotli_quality = int(responses_cfg.get("brotli_quality", 4))
+        self.msgpack_enabled = bool(responses_cfg.get("msgpack", True)) and msgpack is not None
+        self.reference_ttl = float(responses_cfg.get("reference_ttl", 60))
+        self.max_cached = int(responses_cfg.get("max_cached", 256))
+
+        self._cache: Dict[Hashable, EncodedPayload] = {}
+        self._building: Dict[Hashable, asyncio.Task] = {}
+
+        self.rendered = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.unchanged_rebuilds = 0
+        self.not_modified = 0
+        self.bytes_raw = 0
+        self.bytes_sent = 0
+
+    def variant(self, request) -> Tuple[str, Optional[str]]:
+        """(media_type, encoding preferido) para una petición"""
+        media_type = JSON_MEDIA_TYPE
+        if self.msgpack_enabled:
+            accept = header_tokens(request.headers.get("accept", ""))
+            if any(accept.get(name, 0) > accept.get(JSON_MEDIA_TYPE, 0) for name in MSGPACK_MEDIA_TYPES):
+                media_type = MSGPACK_MEDIA_TYPE
+
+        encodings = header_tokens(request.headers.get("accept-encoding", ""))
+        encoding = None
+        if brotli is not None and encodings.get("br", 0) > 0:
+            encoding = "br"
+        elif encodings.get("gzip", 0) > 0:
+            encoding = "gzip"
+        return media_type, encoding
+
+    def serialize(self, content: Any, media_type: str) -> bytes:
+        if media_type == MSGPACK_MEDIA_TYPE:
+            return dumps_msgpack(content)
+        return dumps_json(content)
+
+    def compress(self, body: bytes, encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+        """Comprimir si el cliente lo acepta y el cuerpo supera el umbral"""
+        if encoding is None or len(body) < self.compress_threshold:
+            return body, None
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality), encoding
+        return gzip.compress(body, self.gzip_level, mtime=0), encoding
+
+    def _response(self, body: bytes, raw_size: int, media_type: str, encoding: Optional[str],
+                  status_code: int = 200, headers: Dict[str, str] = None) -> Response:
+        response = Response(content=body, status_code=status_code, media_type=media_type, headers=headers)
+        response.headers["Vary"] = VARY
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+        self.rendered += 1
+        self.bytes_raw += raw_size
+        self.bytes_sent += len(body)
+        return response
+
+    def render(self, request, content: Any, status_code: int = 200,
+               headers: Dict[str, str] = None) -> Response:
+        """Respuesta negociada para ``content`` (sin pasar por jsonable_encoder)"""
+        media_type, encoding = self.variant(request)
+        raw = self.serialize(content, media_type)
+        body, encoding = self.compress(raw, encoding)
+        return self._response(body, len(raw), media_type, encoding, status_code, headers)
+
+    async def cached(self, request, key: Hashable, build: Callable[[], Awaitable[Any]],
+                     ttl: float = None, headers: Dict[str, str] = None) -> Response:
+        """
+        Respuesta de datos de referencia con los bytes precalculados
+
+        Args:
+            key: Identifica el contenido (endpoint y parámetros)
+            build: Corrutina que construye el contenido si falta o caducó
+            ttl: Segundos de validez (por defecto ``reference_ttl``; 0 =
+                 reconstruir siempre y usar solo el ETag)
+        """
+        ttl = self.reference_ttl if ttl is None else ttl
+        payload = await self.payload(key, build, ttl)
+
+        headers = dict(headers or {})
+        headers["ETag"] = payload.etag
+        headers["Cache-Control"] = f"max-age={max(0, int(ttl - (time.time() - payload.checked_at)))}"
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and etag_matches(if_none_match, payload.etag):
+            self.not_modified += 1
+            response = Response(status_code=304, headers=headers)
+            response.headers["Vary"] = VARY
+            return response
+
+        media_type, encoding = self.variant(request)
+
+        variant = (media_type, encoding)
+        entry = payload.bodies.get(variant)
+        if entry is None:
+            raw = payload.bodies.get((media_type, None))
+            raw = raw[0] if raw else self.serialize(payload.content, media_type)
+            payload.bodies[(media_type, None)] = (raw, None)
+            entry = self.compress(raw, encoding)
+            payload.bodies[variant] = entry
+
+        raw_size = len(payload.bodies[(media_type, None)][0])
+        return self._response(entry[0], raw_size, media_type, entry[1], headers=headers)
+
+    async def payload(self, key: Hashable, build: Callable[[], Awaitable[Any]],
+                      ttl: float = None) -> EncodedPayload:
+        """Contenido cacheado; peticiones concurrentes con la caché vacía comparten una sola construcción"""
+        ttl = self.reference_ttl if ttl is None else ttl
+        payload = self._cache.get(key)
+        if payload is not None and time.time() - payload.checked_at < ttl:
+            self.cache_hits += 1
+            return payload
+
+        self.cache_misses += 1
+        task = self._building.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._build(key, build))
+            # Si quien la lanzó se desconecta, el error no debe quedar sin leer
+            task.add_done_callback(lambda done: done.cancelled() or done.exception())
+            self._building[key] = task
+        return await asyncio.shield(task)
+
+    async def _build(self, key: Hashable, build: Callable[[], Awaitable[Any]]) -> EncodedPayload:
+        try:
+            payload = EncodedPayload(await build(), time.time())
+            previous = self._cache.get(key)
+            if previous is not None and previous.etag == payload.etag:
+                # Mismos datos: conservar bytes ya serializados (y su timestamp)
+                previous.checked_at = payload.checked_at
+                self.unchanged_rebuilds += 1
+                return previous
+            self._cache[key] = payload
+            # Claves con parámetros de consulta: acotar descartando las más antiguas
+            while len(self._cache) > self.max_cached:
+                self._cache.pop(next(iter(self._cache)))
+            return payload
+        finally:
+            self._building.pop(key, None)
+
+    def invalidate(self, key: Hashable = None):
+        """Descartar una entrada (o toda la caché)"""
+        if key is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(key, None)
+
+    def get_status(self) -> dict:
+        """Codecs disponibles, caché y ratio de compresión"""
+        return {
+            "json": "orjson" if orjson is not None else "json",
+            "msgpack": self.msgpack_enabled,
+            "brotli": brotli is not None,
+            "compress_threshold": self.compress_threshold,
+            "cached_payloads": len(self._cache),
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "unchanged_rebuilds": self.unchanged_rebuilds,
+            "not_modified": self.not_modified,
+            "rendered": self.rendered,
+            "bytes_raw": self.bytes_raw,
+            "bytes_sent": self.bytes_sent,
+            "compression_ratio": round(self.bytes_sent / self.bytes_raw, 4) if self.bytes_raw else None
+        }
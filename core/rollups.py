@@ -0,0 +1,356 @@
+"""
+Rollups de series temporales (1m/5m/1h/1d) y retención por resolución
+"""
+
+import asyncio
+import calendar
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional, Tuple
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.database import BalanceSnapshot, ExchangeHealth, MetricRollup, SystemMetric
+from core.logger import get_logger
+
+logger = get_logger("rollups", "database.log")
+
+# Resoluciones en segundos, de la más fina a la más gruesa
+RESOLUTIONS = {"1m": 60, "5m": 300, "1h": 3600, "1d": 86400}
+
+
+@dataclass(frozen=True)
+class RollupSource:
+    """Tabla cruda agregada: modelo, cómo se forma la serie (y de qué columnas) y qué métricas"""
+    model: type
+    series: Callable
+    series_columns: Tuple[str, ...]
+    metrics: Tuple[str, ...]
+
+
+ROLLUP_SOURCES: Dict[str, RollupSource] = {
+    "system_metrics": RollupSource(
+        SystemMetric,
+        lambda row: "",
+        (),
+        ("equity", "total_pnl", "daily_pnl", "total_fees", "open_orders",
+         "open_positions", "healthy_exchanges", "open_circuits")
+    ),
+    "exchange_health": RollupSource(
+        ExchangeHealth,
+        lambda row: row.exchange or "",
+        ("exchange",),
+        ("latency_ms", "success_rate", "error_count", "api_calls_used")
+    ),
+    "balance_snapshots": RollupSource(
+        BalanceSnapshot,
+        lambda row: f"{row.exchange}:{row.currency}",
+        ("exchange", "currency"),
+        ("free", "used", "total", "usd_value")
+    ),
+}
+
+
+def floor_time(ts: datetime, seconds: int) -> datetime:
+    """Inicio del bucket de ``seconds`` que contiene ``ts`` (UTC naive)"""
+    epoch = calendar.timegm(ts.utctimetuple())
+    return datetime.utcfromtimestamp(epoch - epoch % seconds)
+
+
+class RollupManager:
+    """
+    Agrega las tablas crudas en buckets 1m y, en cascada, 5m/1h/1d
+
+    Cada pasada procesa solo los minutos cerrados desde la última marca, como
+    mucho ``max_pass_hours`` por tabla (un histórico largo se reparte en
+    varias transacciones acotadas): los buckets 1m salen de las columnas de
+    métricas de las filas crudas y cada resolución se recalcula desde la
+    anterior en el rango afectado (min/max/sum/count/last se componen sin
+    volver a leer las filas crudas). Después se aplica la retención de cada
+    resolución y de las tablas crudas.
+    """
+
+    def __init__(self, config: dict, session_factory: Callable):
+        cfg = config.get("market_maker_v4_2", {}).get("rollups", {})
+        retention = cfg.get("retention_days", {})
+
+        self.session_factory = session_factory
+        self.interval = float(cfg.get("interval", 60))
+        self.lag = timedelta(seconds=float(cfg.get("lag_seconds", 5)))
+        self.max_pass = timedelta(hours=float(cfg.get("max_pass_hours", 6)))
+        # Días de retención (0 = sin límite); "raw" aplica a las tablas origen
+        self.retention_days = {
+            "raw": retention.get("raw", 2),
+            "1m": retention.get("1m", 7),
+            "5m": retention.get("5m", 30),
+            "1h": retention.get("1h", 365),
+            "1d": retention.get("1d", 0),
+        }
+
+        # source -> inicio del primer minuto aún no agregado
+        self._watermarks: Dict[str, Optional[datetime]] = {}
+        self.passes = 0
+        self.buckets_written = 0
+        self.rows_pruned = 0
+        self.last_run_ms = 0.0
+
+    async def start(self):
+        """Bucle de agregación en segundo plano (el trabajo corre en el executor)"""
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                start = loop.time()
+                caught_up = await loop.run_in_executor(None, self.run_once)
+                self.last_run_ms = (loop.time() - start) * 1000
+            except Exception as e:
+                logger.error(f"Rollup error: {e}")
+                caught_up = True
+            # Con histórico pendiente, la siguiente ventana va sin esperar
+            await asyncio.sleep(self.interval if caught_up else 0)
+
+    def run_once(self, now: datetime = None) -> bool:
+        """
+        Una pasada de agregación y retención en una sola transacción
+
+        Returns:
+            True si todas las tablas quedaron al día (False si alguna tenía
+            más de ``max_pass_hours`` pendientes)
+        """
+        now = now or datetime.utcnow()
+        end = floor_time(now - self.lag, RESOLUTIONS["1m"])
+        caught_up = True
+
+        session = self.session_factory()
+        try:
+            for name, source in ROLLUP_SOURCES.items():
+                start = self._watermark(session, name, source)
+                if start is None or start >= end:
+                    continue
+                pass_end = min(end, start + self.max_pass)
+                if pass_end < end:
+                    caught_up = False
+                self.buckets_written += self._rollup_source(session, name, source, start, pass_end)
+                self._watermarks[name] = pass_end
+
+            self.rows_pruned += self._apply_retention(session, now)
+            session.commit()
+            self.passes += 1
+            return caught_up
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def _watermark(self, session, name: str, source: RollupSource) -> Optional[datetime]:
+        if self._watermarks.get(name) is not None:
+            return self._watermarks[name]
+
+        last_bucket = session.scalar(
+            select(func.max(MetricRollup.bucket_start))
+            .where(MetricRollup.source == name, MetricRollup.resolution == RESOLUTIONS["1m"])
+        )
+        if last_bucket is not None:
+            watermark = last_bucket + timedelta(seconds=RESOLUTIONS["1m"])
+        else:
+            first = session.scalar(select(func.min(source.model.timestamp)))
+            watermark = floor_time(first, RESOLUTIONS["1m"]) if first else None
+
+        self._watermarks[name] = watermark
+        return watermark
+
+    def _rollup_source(self, session, name: str, source: RollupSource,
+                       start: datetime, end: datetime) -> int:
+        model = source.model
+        columns = [getattr(model, column) for column in ("timestamp",) + source.series_columns + source.metrics]
+        rows = session.execute(
+            select(*columns)
+            .where(model.timestamp >= start, model.timestamp < end)
+            .order_by(model.timestamp)
+        )
+
+        # (series, metric, bucket) -> [count, min, max, sum, last]
+        buckets: Dict[Tuple[str, str, datetime], list] = {}
+        for row in rows:
+            bucket_start = floor_time(row.timestamp, RESOLUTIONS["1m"])
+            series = source.series(row)
+            for metric in source.metrics:
+                value = getattr(row, metric)
+                if value is None:
+                    continue
+                value = float(value)
+                acc = buckets.get((series, metric, bucket_start))
+                if acc is None:
+                    buckets[(series, metric, bucket_start)] = [1, value, value, value, value]
+                else:
+                    acc[0] += 1
+                    acc[1] = min(acc[1], value)
+                    acc[2] = max(acc[2], value)
+                    acc[3] += value
+                    acc[4] = value
+
+        written = self._replace_buckets(session, name, RESOLUTIONS["1m"], start, end, buckets)
+
+        # Cascada: cada resolución se compone desde la anterior
+        resolutions = list(RESOLUTIONS.values())
+        for finer, coarser in zip(resolutions, resolutions[1:]):
+            range_start = floor_time(start, coarser)
+            finer_rows = session.execute(
+                select(MetricRollup)
+                .where(
+                    MetricRollup.source == name,
+                    MetricRollup.resolution == finer,
+                    MetricRollup.bucket_start >= range_start,
+                    MetricRollup.bucket_start < end
+                )
+                .order_by(MetricRollup.bucket_start)
+            ).scalars()
+
+            merged: Dict[Tuple[str, str, datetime], list] = {}
+            for rollup in finer_rows:
+                key = (rollup.series, rollup.metric, floor_time(rollup.bucket_start, coarser))
+                acc = merged.get(key)
+                if acc is None:
+                    merged[key] = [rollup.count, rollup.min, rollup.max, rollup.sum, rollup.last]
+                else:
+                    acc[0] += rollup.count
+                    acc[1] = min(acc[1], rollup.min)
+                    acc[2] = max(acc[2], rollup.max)
+                    acc[3] += rollup.sum
+                    acc[4] = rollup.last
+
+            written += self._replace_buckets(session, name, coarser, range_start, end, merged)
+
+        return written
+
+    def _replace_buckets(self, session, name: str, resolution: int, start: datetime, end: datetime,
+                         buckets: Dict[Tuple[str, str, datetime], list]) -> int:
+        session.execute(
+            delete(MetricRollup).where(
+                MetricRollup.source == name,
+                MetricRollup.resolution == resolution,
+                MetricRollup.bucket_start >= start,
+                MetricRollup.bucket_start < end
+            )
+        )
+        session.add_all([
+            MetricRollup(
+                source=name, series=series, metric=metric, resolution=resolution,
+                bucket_start=bucket_start, count=acc[0], min=acc[1], max=acc[2], sum=acc[3], last=acc[4]
+            )
+            for (series, metric, bucket_start), acc in buckets.items()
+        ])
+        session.flush()
+        return len(buckets)
+
+    def _apply_retention(self, session, now: datetime) -> int:
+        pruned = 0
+
+        raw_days = self.retention_days["raw"]
+        if raw_days:
+            cutoff = now - timedelta(days=raw_days)
+            for name, source in ROLLUP_SOURCES.items():
+                # Nunca borrar filas crudas que aún no se agregaron
+                watermark = self._watermarks.get(name)
+                limit = min(cutoff, watermark) if watermark else cutoff
+                result = session.execute(delete(source.model).where(source.model.timestamp < limit))
+                pruned += result.rowcount or 0
+
+        for label, resolution in RESOLUTIONS.items():
+            days = self.retention_days[label]
+            if not days:
+                continue
+            result = session.execute(
+                delete(MetricRollup).where(
+                    MetricRollup.resolution == resolution,
+                    MetricRollup.bucket_start < now - timedelta(days=days)
+                )
+            )
+            pruned += result.rowcount or 0
+
+        return pruned
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+
+    def choose_resolution(self, start: datetime, step_seconds: int, now: datetime = None) -> int:
+        """
+        Resolución más gruesa que no supera ``step_seconds`` y cuya retención
+        aún cubre ``start`` (si ninguna lo cubre, la más gruesa disponible)
+        """
+        now = now or datetime.utcnow()
+        candidates = [(label, res) for label, res in RESOLUTIONS.items() if res <= max(step_seconds, RESOLUTIONS["1m"])]
+
+        for label, resolution in reversed(candidates):
+            days = self.retention_days[label]
+            if not days or start >= now - timedelta(days=days):
+                return resolution
+
+        for label, resolution in RESOLUTIONS.items():
+            days = self.retention_days[label]
+            if not days or start >= now - timedelta(days=days):
+                return resolution
+        return RESOLUTIONS["1d"]
+
+    async def query_range(self, db: AsyncSession, source: str, metric: str, start: datetime,
+                          end: datetime, step_seconds: int = 60, series: str = None) -> dict:
+        """
+        Serie agregada de ``metric`` en [start, end) desde el bucket más grueso
+        que satisface el paso pedido
+
+        Returns:
+            {"resolution": segundos, "points": [{bucket, series, min, max, avg, last, count}]}
+        """
+        if source not in ROLLUP_SOURCES:
+            raise ValueError(f"Unknown rollup source: {source}")
+        if metric not in ROLLUP_SOURCES[source].metrics:
+            raise ValueError(f"Unknown metric {metric} for {source}")
+
+        resolution = self.choose_resolution(start, step_seconds)
+        query = (
+            select(MetricRollup)
+            .where(
+                MetricRollup.source == source,
+                MetricRollup.metric == metric,
+                MetricRollup.resolution == resolution,
+                MetricRollup.bucket_start >= floor_time(start, resolution),
+                MetricRollup.bucket_start < end
+            )
+            .order_by(MetricRollup.bucket_start)
+        )
+        if series is not None:
+            query = query.where(MetricRollup.series == series)
+
+        result = await db.execute(query)
+        return {
+            "source": source,
+            "metric": metric,
+            "resolution": resolution,
+            "points": [
+                {
+                    "bucket": rollup.bucket_start.isoformat(),
+                    "series": rollup.series,
+                    "min": rollup.min,
+                    "max": rollup.max,
+                    "avg": rollup.sum / rollup.count if rollup.count else None,
+                    "last": rollup.last,
+                    "count": rollup.count
+                }
+                for rollup in result.scalars()
+            ]
+        }
+
+    def get_status(self) -> dict:
+        """Marcas de agregación y contadores"""
+        return {
+            "interval": self.interval,
+            "retention_days": self.retention_days,
+            "watermarks": {
+                name: watermark.isoformat() if watermark else None
+                for name, watermark in self._watermarks.items()
+            },
+            "passes": self.passes,
+            "buckets_written": self.buckets_written,
+            "rows_pruned": self.rows_pruned,
+            "last_run_ms": round(self.last_run_ms, 3)
+        }
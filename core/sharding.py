@@ -0,0 +1,528 @@
+"""
+Runtime multi-proceso: reparto de símbolos/venues entre workers
+"""
+
+import asyncio
+import copy
+import multiprocessing
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from core.circuit_breaker import transition_event
+from core.ipc import IPCChannel, IPCError
+from core.logger import get_logger
+
+logger = get_logger("sharding", "sharding.log")
+
+
+@dataclass
+class ShardAssignment:
+    """Exchanges y símbolos asignados a un worker"""
+    shard_id: int
+    exchanges: Dict[str, List[str]] = field(default_factory=dict)
+    # Fracción del rate limit de cada venue que le toca (venues repartidos entre varios shards)
+    rate_limit_share: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def pairs(self) -> List[Tuple[str, str]]:
+        return [(exchange, symbol) for exchange, symbols in self.exchanges.items() for symbol in symbols]
+
+
+def plan_shards(config: dict, workers: int, strategy: str = "venue") -> List[ShardAssignment]:
+    """
+    Repartir el universo (exchange, símbolo) entre ``workers`` procesos
+
+    Args:
+        config: Configuración completa
+        workers: Número de workers
+        strategy: ``venue`` (cada exchange entero en un worker) o ``symbol``
+            (pares exchange/símbolo en round-robin). Con ``symbol`` un venue
+            puede acabar en varios procesos con las mismas API keys: cada uno
+            recibe ``1/N`` del rate limit del venue para no superarlo entre todos.
+
+    Returns:
+        Lista de asignaciones no vacías
+    """
+    default_symbols = config.get("market_maker_v4_2", {}).get("symbols", [])
+    universe: Dict[str, List[str]] = {}
+    for exchange_name, exchange_config in config.get("exchanges", {}).items():
+        if exchange_config.get("enabled", False):
+            universe[exchange_name] = list(exchange_config.get("symbols") or default_symbols)
+
+    shards = [ShardAssignment(shard_id=i) for i in range(max(1, workers))]
+
+    if strategy == "venue":
+        for i, (exchange_name, symbols) in enumerate(sorted(universe.items())):
+            shards[i % len(shards)].exchanges[exchange_name] = symbols
+    elif strategy == "symbol":
+        pairs = sorted((symbol, exchange) for exchange, symbols in universe.items() for symbol in symbols)
+        for i, (symbol, exchange_name) in enumerate(pairs):
+            shards[i % len(shards)].exchanges.setdefault(exchange_name, []).append(symbol)
+    else:
+        raise ValueError(f"Unknown sharding strategy: {strategy}")
+
+    shards = [shard for shard in shards if shard.exchanges]
+    for exchange_name in universe:
+        owners = [shard for shard in shards if exchange_name in shard.exchanges]
+        for shard in owners:
+            shard.rate_limit_share[exchange_name] = 1.0 / len(owners)
+    return shards
+
+
+def shard_config(config: dict, assignment: ShardAssignment) -> dict:
+    """Configuración restringida a los exchanges y símbolos de un shard"""
+    cfg = copy.deepcopy(config)
+    exchanges = cfg.get("exchanges", {})
+    cfg["exchanges"] = {
+        name: {**exchanges[name], "symbols": symbols,
+               "rate_limit_share": assignment.rate_limit_share.get(name, 1.0)}
+        for name, symbols in assignment.exchanges.items()
+    }
+    symbols = sorted({symbol for _, symbol in assignment.pairs})
+    cfg.setdefault("market_maker_v4_2", {})["symbols"] = symbols
+    return cfg
+
+
+# ============================================================================
+# WORKER
+# ============================================================================
+
+class ShardWorker:
+    """Proceso worker: su propio event loop, instancias ccxt y loops de fondo"""
+
+    def __init__(self, assignment: ShardAssignment, config: dict, secrets: dict,
+                 conn, snapshot_interval: float):
+        self.assignment = assignment
+        self.config = shard_config(config, assignment)
+        self.secrets = secrets
+        self.conn = conn
+        self.snapshot_interval = snapshot_interval
+
+        self.manager = None
+        self.channel: Optional[IPCChannel] = None
+        self.shared_risk_state: Dict[str, Any] = {}
+        self._stop: Optional[asyncio.Event] = None
+
+    async def run(self):
+        """Inicializar el manager del shard y atender al supervisor hasta el shutdown"""
+        from exchanges.multi_exchange_manager import MultiExchangeManager
+
+        self._stop = asyncio.Event()
+        self.channel = IPCChannel(
+            self.conn, name=f"shard-{self.assignment.shard_id}",
+            request_handler=self._handle_request,
+            event_handler=self._handle_event
+        )
+        self.channel.start()
+
+        self.manager = MultiExchangeManager(self.config, self.secrets)
+        self.manager.book_monitor.add_listener(self._on_book_pause)
+        self.manager.circuit_breaker_manager.add_listener(self._on_breaker_transition)
+        await self.manager.initialize()
+        self._apply_remote_breakers()
+
+        tasks = [
+            asyncio.create_task(self.manager.start_health_monitoring()),
+            asyncio.create_task(self.manager.start_volatility_monitoring()),
+            asyncio.create_task(self.manager.start_funding_monitoring()),
+            asyncio.create_task(self.manager.start_book_monitoring()),
+            asyncio.create_task(self._publish_snapshots()),
+        ]
+        self.channel.publish("ready", {"shard_id": self.assignment.shard_id, "pid": os.getpid()})
+
+        await self._stop.wait()
+
+        for task in tasks:
+            task.cancel()
+        await self.manager.shutdown()
+        self.channel.close()
+
+    async def _publish_snapshots(self):
+        """Publicar el estado del shard al supervisor en cada intervalo"""
+        last_open: List[list] = []
+        while True:
+            try:
+                snapshot = self.snapshot()
+                self.channel.publish("snapshot", snapshot)
+
+                # Cambios de breakers: el supervisor los propaga al resto de shards
+                if snapshot["open_breakers"] != last_open:
+                    last_open = snapshot["open_breakers"]
+                    self.channel.publish("breakers", last_open)
+            except IPCError:
+                self._stop.set()
+                return
+            except Exception as e:
+                logger.error(f"Shard {self.assignment.shard_id} snapshot error: {e}")
+            await asyncio.sleep(self.snapshot_interval)
+
+    def _on_book_pause(self, action: str, exchange_name: str, symbol: str):
+        """Las pausas por libro se envían al momento, sin esperar al snapshot"""
+        try:
+            self.channel.publish("book", {"action": action, "exchange": exchange_name, "symbol": symbol})
+        except IPCError:
+            pass
+
+    def _on_breaker_transition(self, action: str, breaker, **details):
+        """Las transiciones de los breakers del shard se envían al supervisor, que las persiste"""
+        try:
+            self.channel.publish("breaker_event", transition_event(action, breaker, **details))
+        except IPCError:
+            pass
+
+    def snapshot(self) -> dict:
+        """Estado serializable del shard"""
+        manager = self.manager
+        return {
+            "shard_id": self.assignment.shard_id,
+            "pid": os.getpid(),
+            "timestamp": time.time(),
+            "assignment": self.assignment.exchanges,
+            "exchanges": {name: asdict(health) for name, health in manager.get_exchange_health().items()},
+            "circuit_breakers": manager.circuit_breaker_manager.get_status(),
+            "open_breakers": self._local_open_breakers(),
+            "volatility": manager.volatility_estimator.get_status()["symbols"],
+            "funding": manager.funding_monitor.get_status()["rates"],
+            "books": manager.book_monitor.get_status()["books"],
+            "sizing": manager.sizing_engine.inputs(),
+        }
+
+    def _local_open_breakers(self) -> List[list]:
+        """Claves [exchange, símbolo, tipo] de los breakers abiertos por este shard"""
+        return sorted(
+            [breaker.exchange, breaker.symbol, breaker.breaker_type.value]
+            for breaker in self.manager.circuit_breaker_manager.get_open_breakers()
+        )
+
+    def _apply_remote_breakers(self):
+        """
+        Dar a conocer al CircuitBreakerManager local los breakers abiertos en otros shards
+
+        Van a ``remote_open``: ``is_open`` y las pausas del shard los ven, pero
+        no se tocan filas locales ni se notifica a los listeners (el dueño ya
+        alertó y registró la apertura, y solo él la cierra).
+        """
+        if self.manager is None:
+            return
+        self.manager.circuit_breaker_manager.set_remote_open({
+            tuple(key)
+            for shard_id, keys in self.shared_risk_state.get("open_breakers", {}).items()
+            if int(shard_id) != self.assignment.shard_id
+            for key in keys
+        })
+
+    async def _handle_request(self, method: str, args: tuple, kwargs: dict) -> Any:
+        if method == "call":
+            exchange_name, name, call_args = args[0], args[1], args[2:]
+            exchange = self.manager.exchanges.get(exchange_name)
+            if exchange is None:
+                raise ValueError(f"Exchange {exchange_name} not owned by shard {self.assignment.shard_id}")
+            result = getattr(exchange, name)(*call_args, **kwargs)
+            if asyncio.iscoroutine(result):
+                result = await result
+            return result
+        if method == "snapshot":
+            return self.snapshot()
+        if method == "shutdown":
+            self._stop.set()
+            return True
+        raise ValueError(f"Unknown shard method: {method}")
+
+    def _handle_event(self, topic: str, payload: Any):
+        if topic == "risk_state":
+            self.shared_risk_state = payload or {}
+            risk_mode = self.shared_risk_state.get("risk_mode")
+            if risk_mode:
+                self.config["market_maker_v4_2"]["risk_mode"] = risk_mode
+            self._apply_remote_breakers()
+
+
+def _shard_main(assignment: ShardAssignment, config: dict, secrets: dict, conn, snapshot_interval: float):
+    """Entry point del proceso worker"""
+    worker = ShardWorker(assignment, config, secrets, conn, snapshot_interval)
+    try:
+        asyncio.run(worker.run())
+    except KeyboardInterrupt:
+        pass
+
+
+# ============================================================================
+# SUPERVISOR
+# ============================================================================
+
+class ShardExchange:
+    """
+    ExchangeWrapper del proceso API cuyas llamadas al venue se ejecutan
+    en el shard dueño. Markets, config y el resto de atributos se leen
+    del wrapper local.
+    """
+
+    ROUTED_METHODS = frozenset({
+        "fetch_balance", "fetch_positions", "fetch_order_book", "fetch_ticker", "fetch_tickers",
+        "fetch_ohlcv", "fetch_open_orders", "fetch_my_trades", "create_order", "cancel_order",
+        "set_leverage", "set_margin_mode", "fetch_funding_rate", "fetch_funding_rates",
+        "fetch_funding_rate_history",
+    })
+
+    def __init__(self, supervisor: "ShardSupervisor", local):
+        self.supervisor = supervisor
+        self.local = local
+        self.exchange_name = local.exchange_name
+
+    def __getattr__(self, name: str) -> Any:
+        if name in self.ROUTED_METHODS:
+            async def routed(*args, **kwargs):
+                return await self.supervisor.call(self.exchange_name, name, *args, **kwargs)
+            return routed
+        return getattr(self.local, name)
+
+
+@dataclass
+class ShardHandle:
+    """Proceso worker visto desde el supervisor"""
+    assignment: ShardAssignment
+    process: Any
+    channel: IPCChannel
+    snapshot: Dict[str, Any] = field(default_factory=dict)
+    open_breakers: List[list] = field(default_factory=list)
+    paused: Set[Tuple[str, str]] = field(default_factory=set)
+    restarts: int = 0
+
+
+class ShardSupervisor:
+    """
+    Lanza un worker por shard, enruta llamadas al shard dueño de cada
+    (exchange, símbolo) y agrega sus snapshots para la API.
+
+    El estado de riesgo compartido (risk mode y breakers abiertos en cualquier
+    shard) se difunde a todos los workers por el mismo canal IPC.
+    """
+
+    def __init__(self, config: dict, secrets: dict):
+        self.config = config
+        self.secrets = secrets
+        sharding = config.get("market_maker_v4_2", {}).get("sharding", {})
+
+        self.enabled = sharding.get("enabled", False)
+        self.workers = int(sharding.get("workers") or os.cpu_count() or 1)
+        self.strategy = sharding.get("strategy", "venue")
+        self.snapshot_interval = float(sharding.get("snapshot_interval", 1.0))
+        self.call_timeout = float(sharding.get("call_timeout", 30))
+
+        self.shards: Dict[int, ShardHandle] = {}
+        self._snapshot_listeners: List[Callable] = []
+        self._transition_listeners: List[Callable] = []
+        self._owners: Dict[Tuple[str, str], int] = {}
+        self._exchange_owners: Dict[str, int] = {}
+        self._context = multiprocessing.get_context("spawn")
+
+    async def start(self):
+        """Planificar los shards y lanzar los procesos"""
+        for assignment in plan_shards(self.config, self.workers, self.strategy):
+            self._spawn(assignment)
+            for exchange_name, symbol in assignment.pairs:
+                self._owners[(exchange_name, symbol)] = assignment.shard_id
+                self._exchange_owners.setdefault(exchange_name, assignment.shard_id)
+
+        logger.info(f"Shard supervisor started {len(self.shards)} workers (strategy: {self.strategy})")
+
+    def _spawn(self, assignment: ShardAssignment, restarts: int = 0):
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_shard_main,
+            args=(assignment, self.config, self.secrets, child_conn, self.snapshot_interval),
+            name=f"marketmaker-shard-{assignment.shard_id}",
+            daemon=True
+        )
+        process.start()
+        child_conn.close()
+
+        shard_id = assignment.shard_id
+        channel = IPCChannel(
+            parent_conn, name=f"supervisor-{shard_id}",
+            event_handler=lambda topic, payload: self._on_event(shard_id, topic, payload)
+        )
+        channel.start()
+        self.shards[shard_id] = ShardHandle(assignment=assignment, process=process, channel=channel, restarts=restarts)
+        logger.info(f"Shard {shard_id} started (pid {process.pid}): {assignment.exchanges}")
+
+    def _on_event(self, shard_id: int, topic: str, payload: Any):
+        shard = self.shards.get(shard_id)
+        if shard is None:
+            return
+        if topic == "snapshot":
+            shard.snapshot = payload
+            for callback in self._snapshot_listeners:
+                try:
+                    callback(payload)
+                except Exception as e:
+                    logger.error(f"Error in snapshot listener: {e}")
+        elif topic == "breaker_event":
+            for callback in self._transition_listeners:
+                try:
+                    callback(payload)
+                except Exception as e:
+                    logger.error(f"Error in breaker transition listener: {e}")
+        elif topic == "breakers":
+            shard.open_breakers = payload or []
+            self.broadcast_risk_state()
+        elif topic == "book":
+            pair = (payload["exchange"], payload["symbol"])
+            if payload["action"] == "pause":
+                shard.paused.add(pair)
+            else:
+                shard.paused.discard(pair)
+        elif topic == "ready":
+            logger.info(f"Shard {shard_id} ready (pid {payload.get('pid')})")
+            self.broadcast_risk_state()
+
+    def add_snapshot_listener(self, callback: Callable):
+        """Registrar un callback que recibe cada snapshot de cualquier shard"""
+        self._snapshot_listeners.append(callback)
+
+    def add_transition_listener(self, callback: Callable):
+        """Registrar un callback que recibe cada transición de breaker de los shards (ver ``transition_event``)"""
+        self._transition_listeners.append(callback)
+
+    def risk_state(self) -> dict:
+        """Estado de riesgo compartido entre todos los shards"""
+        return {
+            "risk_mode": self.config.get("market_maker_v4_2", {}).get("risk_mode"),
+            "open_breakers": {
+                shard_id: shard.open_breakers
+                for shard_id, shard in self.shards.items() if shard.open_breakers
+            },
+            "timestamp": time.time()
+        }
+
+    def broadcast_risk_state(self):
+        """Difundir el estado de riesgo a todos los workers vivos"""
+        state = self.risk_state()
+        for shard in self.shards.values():
+            try:
+                shard.channel.publish("risk_state", state)
+            except IPCError:
+                pass
+
+    async def start_monitoring(self, interval: float = 5):
+        """Relanzar workers caídos"""
+        while True:
+            await asyncio.sleep(interval)
+            for shard_id, shard in list(self.shards.items()):
+                if shard.process.is_alive():
+                    continue
+                logger.error(f"Shard {shard_id} died (exit code {shard.process.exitcode}), restarting")
+                shard.channel.close()
+                self._spawn(shard.assignment, restarts=shard.restarts + 1)
+
+    def owner(self, exchange_name: str, symbol: str = None) -> Optional[ShardHandle]:
+        """Shard dueño de un (exchange, símbolo) o, sin símbolo, de un exchange"""
+        shard_id = self._owners.get((exchange_name, symbol)) if symbol else None
+        if shard_id is None:
+            shard_id = self._exchange_owners.get(exchange_name)
+        return self.shards.get(shard_id) if shard_id is not None else None
+
+    def is_paused(self, exchange_name: str, symbol: str) -> bool:
+        """True si el shard dueño tiene el par en pausa por su libro"""
+        shard = self.owner(exchange_name, symbol)
+        return shard is not None and (exchange_name, symbol) in shard.paused
+
+    async def call(self, exchange_name: str, method: str, *args, route_symbol: str = None, **kwargs) -> Any:
+        """
+        Ejecutar un método de ExchangeWrapper en el shard dueño
+
+        Args:
+            exchange_name: Exchange destino
+            method: Nombre del método (fetch_ticker, create_order, ...)
+            route_symbol: Símbolo para enrutar (por defecto el kwarg ``symbol``
+                o el primer argumento si es str)
+        """
+        if route_symbol is None:
+            route_symbol = kwargs.get("symbol")
+        if route_symbol is None and args and isinstance(args[0], str):
+            route_symbol = args[0]
+        shard = self.owner(exchange_name, route_symbol)
+        if shard is None:
+            raise ValueError(f"No shard owns {exchange_name} {route_symbol or ''}".strip())
+        return await shard.channel.request(
+            "call", exchange_name, method, *args, timeout=self.call_timeout, **kwargs
+        )
+
+    def attach(self, manager):
+        """
+        Enrutar las llamadas del MultiExchangeManager local a los shards
+
+        Sustituye cada ExchangeWrapper de un exchange con shard por un
+        ``ShardExchange``: órdenes, fills, reconcile de equity y métricas
+        de este proceso usan las instancias ccxt (y el rate limit) de los
+        workers en lugar de abrir un segundo camino al venue.
+        """
+        for exchange_name, exchange in list(manager.exchanges.items()):
+            if exchange_name in self._exchange_owners:
+                manager.exchanges[exchange_name] = ShardExchange(self, exchange)
+
+    def get_snapshot(self) -> dict:
+        """Vista agregada de todos los shards para la API"""
+        exchanges: Dict[str, dict] = {}
+        volatility: Dict[str, dict] = {}
+        funding: List[dict] = []
+        breakers: Dict[str, dict] = {}
+        books: Dict[str, dict] = {}
+        paused: List[dict] = []
+
+        for shard_id, shard in self.shards.items():
+            snapshot = shard.snapshot
+            exchanges.update(snapshot.get("exchanges", {}))
+            for exchange_name, symbols in snapshot.get("books", {}).items():
+                books.setdefault(exchange_name, {}).update(symbols)
+            paused.extend({"exchange": exchange_name, "symbol": symbol} for exchange_name, symbol in shard.paused)
+            volatility.update(snapshot.get("volatility", {}))
+            funding.extend(snapshot.get("funding", []))
+            if snapshot.get("circuit_breakers"):
+                breakers[str(shard_id)] = snapshot["circuit_breakers"]
+
+        return {
+            "exchanges": exchanges,
+            "volatility": volatility,
+            "funding": funding,
+            "circuit_breakers": breakers,
+            "books": books,
+            "paused": paused,
+            "risk_state": self.risk_state()
+        }
+
+    def get_status(self) -> dict:
+        """Estado de los procesos worker"""
+        return {
+            "workers": len(self.shards),
+            "strategy": self.strategy,
+            "shards": {
+                shard_id: {
+                    "pid": shard.process.pid,
+                    "alive": shard.process.is_alive(),
+                    "restarts": shard.restarts,
+                    "assignment": shard.assignment.exchanges,
+                    "last_snapshot": shard.snapshot.get("timestamp"),
+                    "open_breakers": shard.open_breakers,
+                    "ipc_sent": shard.channel.messages_sent,
+                    "ipc_received": shard.channel.messages_received
+                }
+                for shard_id, shard in self.shards.items()
+            }
+        }
+
+    async def stop(self, timeout: float = 10):
+        """Pedir shutdown ordenado a todos los workers"""
+        for shard in self.shards.values():
+            try:
+                await shard.channel.request("shutdown", timeout=timeout)
+            except Exception:
+                pass
+        loop = asyncio.get_running_loop()
+        for shard in self.shards.values():
+            await loop.run_in_executor(None, shard.process.join, timeout)
+            if shard.process.is_alive():
+                shard.process.terminate()
+            shard.channel.close()
+        logger.info("Shard supervisor stopped")
@@ -0,0 +1,304 @@
+"""
+Motor de sizing dinámico de órdenes (vectorizado para todo el universo)
+"""
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+import numpy as np
+from core.logger import get_logger
+
+logger = get_logger("sizing", "sizing.log")
+
+
+@dataclass(frozen=True)
+class SizingResult:
+    """Tabla de tamaños (símbolo x exchange x nivel) calculada en una pasada"""
+    symbols: List[str]
+    exchanges: List[str]
+    levels: int
+    usd: np.ndarray       # notional USD por orden, shape (S, E, L)
+    amount: np.ndarray    # cantidad a enviar al exchange (contratos o base), shape (S, E, L)
+    version: int
+
+    def get(self, symbol: str, exchange: str, level: int = 0) -> Optional[dict]:
+        """Tamaño de una orden concreta (None si el símbolo/exchange no tiene sizing)"""
+        try:
+            s = self.symbols.index(symbol)
+            e = self.exchanges.index(exchange)
+        except ValueError:
+            return None
+        if not 0 <= level < self.levels:
+            return None
+        usd = float(self.usd[s, e, level])
+        if usd <= 0:
+            return None
+        return {"usd": usd, "amount": float(self.amount[s, e, level])}
+
+    def to_dict(self) -> dict:
+        """Representación serializable para la API"""
+        table = {}
+        for s, symbol in enumerate(self.symbols):
+            table[symbol] = {
+                exchange: {
+                    "usd": self.usd[s, e].round(2).tolist(),
+                    "amount": self.amount[s, e].tolist()
+                }
+                for e, exchange in enumerate(self.exchanges)
+                if self.usd[s, e].any()
+            }
+        return {"levels": self.levels, "version": self.version, "sizes": table}
+
+
+class SizingEngine:
+    """
+    Calcula el tamaño de cada orden del ladder a partir de:
+
+    - volatilidad por símbolo (más volatilidad => órdenes más pequeñas)
+    - pesos de ``exchange_allocation`` (reparto del notional entre venues;
+      a partes iguales si no está configurado)
+    - margen disponible por exchange (escala el ladder para que quepa)
+    - multiplicador de contrato por (exchange, símbolo)
+
+    Los inputs viven en arrays columnares; cada setter solo invalida la caché
+    si el valor cambia, y ``compute()`` devuelve el último resultado mientras
+    ningún input haya cambiado.
+    """
+
+    def __init__(self, config: dict, symbols: List[str] = None, exchanges: List[str] = None):
+        self.config = config
+        cfg = config.get("market_maker_v4_2", {})
+        sizing = cfg.get("sizing", {})
+
+        self.usd_min = float(sizing.get("usd_per_order_min", 50))
+        self.usd_max = float(sizing.get("usd_per_order_max", 500))
+        self.vol_sensitivity = float(sizing.get("vol_sensitivity", 0.5))
+        self.vol_floor_bps = float(sizing.get("vol_floor_bps", 4))
+        self.level_growth = float(sizing.get("level_growth", 1.0))
+        self.price_tolerance_bps = float(sizing.get("price_tolerance_bps", 5))
+        self.allocation: Dict[str, float] = dict(sizing.get("exchange_allocation", {}))
+
+        self.symbols: List[str] = []
+        self.exchanges: List[str] = []
+        self._symbol_index: Dict[str, int] = {}
+        self._exchange_index: Dict[str, int] = {}
+
+        # Inputs (S,), (E,) y (S, E)
+        self._vol_bps = np.zeros(0)
+        self._price = np.zeros(0)
+        self._weight = np.zeros(0)
+        self._margin = np.zeros(0)
+        self._leverage = np.zeros(0)
+        self._multiplier = np.zeros((0, 0))
+        self._integer_lots = np.zeros((0, 0), dtype=bool)
+        self._listed = np.zeros((0, 0), dtype=bool)
+
+        self._version = 0
+        self._cached: Optional[SizingResult] = None
+
+        for symbol in symbols or []:
+            self._symbol(symbol)
+        for exchange in exchanges or list(self.allocation.keys()):
+            self._exchange(exchange)
+
+        logger.info(
+            f"Sizing engine initialized ({len(self.symbols)} symbols x {len(self.exchanges)} exchanges, "
+            f"usd {self.usd_min}-{self.usd_max})"
+        )
+
+    # ------------------------------------------------------------------
+    # Registro de dimensiones
+    # ------------------------------------------------------------------
+
+    def _symbol(self, symbol: str) -> int:
+        s = self._symbol_index.get(symbol)
+        if s is None:
+            s = len(self.symbols)
+            self.symbols.append(symbol)
+            self._symbol_index[symbol] = s
+            self._vol_bps = np.append(self._vol_bps, np.nan)
+            self._price = np.append(self._price, np.nan)
+            E = len(self.exchanges)
+            self._multiplier = np.vstack([self._multiplier, np.ones((1, E))])
+            self._integer_lots = np.vstack([self._integer_lots, np.zeros((1, E), dtype=bool)])
+            self._listed = np.vstack([self._listed, np.ones((1, E), dtype=bool)])
+            self._invalidate()
+        return s
+
+    def _exchange(self, exchange: str) -> int:
+        e = self._exchange_index.get(exchange)
+        if e is None:
+            e = len(self.exchanges)
+            self.exchanges.append(exchange)
+            self._exchange_index[exchange] = e
+            # Sin exchange_allocation todos los venues pesan igual; con ella, los no listados no reciben notional
+            self._weight = np.append(self._weight, self.allocation.get(exchange, 0.0 if self.allocation else 1.0))
+            self._margin = np.append(self._margin, np.nan)
+            self._leverage = np.append(self._leverage, 1.0)
+            S = len(self.symbols)
+            self._multiplier = np.hstack([self._multiplier, np.ones((S, 1))])
+            self._integer_lots = np.hstack([self._integer_lots, np.zeros((S, 1), dtype=bool)])
+            self._listed = np.hstack([self._listed, np.ones((S, 1), dtype=bool)])
+            self._invalidate()
+        return e
+
+    def _invalidate(self):
+        self._version += 1
+
+    def _set(self, array: np.ndarray, index, value: float):
+        """Asignar un input invalidando la caché solo si cambia"""
+        current = array[index]
+        if current == value or (np.isnan(current) and np.isnan(value)):
+            return
+        array[index] = value
+        self._invalidate()
+
+    # ------------------------------------------------------------------
+    # Inputs
+    # ------------------------------------------------------------------
+
+    def set_volatility(self, symbol: str, vol_bps: Optional[float]):
+        """Volatilidad del símbolo en bps (None = sin estimación, se usa el floor)"""
+        self._set(self._vol_bps, self._symbol(symbol), np.nan if vol_bps is None else float(vol_bps))
+
+    def set_price(self, symbol: str, price: float):
+        """Precio de referencia; solo invalida si se mueve más que la tolerancia"""
+        if not price or price <= 0:
+            return
+        s = self._symbol(symbol)
+        current = self._price[s]
+        if not np.isnan(current) and abs(price / current - 1) * 10_000 < self.price_tolerance_bps:
+            return
+        self._set(self._price, s, float(price))
+
+    def set_margin(self, exchange: str, available_usd: float, leverage: float = None):
+        """Margen libre (USD) y apalancamiento disponibles en un exchange"""
+        e = self._exchange(exchange)
+        self._set(self._margin, e, float(available_usd or 0.0))
+        if leverage:
+            self._set(self._leverage, e, float(leverage))
+
+    def set_allocation(self, exchange: str, weight: float):
+        """Peso de ``exchange_allocation`` para un exchange"""
+        self.allocation[exchange] = weight
+        self._set(self._weight, self._exchange(exchange), float(weight))
+
+    def set_market(self, exchange: str, symbol: str, contract_size: float = None,
+                   contract: bool = False, listed: bool = True):
+        """Multiplicador de contrato y disponibilidad del símbolo en un exchange"""
+        s, e = self._symbol(symbol), self._exchange(exchange)
+        self._set(self._multiplier, (s, e), float(contract_size or 1.0))
+        if self._integer_lots[s, e] != contract or self._listed[s, e] != listed:
+            self._integer_lots[s, e] = contract
+            self._listed[s, e] = listed
+            self._invalidate()
+
+    def load_markets(self, exchange: str, markets: Dict[str, dict], symbols: List[str] = None):
+        """Cargar multiplicadores desde los markets de ccxt (``exchange.markets``)"""
+        for symbol in symbols or self.symbols:
+            market = markets.get(symbol) or markets.get(f"{symbol}:{symbol.split('/')[-1]}")
+            if market is None:
+                self.set_market(exchange, symbol, listed=False)
+                continue
+            self.set_market(
+                exchange, symbol,
+                contract_size=market.get("contractSize"),
+                contract=bool(market.get("contract")),
+                listed=bool(market.get("active", True))
+            )
+
+    def inputs(self) -> dict:
+        """Inputs de mercado conocidos (precio, volatilidad, margen), serializables"""
+        return {
+            "prices": {
+                symbol: float(price) for symbol, price in zip(self.symbols, self._price) if not np.isnan(price)
+            },
+            "volatility": {
+                symbol: float(vol) for symbol, vol in zip(self.symbols, self._vol_bps) if not np.isnan(vol)
+            },
+            "margin": {
+                exchange: [float(margin), float(leverage)]
+                for exchange, margin, leverage in zip(self.exchanges, self._margin, self._leverage)
+                if not np.isnan(margin)
+            }
+        }
+
+    def apply_inputs(self, inputs: dict):
+        """Aplicar inputs calculados en otro proceso (snapshots de los shards)"""
+        for symbol, price in inputs.get("prices", {}).items():
+            self.set_price(symbol, price)
+        for symbol, vol_bps in inputs.get("volatility", {}).items():
+            self.set_volatility(symbol, vol_bps)
+        for exchange, (available_usd, leverage) in inputs.get("margin", {}).items():
+            self.set_margin(exchange, available_usd, leverage)
+
+    # ------------------------------------------------------------------
+    # Cálculo
+    # ------------------------------------------------------------------
+
+    def _ladder_levels(self) -> int:
+        cfg = self.config.get("market_maker_v4_2", {})
+        mode = cfg.get("risk_mode", "conservative")
+        return max(1, int(cfg.get(f"ladder_levels_{mode}", 1)))
+
+    def compute(self) -> SizingResult:
+        """
+        Calcular (o devolver de caché) los tamaños de todo el universo
+
+        Returns:
+            SizingResult con arrays (símbolo, exchange, nivel)
+        """
+        levels = self._ladder_levels()
+        cached = self._cached
+        if cached is not None and cached.version == self._version and cached.levels == levels:
+            return cached
+
+        # Tamaño base por símbolo: inversamente proporcional a la volatilidad
+        vol = np.fmax(np.nan_to_num(self._vol_bps, nan=self.vol_floor_bps), self.vol_floor_bps)
+        base = self.usd_max * (self.vol_floor_bps / vol) ** self.vol_sensitivity
+        base = np.clip(base, self.usd_min, self.usd_max)                          # (S,)
+
+        # Reparto entre venues: los pesos se normalizan entre los exchanges que
+        # listan el símbolo, manteniendo la media por venue igual al tamaño base
+        weights = self._listed * self._weight[None, :]                           # (S, E)
+        total = weights.sum(axis=1, keepdims=True)
+        venues = (weights > 0).sum(axis=1, keepdims=True)
+        share = np.divide(weights * venues, total, out=np.zeros_like(weights), where=total > 0)
+
+        per_venue = np.minimum(base[:, None] * share, self.usd_max)              # (S, E)
+
+        growth = self.level_growth ** np.arange(levels)                          # (L,)
+        usd = per_venue[:, :, None] * growth[None, None, :]                      # (S, E, L)
+
+        # Escalar cada exchange para que el ladder (ambos lados) quepa en su margen
+        capacity = self._margin * self._leverage                                 # (E,)
+        demand = 2 * usd.sum(axis=(0, 2))
+        scale = np.divide(capacity, demand, out=np.ones_like(demand), where=demand > 0)
+        scale = np.where(np.isnan(capacity), 1.0, np.minimum(1.0, scale))
+        usd = usd * scale[None, :, None]
+
+        # Órdenes por debajo del mínimo no se envían
+        usd = np.where(usd >= self.usd_min, usd, 0.0)
+
+        # Conversión a contratos / unidades base
+        notional_per_unit = self._price[:, None] * self._multiplier             # (S, E)
+        amount = np.divide(
+            usd, notional_per_unit[:, :, None],
+            out=np.zeros_like(usd),
+            where=(notional_per_unit[:, :, None] > 0)
+        )
+        amount = np.where(self._integer_lots[:, :, None], np.floor(amount), amount)
+        usd = amount * np.nan_to_num(notional_per_unit)[:, :, None]
+
+        self._cached = SizingResult(
+            symbols=list(self.symbols),
+            exchanges=list(self.exchanges),
+            levels=levels,
+            usd=usd,
+            amount=amount,
+            version=self._version
+        )
+        return self._cached
+
+    def get_size(self, symbol: str, exchange: str, level: int = 0) -> Optional[dict]:
+        """Tamaño de una orden concreta del ladder"""
+        return self.compute().get(symbol, exchange, level)
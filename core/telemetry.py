@@ -0,0 +1,324 @@
+"""
+Métricas Prometheus: histogramas y contadores de los caminos calientes con hijos de labels pre-ligados
+"""
+
+import functools
+import time
+from typing import Dict, Tuple
+from core.logger import get_logger
+
+try:
+    from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, ProcessCollector, generate_latest
+    from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+except ImportError:
+    CollectorRegistry = None
+
+logger = get_logger("telemetry", "main.log")
+
+perf_counter = time.perf_counter
+
+# Métodos de ExchangeWrapper instrumentados (sus hijos se ligan al crear el wrapper)
+EXCHANGE_METHODS = (
+    "fetch_balance", "fetch_positions", "fetch_order_book", "fetch_ticker", "fetch_tickers",
+    "fetch_ohlcv", "fetch_open_orders", "fetch_my_trades", "create_order", "cancel_order",
+    "set_leverage", "set_margin_mode", "fetch_funding_rate", "fetch_funding_rates",
+    "fetch_funding_rate_history", "fetch_markets", "load_markets",
+)
+
+EXCHANGE_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+RATE_LIMIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+HTTP_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+FLUSH_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+ALERT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Clases de status HTTP (índice = status // 100 - 1)
+STATUS_CLASSES = ("1xx", "2xx", "3xx", "4xx", "5xx")
+
+
+class _Noop:
+    """Hijo nulo: mismo interfaz que un hijo de Histogram/Counter, sin coste"""
+    __slots__ = ()
+
+    def observe(self, value: float):
+        pass
+
+    def inc(self, amount: float = 1):
+        pass
+
+
+NOOP = _Noop()
+
+
+class CallMetrics:
+    """Hijos ya ligados de una operación: latencia y errores"""
+    __slots__ = ("latency", "errors")
+
+    def __init__(self, latency=NOOP, errors=NOOP):
+        self.latency = latency
+        self.errors = errors
+
+
+class ExchangeMetrics:
+    """Hijos ligados de un exchange: uno por método de ``EXCHANGE_METHODS`` y la espera de rate limit"""
+    __slots__ = ("calls", "rate_limit_wait")
+
+    def __init__(self, calls: Dict[str, CallMetrics], rate_limit_wait=NOOP):
+        self.calls = calls
+        self.rate_limit_wait = rate_limit_wait
+
+
+NOOP_CALL = CallMetrics()
+NOOP_EXCHANGE = ExchangeMetrics({method: NOOP_CALL for method in EXCHANGE_METHODS})
+
+
+def timed_call(method: str):
+    """
+    Decorador de métodos async de ExchangeWrapper: latencia y errores por (exchange, método)
+
+    El hijo se busca en ``self._metrics`` (ligado en ``__init__``): en la
+    llamada no hay ``labels()`` ni dicts de labels, solo dos lecturas del
+    reloj y un ``observe``.
+    """
+    def decorate(fn):
+        @functools.wraps(fn)
+        async def wrapper(self, *args, **kwargs):
+            call = self._metrics.calls[method]
+            start = perf_counter()
+            try:
+                return await fn(self, *args, **kwargs)
+            except Exception:
+                call.errors.inc()
+                raise
+            finally:
+                call.latency.observe(perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+class _TimedThrottle:
+    """
+    Envoltorio del Throttler de ccxt que mide cuánto espera cada petición por el rate limit
+
+    ccxt asigna ``throttle.loop`` en ``open()``; se reenvía al throttler real.
+    """
+    __slots__ = ("throttler", "wait")
+
+    def __init__(self, throttler, wait):
+        self.throttler = throttler
+        self.wait = wait
+
+    @property
+    def loop(self):
+        return self.throttler.loop
+
+    @loop.setter
+    def loop(self, value):
+        self.throttler.loop = value
+
+    async def __call__(self, cost=None):
+        start = perf_counter()
+        await self.throttler(cost)
+        self.wait.observe(perf_counter() - start)
+
+
+class _BreakerCollector:
+    """
+    Estado de los circuit breakers leído de la BreakerTable en cada scrape
+
+    Sin coste en el camino caliente: no hay gauges que actualizar en cada
+    transición, el scrape recorre los arrays de la tabla.
+    """
+
+    def __init__(self, manager, per_exchange: bool):
+        self.manager = manager
+        self.per_exchange = per_exchange
+
+    def describe(self):
+        return []
+
+    def collect(self):
+        table = self.manager.table
+        n = len(table)
+        is_open = table.is_open[:n].tolist()
+        triggers = table.trigger_count[:n].tolist()
+
+        if self.per_exchange:
+            labels = ["exchange", "symbol", "type"]
+            rows = [(list(key), is_open[row], triggers[row]) for row, key in enumerate(table.keys[:n])]
+        else:
+            by_type: Dict[str, list] = {}
+            for row, (_, _, breaker_type) in enumerate(table.keys[:n]):
+                entry = by_type.setdefault(breaker_type, [0, 0])
+                entry[0] += is_open[row]
+                entry[1] += triggers[row]
+            labels = ["type"]
+            rows = [([breaker_type], opened, count) for breaker_type, (opened, count) in by_type.items()]
+
+        state = GaugeMetricFamily("marketmaker_circuit_breaker_open",
+                                  "Circuit breakers abiertos (1 = abierto)", labels=labels)
+        trips = CounterMetricFamily("marketmaker_circuit_breaker_trips",
+                                    "Aperturas de circuit breakers", labels=labels)
+        for label_values, opened, count in rows:
+            state.add_metric(label_values, float(opened))
+            trips.add_metric(label_values, float(count))
+        yield state
+        yield trips
+
+
+class Telemetry:
+    """
+    Registro Prometheus del proceso
+
+    ``configure`` crea las familias si ``monitoring.prometheus_enabled`` y
+    ``prometheus_client`` está instalado; si no, todo lo que se liga son hijos
+    nulos y la instrumentación no hace nada. Los componentes ligan sus hijos
+    una vez al crearse (``exchange``, ``writer``, ``alert_channel``) y en el
+    camino caliente solo llaman a ``observe``/``inc``.
+
+    Con ``per_exchange_metrics: false`` el label ``exchange`` vale ``all``.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.per_exchange = True
+        self.registry = None
+        self._http: Dict[object, Tuple[object, tuple]] = {}
+
+    def configure(self, config: dict):
+        """Crear el registro y las familias según la sección ``monitoring``"""
+        cfg = config.get("market_maker_v4_2", {})
+        monitoring = cfg.get("monitoring", {})
+        self.per_exchange = monitoring.get("per_exchange_metrics", True)
+
+        if not monitoring.get("prometheus_enabled", True):
+            return
+        if CollectorRegistry is None:
+            logger.warning("monitoring.prometheus_enabled is set but prometheus_client is not installed")
+            return
+
+        registry = CollectorRegistry(auto_describe=False)
+        ProcessCollector(registry=registry)
+
+        self.exchange_latency = Histogram(
+            "marketmaker_exchange_call_seconds", "Latencia de las llamadas de ExchangeWrapper",
+            ["exchange", "method"], buckets=EXCHANGE_BUCKETS, registry=registry)
+        self.exchange_errors = Counter(
+            "marketmaker_exchange_call_errors", "Llamadas de ExchangeWrapper que lanzaron excepción",
+            ["exchange", "method"], registry=registry)
+        self.rate_limit_wait = Histogram(
+            "marketmaker_exchange_rate_limit_wait_seconds", "Espera en el rate limiter de ccxt por petición",
+            ["exchange"], buckets=RATE_LIMIT_BUCKETS, registry=registry)
+        self.http_latency = Histogram(
+            "marketmaker_http_request_seconds", "Latencia de los handlers HTTP",
+            ["handler"], buckets=HTTP_BUCKETS, registry=registry)
+        self.http_responses = Counter(
+            "marketmaker_http_responses", "Respuestas HTTP por handler y clase de status",
+            ["handler", "status"], registry=registry)
+        self.flush_latency = Histogram(
+            "marketmaker_db_flush_seconds", "Latencia de flush de los writers por lotes",
+            ["writer"], buckets=FLUSH_BUCKETS, registry=registry)
+        self.flush_errors = Counter(
+            "marketmaker_db_flush_errors", "Lotes que no se pudieron escribir",
+            ["writer"], registry=registry)
+        self.alert_latency = Histogram(
+            "marketmaker_alert_send_seconds", "Latencia de envío de alertas",
+            ["channel"], buckets=ALERT_BUCKETS, registry=registry)
+        self.alert_failures = Counter(
+            "marketmaker_alert_failures", "Alertas que no se pudieron enviar",
+            ["channel"], registry=registry)
+
+        self.registry = registry
+        self.enabled = True
+        logger.info(f"Prometheus exporter enabled (per-exchange labels: {self.per_exchange})")
+
+    def _exchange_label(self, exchange_name: str) -> str:
+        return exchange_name if self.per_exchange else "all"
+
+    def exchange(self, exchange_name: str) -> ExchangeMetrics:
+        """Hijos ligados para un ExchangeWrapper"""
+        if not self.enabled:
+            return NOOP_EXCHANGE
+        label = self._exchange_label(exchange_name)
+        calls = {
+            method: CallMetrics(self.exchange_latency.labels(label, method),
+                                self.exchange_errors.labels(label, method))
+            for method in EXCHANGE_METHODS
+        }
+        return ExchangeMetrics(calls, self.rate_limit_wait.labels(label))
+
+    def instrument_throttle(self, client, metrics: ExchangeMetrics):
+        """Medir las esperas del rate limiter de un cliente ccxt"""
+        if self.enabled and getattr(client, "throttle", None) is not None:
+            client.throttle = _TimedThrottle(client.throttle, metrics.rate_limit_wait)
+
+    def writer(self, name: str) -> CallMetrics:
+        """Hijos ligados para un BatchWriter"""
+        if not self.enabled:
+            return NOOP_CALL
+        return CallMetrics(self.flush_latency.labels(name), self.flush_errors.labels(name))
+
+    def alert_channel(self, channel: str) -> CallMetrics:
+        """Hijos ligados para un canal de alertas"""
+        if not self.enabled:
+            return NOOP_CALL
+        return CallMetrics(self.alert_latency.labels(channel), self.alert_failures.labels(channel))
+
+    def watch_breakers(self, manager):
+        """Exportar el estado de la BreakerTable de ``manager`` en cada scrape"""
+        if self.enabled:
+            self.registry.register(_BreakerCollector(manager, self.per_exchange))
+
+    def http_handler(self, endpoint) -> Tuple[object, tuple]:
+        """(latencia, contadores por clase de status) del handler; se ligan en su primera petición"""
+        bound = self._http.get(endpoint)
+        if bound is None:
+            handler = getattr(endpoint, "__name__", None) or "unmatched"
+            bound = (
+                self.http_latency.labels(handler),
+                tuple(self.http_responses.labels(handler, status) for status in STATUS_CLASSES)
+            )
+            self._http[endpoint] = bound
+        return bound
+
+    def render(self) -> Tuple[bytes, str]:
+        """Exposición en formato texto de Prometheus"""
+        return generate_latest(self.registry), CONTENT_TYPE_LATEST
+
+
+class HTTPMetricsMiddleware:
+    """
+    Middleware ASGI de latencia por handler
+
+    ASGI puro (no ``BaseHTTPMiddleware``): no envuelve la respuesta en un
+    stream. El handler sale de ``scope["endpoint"]``, que el router deja tras
+    resolver la ruta, así que la cardinalidad es la de los endpoints y no la
+    de las URLs.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not telemetry.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            latency, responses = telemetry.http_handler(scope.get("endpoint"))
+            latency.observe(perf_counter() - start)
+            responses[min(max(status // 100, 1), 5) - 1].inc()
+
+
+# Registro del proceso (configurado en create_app)
+telemetry = Telemetry()
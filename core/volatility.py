@@ -0,0 +1,316 @@
+"""
+Estimador de volatilidad realizada en streaming (ring buffers por símbolo)
+"""
+
+import math
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from core.logger import get_logger
+
+logger = get_logger("volatility", "volatility.log")
+
+# Constante del estimador de Parkinson: 1 / (4 ln 2)
+PARKINSON_FACTOR = 1.0 / (4.0 * math.log(2.0))
+
+METHODS = ("close_to_close", "parkinson", "ewma")
+
+_TIMEFRAME_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def timeframe_to_seconds(timeframe: str) -> int:
+    """Convertir un timeframe estilo ccxt ("1m", "5m", "1h") a segundos"""
+    unit = timeframe[-1]
+    if unit not in _TIMEFRAME_UNITS:
+        raise ValueError(f"Unsupported timeframe: {timeframe}")
+    return int(timeframe[:-1]) * _TIMEFRAME_UNITS[unit]
+
+
+class VolatilityEstimator:
+    """
+    Volatilidad realizada por símbolo sobre una ventana fija de barras.
+
+    Cada símbolo ocupa una fila de arrays NumPy de tamaño fijo (ring buffers).
+    Al cerrar una barra se suma el término nuevo y se resta el que sale de la
+    ventana, así que cada actualización es O(1) y nunca se recalcula la serie
+    completa. Todas las variantes se expresan como fracción sobre el horizonte
+    de la ventana (``window`` barras del ``timeframe`` configurado).
+    """
+
+    def __init__(self, config: dict):
+        cfg = config.get("market_maker_v4_2", {})
+        vol_cfg = cfg.get("volatility", {})
+
+        self.window = int(cfg.get("metrics_window_size", 50))
+        self.timeframe = cfg.get("timeframe", "1m")
+        self.bar_seconds = timeframe_to_seconds(self.timeframe)
+        self.ewma_lambda = float(vol_cfg.get("ewma_lambda", 0.94))
+        self.min_periods = int(vol_cfg.get("min_periods", 2))
+        self.default_method = vol_cfg.get("method", "close_to_close")
+
+        self._symbols: List[str] = []
+        self._index: Dict[str, int] = {}
+        self._pos = np.zeros(0, dtype=np.int64)
+        self._allocate(int(vol_cfg.get("initial_capacity", 64)))
+
+        logger.info(
+            f"Volatility estimator initialized (window: {self.window} x {self.timeframe}, "
+            f"ewma_lambda: {self.ewma_lambda})"
+        )
+
+    def _allocate(self, rows: int):
+        """Reservar (o ampliar) los arrays columnares conservando las filas existentes"""
+        w = self.window
+        used = len(self._symbols)
+
+        def grow(name: str, shape, fill, dtype=np.float64) -> np.ndarray:
+            new = np.full(shape, fill, dtype=dtype)
+            if used:
+                new[:used] = getattr(self, name)[:used]
+            return new
+
+        # Ring buffers: r^2 close-to-close y (ln H/L)^2 de Parkinson
+        self._ret2 = grow("_ret2", (rows, w), 0.0)
+        self._hl2 = grow("_hl2", (rows, w), 0.0)
+        self._pos = grow("_pos", rows, 0, np.int64)
+        self._count = grow("_count", rows, 0, np.int64)
+        self._sum_ret2 = grow("_sum_ret2", rows, 0.0)
+        self._sum_hl2 = grow("_sum_hl2", rows, 0.0)
+        self._ewma_var = grow("_ewma_var", rows, np.nan)
+        self._last_close = grow("_last_close", rows, np.nan)
+        self._last_bar_ts = grow("_last_bar_ts", rows, -1, np.int64)
+
+        # Barra en construcción a partir de trades
+        self._bar_ts = grow("_bar_ts", rows, -1, np.int64)
+        self._bar_open = grow("_bar_open", rows, np.nan)
+        self._bar_high = grow("_bar_high", rows, np.nan)
+        self._bar_low = grow("_bar_low", rows, np.nan)
+        self._bar_close = grow("_bar_close", rows, np.nan)
+
+    def _row(self, symbol: str) -> int:
+        """Obtener la fila de un símbolo, registrándolo si es nuevo"""
+        row = self._index.get(symbol)
+        if row is None:
+            row = len(self._symbols)
+            if row >= len(self._pos):
+                self._allocate(max(1, len(self._pos)) * 2)
+            self._index[symbol] = row
+            self._symbols.append(symbol)
+        return row
+
+    @property
+    def symbols(self) -> List[str]:
+        """Símbolos registrados, en el orden de las filas de los arrays"""
+        return list(self._symbols)
+
+    def last_timestamp(self, symbol: str) -> Optional[int]:
+        """Timestamp (ms) de la última barra cerrada procesada para un símbolo"""
+        row = self._index.get(symbol)
+        if row is None or self._last_bar_ts[row] < 0:
+            return None
+        return int(self._last_bar_ts[row])
+
+    def reset(self, symbol: str):
+        """
+        Vaciar la fila de un símbolo (cambio de venue o hueco mayor que la ventana)
+
+        La siguiente barra vuelve a fijar solo el cierre de referencia, así
+        que nunca se mezcla un retorno entre series distintas.
+        """
+        row = self._index.get(symbol)
+        if row is None:
+            return
+        self._ret2[row] = 0.0
+        self._hl2[row] = 0.0
+        self._pos[row] = 0
+        self._count[row] = 0
+        self._sum_ret2[row] = 0.0
+        self._sum_hl2[row] = 0.0
+        self._ewma_var[row] = np.nan
+        self._last_close[row] = np.nan
+        self._last_bar_ts[row] = -1
+        self._bar_ts[row] = -1
+        self._bar_open[row] = np.nan
+        self._bar_high[row] = np.nan
+        self._bar_low[row] = np.nan
+        self._bar_close[row] = np.nan
+
+    def update_candle(self, symbol: str, timestamp: int, open: float, high: float,
+                      low: float, close: float) -> bool:
+        """
+        Incorporar una barra cerrada
+
+        Args:
+            symbol: Símbolo
+            timestamp: Apertura de la barra en ms (formato ccxt)
+            open, high, low, close: Precios OHLC de la barra
+
+        Returns:
+            True si la barra se incorporó (False si estaba repetida o era inválida)
+        """
+        row = self._row(symbol)
+
+        if timestamp <= self._last_bar_ts[row] or not close or close <= 0:
+            return False
+
+        prev_close = self._last_close[row]
+        self._last_close[row] = close
+        self._last_bar_ts[row] = timestamp
+
+        # La primera barra solo fija el cierre de referencia
+        if np.isnan(prev_close):
+            return True
+
+        r = math.log(close / prev_close)
+        r2 = r * r
+        hl2 = math.log(high / low) ** 2 if high and low and high >= low > 0 else 0.0
+
+        pos = self._pos[row]
+        self._sum_ret2[row] += r2 - self._ret2[row, pos]
+        self._sum_hl2[row] += hl2 - self._hl2[row, pos]
+        self._ret2[row, pos] = r2
+        self._hl2[row, pos] = hl2
+
+        pos += 1
+        if pos == self.window:
+            pos = 0
+            # Resincronizar las sumas una vez por vuelta para acotar el error
+            # de redondeo acumulado (coste amortizado O(1) por barra)
+            self._sum_ret2[row] = self._ret2[row].sum()
+            self._sum_hl2[row] = self._hl2[row].sum()
+        self._pos[row] = pos
+
+        if self._count[row] < self.window:
+            self._count[row] += 1
+
+        if np.isnan(self._ewma_var[row]):
+            self._ewma_var[row] = r2
+        else:
+            lam = self.ewma_lambda
+            self._ewma_var[row] = lam * self._ewma_var[row] + (1.0 - lam) * r2
+
+        return True
+
+    def update_trade(self, symbol: str, price: float, timestamp: int) -> bool:
+        """
+        Incorporar un trade, agregándolo en barras del timeframe configurado
+
+        Args:
+            symbol: Símbolo
+            price: Precio del trade
+            timestamp: Timestamp del trade en ms
+
+        Returns:
+            True si el trade cerró una barra y ésta se incorporó
+        """
+        if not price or price <= 0:
+            return False
+
+        row = self._row(symbol)
+        bar_ms = self.bar_seconds * 1000
+        bucket = (timestamp // bar_ms) * bar_ms
+        current = self._bar_ts[row]
+
+        if bucket < current:
+            return False  # trade tardío de una barra ya cerrada
+
+        if bucket == current:
+            if price > self._bar_high[row]:
+                self._bar_high[row] = price
+            if price < self._bar_low[row]:
+                self._bar_low[row] = price
+            self._bar_close[row] = price
+            return False
+
+        closed = False
+        if current >= 0:
+            closed = self.update_candle(
+                symbol, int(current), self._bar_open[row], self._bar_high[row],
+                self._bar_low[row], self._bar_close[row]
+            )
+
+        self._bar_ts[row] = bucket
+        self._bar_open[row] = price
+        self._bar_high[row] = price
+        self._bar_low[row] = price
+        self._bar_close[row] = price
+        return closed
+
+    def update_ohlcv(self, symbol: str, candles: List[List[float]]) -> int:
+        """
+        Incorporar una lista de velas cerradas en formato ccxt
+        ([timestamp, open, high, low, close, volume])
+
+        Returns:
+            Número de velas nuevas incorporadas
+        """
+        added = 0
+        for candle in candles:
+            if self.update_candle(symbol, int(candle[0]), candle[1], candle[2], candle[3], candle[4]):
+                added += 1
+        return added
+
+    def _values(self, method: str, rows=None) -> np.ndarray:
+        """Volatilidad de un conjunto de filas (por defecto todas las ocupadas)"""
+        if rows is None:
+            rows = slice(0, len(self._symbols))
+        count = np.atleast_1d(self._count[rows])
+        scale = np.divide(self.window, count, out=np.zeros(count.shape), where=count > 0)
+
+        if method == "close_to_close":
+            values = np.sqrt(np.atleast_1d(self._sum_ret2[rows]) * scale)
+        elif method == "parkinson":
+            values = np.sqrt(PARKINSON_FACTOR * np.atleast_1d(self._sum_hl2[rows]) * scale)
+        elif method == "ewma":
+            values = np.sqrt(np.atleast_1d(self._ewma_var[rows]) * self.window)
+        else:
+            raise ValueError(f"Unknown volatility method: {method}. Supported: {METHODS}")
+
+        values[count < self.min_periods] = np.nan
+        return values
+
+    def snapshot(self, method: str = None) -> Tuple[List[str], np.ndarray]:
+        """
+        Volatilidad de todos los símbolos en una sola consulta
+
+        Args:
+            method: close_to_close, parkinson o ewma (por defecto el configurado)
+
+        Returns:
+            (símbolos, array de volatilidades); NaN si aún no hay datos suficientes
+        """
+        return self.symbols, self._values(method or self.default_method)
+
+    def snapshot_all(self) -> Dict[str, np.ndarray]:
+        """Arrays de volatilidad para todos los métodos, alineados con ``symbols``"""
+        return {method: self._values(method) for method in METHODS}
+
+    def get(self, symbol: str, method: str = None) -> Optional[float]:
+        """Volatilidad de un símbolo (None si no hay datos suficientes)"""
+        row = self._index.get(symbol)
+        if row is None or self._count[row] < self.min_periods:
+            return None
+        value = float(self._values(method or self.default_method, row)[0])
+        return None if math.isnan(value) else value
+
+    def get_bps(self, symbol: str, method: str = None) -> Optional[float]:
+        """Volatilidad de un símbolo en puntos básicos"""
+        value = self.get(symbol, method)
+        return None if value is None else value * 10_000
+
+    def get_status(self) -> dict:
+        """Estado del estimador para endpoints de diagnóstico"""
+        values = self.snapshot_all()
+        return {
+            "window": self.window,
+            "timeframe": self.timeframe,
+            "symbols": {
+                symbol: {
+                    "bars": int(self._count[row]),
+                    **{
+                        method: (None if np.isnan(values[method][row]) else float(values[method][row]))
+                        for method in METHODS
+                    }
+                }
+                for row, symbol in enumerate(self._symbols)
+            }
+        }
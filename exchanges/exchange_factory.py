@@ -1,6 +1,5 @@
 from enum import Enum
 from typing import Any, Dict, List, Optional
-import ccxt.async_support as ccxt
 import asyncio
 from core.exceptions import (
     ExchangeConnectionError, 
@@ -9,9 +8,24 @@ from core.exceptions import (
     MarketMakerException
 )
 from core.logger import get_logger
+from core.telemetry import telemetry, timed_call
 
 logger = get_logger("exchange_factory", "exchanges.log")
 
+
+def _ccxt():
+    """
+    ccxt.async_support bajo demanda
+
+    Su ``__init__`` importa las clases de todos los exchanges (cientos de
+    módulos), así que se carga al crear el primer cliente y no al importar
+    este módulo; cada clase se resuelve luego por nombre según el exchange
+    configurado.
+    """
+    import ccxt.async_support as ccxt_async
+    return ccxt_async
+
+
 class OrderType(Enum):
     LIMIT = "limit"
     MARKET = "market"
@@ -37,15 +51,27 @@ class ExchangeWrapper:
         self.config = config
         self.exchange_name = exchange_name
         self.exchange = self._create_exchange(exchange_name, config)
+        # Procesos que comparten API keys se reparten el rate limit del venue
+        share = float(config.get('rate_limit_share', 1.0))
+        if 0 < share < 1:
+            self._scale_rate_limit(share)
+        # Hijos Prometheus ligados una vez (latencia/errores por método, esperas de rate limit)
+        self._metrics = telemetry.exchange(exchange_name)
+        telemetry.instrument_throttle(self.exchange, self._metrics)
+        # Cliente websocket (ccxt.pro) creado bajo demanda para los streams
+        self.stream_exchange = None
+        self._streaming: Optional[bool] = None
 
     def _create_exchange(self, exchange_name: str, config: Dict[str, Any]):
         """Create exchange instance based on name and config"""
+        ccxt = _ccxt()
         base_config = {
             'apiKey': config['api_key'],
             'secret': config['api_secret'],
             'timeout': config.get('api_timeout', 30) * 1000,
             'enableRateLimit': True,
         }
+        self._client_config = base_config
         
         # Add passphrase for exchanges that require it
         if config.get('passphrase'):
@@ -115,8 +141,16 @@ class ExchangeWrapper:
         # Set rate limit based on config
         self.exchange.rateLimit = max(1, 1000 / config.get('rate_limit', 250))
 
+    def _scale_rate_limit(self, share: float):
+        """Reducir el ritmo del throttler de ccxt a ``share`` de su valor"""
+        self.exchange.rateLimit = self.exchange.rateLimit / share
+        refill_rate = self.exchange.tokenBucket['refillRate'] * share
+        self.exchange.tokenBucket['refillRate'] = refill_rate
+        self.exchange.throttle.config['refillRate'] = refill_rate
+
     async def connect(self) -> bool:
         """Conectar con retry logic"""
+        ccxt = _ccxt()
         max_retries = 3
         retry_delay = 5
         
@@ -171,23 +205,57 @@ class ExchangeWrapper:
         
         return False
 
+    @timed_call("fetch_balance")
     async def fetch_balance(self):
         return await self.exchange.fetch_balance()
 
+    @timed_call("fetch_positions")
     async def fetch_positions(self, symbols: List[str] = None):
         if hasattr(self.exchange, 'fetch_positions'):
             return await self.exchange.fetch_positions(symbols)
         return []
 
+    @timed_call("fetch_order_book")
     async def fetch_order_book(self, symbol: str, limit: int = None):
         return await self.exchange.fetch_order_book(symbol, limit)
 
+    def supports_streaming(self) -> bool:
+        """True si ccxt.pro ofrece watchOrderBook para este exchange"""
+        if self._streaming is None:
+            try:
+                import ccxt.pro as ccxtpro
+                stream_class = getattr(ccxtpro, self.exchange.id, None)
+                # describe() sin __init__: instanciar el cliente abriría una sesión aiohttp que nadie cierra
+                self._streaming = bool(
+                    stream_class and object.__new__(stream_class).describe()['has'].get('watchOrderBook')
+                )
+            except ImportError:
+                self._streaming = False
+        return self._streaming
+
+    async def watch_order_book(self, symbol: str, limit: int = None):
+        """Siguiente actualización del libro vía websocket (ccxt.pro)"""
+        if self.stream_exchange is None:
+            import ccxt.pro as ccxtpro
+            self.stream_exchange = getattr(ccxtpro, self.exchange.id)(dict(self._client_config))
+        return await self.stream_exchange.watch_order_book(symbol, limit)
+
+    async def close(self):
+        """Cerrar los clientes REST y websocket"""
+        if self.stream_exchange is not None:
+            await self.stream_exchange.close()
+            self.stream_exchange = None
+        await self.exchange.close()
+
+    @timed_call("fetch_ticker")
     async def fetch_ticker(self, symbol: str):
         return await self.exchange.fetch_ticker(symbol)
 
+    @timed_call("fetch_ohlcv")
     async def fetch_ohlcv(self, symbol: str, timeframe: str, since: int = None, limit: int = None):
         return await self.exchange.fetch_ohlcv(symbol, timeframe, since, limit)
 
+    @timed_call("fetch_open_orders")
     async def fetch_open_orders(self, symbol: str = None):
         orders = await self.exchange.fetch_open_orders(symbol)
         mapped = []
@@ -218,13 +286,16 @@ class ExchangeWrapper:
             ))
         return mapped
 
+    @timed_call("fetch_my_trades")
     async def fetch_my_trades(self, symbol: Optional[str] = None, since: Optional[int] = None, limit: Optional[int] = 50):
         if hasattr(self.exchange, 'fetch_my_trades'):
             return await self.exchange.fetch_my_trades(symbol, since=since, limit=limit)
         return []
 
+    @timed_call("create_order")
     async def create_order(self, symbol: str, type: OrderType, side: OrderSide, amount: float, price: float = None):
         """Crear orden con validación y manejo de errores robusto"""
+        ccxt = _ccxt()
         try:
             # Validar parámetros
             if amount <= 0:
@@ -309,34 +380,89 @@ class ExchangeWrapper:
             logger.error(f"Unexpected error creating order: {e}", extra={'exchange': self.exchange_name})
             raise MarketMakerException(f"Order creation failed: {e}")
 
+    @timed_call("cancel_order")
     async def cancel_order(self, order_id: str, symbol: str):
         return await self.exchange.cancel_order(order_id, symbol)
 
+    @timed_call("set_leverage")
     async def set_leverage(self, symbol: str, leverage: float):
         if hasattr(self.exchange, 'set_leverage'):
             await self.exchange.set_leverage(leverage, symbol)
             return True
         return False
 
+    @timed_call("set_margin_mode")
     async def set_margin_mode(self, symbol: str, margin_mode: str):
         if hasattr(self.exchange, 'set_margin_mode'):
             await self.exchange.set_margin_mode(margin_mode, symbol)
             return True
         return False
 
+    @timed_call("fetch_funding_rate")
     async def fetch_funding_rate(self, symbol: str):
         if hasattr(self.exchange, 'fetch_funding_rate'):
             return await self.exchange.fetch_funding_rate(symbol)
         return None
 
+    def _derivative_symbol(self, symbol: str) -> str:
+        """Mapear BTC/USDT al símbolo del perpetuo (BTC/USDT:USDT) si el spot no existe"""
+        markets = self.exchange.markets or {}
+        if symbol in markets or ':' in symbol or '/' not in symbol:
+            return symbol
+        settle = f"{symbol}:{symbol.split('/')[1]}"
+        return settle if settle in markets else symbol
+
+    @timed_call("fetch_funding_rates")
+    async def fetch_funding_rates(self, symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Funding rates de varios símbolos en un solo lote
+
+        Usa fetchFundingRates cuando el exchange lo soporta; si no, lanza las
+        consultas individuales en paralelo. El resultado se indexa por el
+        símbolo solicitado.
+        """
+        mapping = {self._derivative_symbol(symbol): symbol for symbol in symbols}
+
+        if self.exchange.has.get('fetchFundingRates'):
+            rates = await self.exchange.fetch_funding_rates(list(mapping.keys()))
+            return {mapping[k]: v for k, v in rates.items() if k in mapping}
+
+        if not self.exchange.has.get('fetchFundingRate'):
+            return {}
+
+        results = await asyncio.gather(
+            *(self.exchange.fetch_funding_rate(market_symbol) for market_symbol in mapping),
+            return_exceptions=True
+        )
+        rates = {}
+        for (market_symbol, symbol), result in zip(mapping.items(), results):
+            if isinstance(result, Exception):
+                logger.warning(f"Could not fetch funding rate for {market_symbol} on {self.exchange_name}: {result}")
+                continue
+            rates[symbol] = result
+        return rates
+
+    @timed_call("fetch_funding_rate_history")
+    async def fetch_funding_rate_history(self, symbol: str, since: int = None, limit: int = None):
+        if self.exchange.has.get('fetchFundingRateHistory'):
+            return await self.exchange.fetch_funding_rate_history(self._derivative_symbol(symbol), since, limit)
+        return []
+
+    @timed_call("fetch_tickers")
     async def fetch_tickers(self):
         if hasattr(self.exchange, 'fetch_tickers'):
             return await self.exchange.fetch_tickers()
         return {}
 
+    @timed_call("fetch_markets")
     async def fetch_markets(self):
         return await self.exchange.fetch_markets()
 
+    @timed_call("load_markets")
+    async def load_markets(self, reload: bool = False) -> Dict[str, dict]:
+        """Mercados cacheados por ccxt; ``reload`` fuerza la descarga"""
+        return await self.exchange.load_markets(reload)
+
     def get_exchange_info(self):
         """Get exchange capabilities and info"""
         return {
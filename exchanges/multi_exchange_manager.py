@@ -1,11 +1,16 @@
 import asyncio
 import time
-from typing import Dict, List, Optional, Any
-from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional, Any, Tuple
+from dataclasses import dataclass, field
 from exchanges.exchange_factory import ExchangeFactory, ExchangeWrapper
 from core.logger import get_logger
 from core.circuit_breaker import CircuitBreakerManager
 from core.alerts import AlertManager
+from core.volatility import VolatilityEstimator
+from core.sizing import SizingEngine
+from core.funding import FundingMonitor, FundingEvent
+from core.book_monitor import BookMonitor
+from core.equity import EquityTracker
 
 logger = get_logger("multi_exchange_manager", "multi_exchange.log")
 
@@ -21,6 +26,16 @@ class ExchangeHealth:
     api_calls_limit: int
     features: Dict[str, bool]
 
+@dataclass
+class FanOutResult:
+    """Resultado de fan_out: valor por exchange (fresco o último conocido) y estado por exchange"""
+    values: Dict[str, Any] = field(default_factory=dict)
+    # exchange -> {"state": ok|stale|timeout|error, "latency_ms", "age_seconds", "error"}
+    status: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    
+    def states(self) -> Dict[str, str]:
+        return {name: status["state"] for name, status in self.status.items()}
+
 class MultiExchangeManager:
     def __init__(self, config: Dict[str, Any], secrets: Dict[str, Any]):
         self.config = config
@@ -28,21 +43,49 @@ class MultiExchangeManager:
         
         self.exchanges: Dict[str, ExchangeWrapper] = {}
         self.health: Dict[str, ExchangeHealth] = {}
+        # Último fetch_balance por exchange (health check / reconcile), para no repetir llamadas privadas
+        self.balances: Dict[str, Dict[str, Any]] = {}
+        self.balance_times: Dict[str, float] = {}
         self.strategy = config.get("exchange_strategy", {})
         self.symbol_distribution = config.get("symbol_distribution", {})
         
         self.health_check_interval = self.strategy.get("health_check_interval", 30)
         self.min_healthy_exchanges = self.strategy.get("min_healthy_exchanges", 1)
         
+        # Fan-out: plazo por exchange (segundos) y último valor conocido por (clave, exchange)
+        self.fanout_timeout = float(self.strategy.get("fanout_timeout", 2.0))
+        self.fanout_deadlines: Dict[str, float] = self.strategy.get("fanout_deadlines", {})
+        self._fanout_cache: Dict[Tuple[str, str], Tuple[Any, float]] = {}
+        self._fanout_inflight: Dict[Tuple[str, str], asyncio.Task] = {}
+        
         # Inicializar Circuit Breakers y Alertas
         self.circuit_breaker_manager = CircuitBreakerManager(config)
         
+        # Volatilidad realizada por símbolo (alimenta market data, breaker y sizing)
+        self.volatility_estimator = VolatilityEstimator(config)
+        # Exchange del que vienen las velas de cada símbolo (un failover reinicia la serie)
+        self._volatility_venues: Dict[str, str] = {}
+        
+        # Sizing dinámico por (símbolo, exchange, nivel)
+        self.sizing_engine = SizingEngine(config, config.get("market_maker_v4_2", {}).get("symbols", []))
+        
+        # Funding rates cacheados (fetch por lotes en background)
+        self.funding_monitor = FundingMonitor(config)
+        
+        # Spread y profundidad por tick desde los libros en vivo
+        self.book_monitor = BookMonitor(config, self.circuit_breaker_manager)
+        
+        # Equity mark-to-market y drawdown (alimenta el breaker de drawdown)
+        self.equity_tracker = EquityTracker(config, self.circuit_breaker_manager)
+        
         # Merge secrets into config for alerts
         alert_config = dict(config)
         if "alerts" not in alert_config:
             alert_config["alerts"] = {}
         alert_config["alerts"]["telegram"] = secrets.get("alerts", {}).get("telegram", {})
         self.alert_manager = AlertManager(alert_config)
+        self.funding_monitor.add_listener(self._on_funding_event)
+        self.book_monitor.add_listener(self._on_book_pause)
         
         logger.info("MultiExchangeManager initialized with circuit breakers and alerts")
         
@@ -75,6 +118,7 @@ class MultiExchangeManager:
                 # Test connection
                 if await exchange.connect():
                     self.exchanges[exchange_name] = exchange
+                    self.sizing_engine.load_markets(exchange_name, exchange.exchange.markets or {})
                     self.health[exchange_name] = ExchangeHealth(
                         name=exchange_name,
                         connected=True,
@@ -121,9 +165,17 @@ class MultiExchangeManager:
             start_time = time.time()
             
             # Simple health check - fetch balance
-            await exchange.fetch_balance()
+            balance = await exchange.fetch_balance()
             
             end_time = time.time()
+            self._cache_balance(exchange_name, balance)
+            
+            # El margen libre alimenta el sizing
+            self.sizing_engine.set_margin(
+                exchange_name,
+                balance.get('free', {}).get('USDT', 0),
+                exchange.config.get('leverage')
+            )
             latency_ms = (end_time - start_time) * 1000
             
             # CHECK CIRCUIT BREAKER - LATENCY
@@ -174,6 +226,283 @@ class MultiExchangeManager:
             error_rate = health.error_count / max(1, health.error_count + 10)
             self.circuit_breaker_manager.check("error_rate", error_rate, exchange_name)
     
+    async def start_volatility_monitoring(self):
+        """Alimentar el estimador de volatilidad con cada vela cerrada"""
+        while True:
+            try:
+                await self._update_volatility_all()
+            except Exception as e:
+                logger.error(f"Volatility monitoring error: {e}")
+            await asyncio.sleep(self.volatility_estimator.bar_seconds)
+    
+    async def _update_volatility_all(self):
+        """Actualizar la volatilidad de todos los símbolos configurados"""
+        symbols = self.config.get("market_maker_v4_2", {}).get("symbols") or self.get_all_symbols()
+        tasks = [self._update_volatility_single(symbol) for symbol in symbols]
+        
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+    
+    async def _update_volatility_single(self, symbol: str):
+        """Traer las velas nuevas de un símbolo y verificar el breaker de volatilidad"""
+        exchange = self.get_exchange_for_symbol(symbol)
+        if not exchange:
+            return
+        
+        estimator = self.volatility_estimator
+        venue = exchange.exchange_name
+        
+        # Failover: las velas de otro exchange son otra serie, no se mezclan
+        previous_venue = self._volatility_venues.get(symbol)
+        if previous_venue is not None and previous_venue != venue:
+            logger.info(f"Volatility source for {symbol} moved {previous_venue} -> {venue}, resetting window")
+            estimator.reset(symbol)
+        self._volatility_venues[symbol] = venue
+        
+        # Primera pasada: llenar la ventana completa; después las velas cerradas
+        # desde la última procesada (más la abierta y una de margen), de modo que
+        # un hueco se rellena en lugar de plegarse en un único retorno
+        last_timestamp = estimator.last_timestamp(symbol)
+        limit = estimator.window + 2
+        if last_timestamp is not None:
+            missing = int(time.time() * 1000 - last_timestamp) // (estimator.bar_seconds * 1000)
+            if missing > estimator.window:
+                # Hueco mayor que la ventana: empezar de nuevo con la ventana completa
+                estimator.reset(symbol)
+            else:
+                limit = max(missing, 1) + 2
+        
+        try:
+            candles = await exchange.fetch_ohlcv(symbol, estimator.timeframe, limit=limit)
+        except Exception as e:
+            logger.warning(f"Could not fetch OHLCV for {symbol} on {exchange.exchange_name}: {e}")
+            return
+        
+        if candles:
+            self.sizing_engine.set_price(symbol, candles[-1][4])
+        
+        # La última vela sigue abierta
+        if not estimator.update_ohlcv(symbol, candles[:-1]):
+            return
+        
+        self.sizing_engine.set_volatility(symbol, estimator.get_bps(symbol))
+        
+        volatility = estimator.get(symbol)
+        if volatility is None:
+            return
+        
+        # CHECK CIRCUIT BREAKER - VOLATILITY
+        self.circuit_breaker_manager.check("volatility", volatility, exchange.exchange_name, symbol)
+    
+    async def start_funding_monitoring(self):
+        """Refrescar los funding rates de todos los exchanges en cada intervalo"""
+        while True:
+            try:
+                await self._update_funding_all()
+            except Exception as e:
+                logger.error(f"Funding monitoring error: {e}")
+            await asyncio.sleep(self.funding_monitor.check_interval)
+    
+    async def _update_funding_all(self):
+        """Un fetch por lotes por exchange, todos en paralelo"""
+        default_symbols = self.config.get("market_maker_v4_2", {}).get("symbols", [])
+        tasks = []
+        for exchange_name, exchange in self.exchanges.items():
+            symbols = self.get_symbols_for_exchange(exchange_name) or default_symbols
+            if symbols:
+                tasks.append(self._update_funding_single(exchange_name, exchange, symbols))
+        
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+    
+    async def _update_funding_single(self, exchange_name: str, exchange: ExchangeWrapper, symbols: List[str]):
+        """Refrescar los funding rates de un exchange"""
+        try:
+            await self.funding_monitor.refresh(exchange_name, exchange, symbols)
+        except Exception as e:
+            logger.warning(f"Funding refresh failed for {exchange_name}: {e}")
+    
+    async def _on_funding_event(self, event: FundingEvent):
+        """Alertar cuando el funding cruza el umbral configurado"""
+        if event.state != "normal":
+            await self.alert_manager.alert_funding_threshold(
+                event.symbol, event.exchange, event.rate_bps, event.threshold_bps
+            )
+    
+    async def start_book_monitoring(self):
+        """Un stream de libro por (exchange, símbolo) alimentando el BookMonitor"""
+        default_symbols = self.config.get("market_maker_v4_2", {}).get("symbols", [])
+        tasks = []
+        for exchange_name, exchange in self.exchanges.items():
+            for symbol in self.get_symbols_for_exchange(exchange_name) or default_symbols:
+                if self._symbol_supported(exchange_name, symbol):
+                    tasks.append(self._watch_book(exchange_name, exchange, symbol))
+        
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+    
+    async def _watch_book(self, exchange_name: str, exchange: ExchangeWrapper, symbol: str):
+        """Websocket (ccxt.pro) si está disponible; si no, polling cada refresh_ms"""
+        monitor = self.book_monitor
+        markets = exchange.exchange.markets or {}
+        market = markets.get(symbol) or markets.get(f"{symbol}:{symbol.split('/')[-1]}") or {}
+        contract_size = float(market.get("contractSize") or 1.0)
+        stream = monitor.stream and exchange.supports_streaming()
+        
+        logger.info(f"Watching {symbol} book on {exchange_name} ({'stream' if stream else 'polling'})")
+        
+        while True:
+            try:
+                if stream:
+                    book = await exchange.watch_order_book(symbol, monitor.book_limit)
+                else:
+                    book = await exchange.fetch_order_book(symbol, monitor.book_limit)
+                
+                bids, asks = book['bids'], book['asks']
+                monitor.on_book(exchange_name, symbol, bids, asks, contract_size, book.get('timestamp'))
+                if bids and asks:
+                    self.equity_tracker.on_price(exchange_name, symbol, (bids[0][0] + asks[0][0]) / 2)
+                
+                if not stream:
+                    await asyncio.sleep(monitor.refresh_seconds)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Book feed error for {symbol} on {exchange_name}: {e}")
+                await asyncio.sleep(5)
+    
+    async def start_equity_monitoring(self):
+        """Re-anclar la equity con balances y posiciones reales en cada intervalo"""
+        while True:
+            try:
+                await self._reconcile_equity_all()
+            except Exception as e:
+                logger.error(f"Equity monitoring error: {e}")
+            await asyncio.sleep(self.equity_tracker.reconcile_interval)
+    
+    async def _reconcile_equity_all(self):
+        """Reconciliar todos los exchanges en paralelo"""
+        tasks = [self._reconcile_equity_single(name, exchange) for name, exchange in self.exchanges.items()]
+        
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+    
+    async def _reconcile_equity_single(self, exchange_name: str, exchange: ExchangeWrapper):
+        """Balance total y posiciones abiertas de un exchange"""
+        tracker = self.equity_tracker
+        try:
+            balance, positions = await asyncio.gather(exchange.fetch_balance(), exchange.fetch_positions())
+        except Exception as e:
+            logger.warning(f"Equity reconcile failed for {exchange_name}: {e}")
+            return
+        
+        self._cache_balance(exchange_name, balance)
+        total = balance.get('total', {}).get(tracker.quote_currency, 0) or 0
+        tracker.set_account(exchange_name, total, positions or [])
+    
+    def _cache_balance(self, exchange_name: str, balance: Dict[str, Any]):
+        self.balances[exchange_name] = balance
+        self.balance_times[exchange_name] = time.time()
+    
+    async def _on_book_pause(self, action: str, exchange_name: str, symbol: str):
+        """Al pausar un par, retirar sus órdenes si order_hygiene lo pide"""
+        if action != "pause":
+            return
+        
+        hygiene = self.config.get("market_maker_v4_2", {}).get("order_hygiene", {})
+        exchange = self.exchanges.get(exchange_name)
+        if not exchange or not hygiene.get("cancel_on_symbol_pause", False):
+            return
+        
+        try:
+            orders = await exchange.fetch_open_orders(symbol)
+            results = await asyncio.gather(
+                *(exchange.cancel_order(order.id, symbol) for order in orders),
+                return_exceptions=True
+            )
+            failed = sum(1 for result in results if isinstance(result, Exception))
+            logger.warning(
+                f"Cancelled {len(orders) - failed}/{len(orders)} orders for {symbol} on {exchange_name} (paused)"
+            )
+        except Exception as e:
+            logger.error(f"Could not cancel orders for paused {symbol} on {exchange_name}: {e}")
+    
+    async def fan_out(self, key: str, call: Callable[[str, ExchangeWrapper], Awaitable[Any]],
+                      timeout: float = None, exchanges: List[str] = None) -> FanOutResult:
+        """
+        Ejecutar ``call(nombre, exchange)`` en todos los exchanges a la vez
+        
+        Cada exchange tiene su propio plazo (``fanout_deadlines`` o ``timeout``);
+        la respuesta tarda como mucho el mayor de ellos, no la suma. Un exchange
+        que no llega a tiempo o falla devuelve su último valor conocido para
+        ``key`` (estado ``stale``) si lo hay. Las llamadas tardías siguen en
+        segundo plano y actualizan la caché al terminar; mientras tanto, un
+        nuevo fan-out con la misma clave se engancha a la misma llamada en
+        lugar de lanzar otra.
+        
+        Args:
+            key: Tipo de lectura (p.ej. "positions"), separa las cachés
+            call: Corrutina por exchange
+            timeout: Plazo por defecto en segundos
+            exchanges: Subconjunto de exchanges (por defecto todos)
+        
+        Returns:
+            FanOutResult con valores y estado por exchange
+        """
+        names = exchanges if exchanges is not None else list(self.exchanges)
+        default_timeout = self.fanout_timeout if timeout is None else timeout
+        
+        outcomes = await asyncio.gather(*(
+            self._fan_out_single(key, name, call, float(self.fanout_deadlines.get(name, default_timeout)))
+            for name in names if name in self.exchanges
+        ))
+        
+        result = FanOutResult()
+        now = time.time()
+        for name, state, latency_ms, error in outcomes:
+            status = {"state": state, "latency_ms": round(latency_ms, 3)}
+            if error:
+                status["error"] = error
+            
+            cached = self._fanout_cache.get((key, name))
+            if state == "ok":
+                result.values[name] = cached[0]
+            elif cached is not None:
+                result.values[name] = cached[0]
+                status["state"] = "stale"
+                status["age_seconds"] = round(now - cached[1], 3)
+            result.status[name] = status
+        
+        return result
+    
+    async def _fan_out_single(self, key: str, name: str, call: Callable, deadline: float):
+        task = self._fanout_inflight.get((key, name))
+        if task is None or task.done():
+            task = asyncio.ensure_future(self._fan_out_call(key, name, call))
+            # Si nadie la espera ya (timeout), recoger el error para que no quede sin leer
+            task.add_done_callback(lambda done: done.cancelled() or done.exception())
+            self._fanout_inflight[(key, name)] = task
+        
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(task), deadline)
+            return name, "ok", (time.perf_counter() - start) * 1000, None
+        except asyncio.TimeoutError:
+            return name, "timeout", (time.perf_counter() - start) * 1000, f"no response within {deadline}s"
+        except Exception as e:
+            return name, "error", (time.perf_counter() - start) * 1000, str(e)
+    
+    async def _fan_out_call(self, key: str, name: str, call: Callable):
+        try:
+            value = await call(name, self.exchanges[name])
+            self._fanout_cache[(key, name)] = (value, time.time())
+            return value
+        except Exception as e:
+            logger.warning(f"Fan-out {key} failed on {name}: {e}")
+            raise
+        finally:
+            self._fanout_inflight.pop((key, name), None)
+    
     def get_healthy_exchanges(self) -> List[str]:
         """Get list of healthy exchanges"""
         healthy = []
@@ -283,8 +612,7 @@ class MultiExchangeManager:
         """Shutdown all exchanges"""
         for exchange_name, exchange in self.exchanges.items():
             try:
-                if hasattr(exchange.exchange, 'close'):
-                    await exchange.exchange.close()
+                await exchange.close()
                 logger.info(f"Closed connection to {exchange_name}")
             except Exception as e:
                 logger.error(f"Error closing {exchange_name}: {e}")
@@ -2,8 +2,9 @@
 MarketMaker Pro v4.2 - Backend API con todas las mejoras implementadas
 """
 
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 import asyncio
 import os
@@ -11,21 +12,48 @@ import json
 from pathlib import Path
 from typing import Dict, Any, Optional, List
 from datetime import datetime
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 # Core modules
 from core.logger import get_logger
-from core.database import get_db, Trade, Position, SystemMetric, CircuitBreakerEvent, init_db
-from core.exceptions import ExchangeConnectionError, InsufficientBalanceError, InvalidOrderError
+from core.database import get_async_db, async_engine, configure_sqlite, AsyncSessionLocal, SessionLocal, Trade, Position, CircuitBreakerEvent, init_db
+from core.repository import add_row, keyset_page, stream_rows
+from core.export import EXPORT_FORMATS, encode_rows
+from core.breaker_events import BreakerEventWriter
+from core.persistence import RowWriter
+from core.rollups import RollupManager, RESOLUTIONS
+from core.equity_curve import EquityCurveWriter
+from core.fill_sync import FillSync
+from core.balance_snapshots import BalanceSnapshotter
+from core.metrics_aggregator import MetricsAggregator, format_order, format_position
+from core.push_hub import PushHub
+from core.responses import FastJSONResponse, ResponseEncoder
+from core.market_catalog import MarketCatalog
+from core.api_hub import CORS_OPTIONS, HubServer
+from core.telemetry import HTTPMetricsMiddleware, telemetry
+from core.exceptions import ExchangeConnectionError, InsufficientBalanceError, InvalidOrderError, CircuitBreakerOpenError
 from core.config_schema import validate_config
 from exchanges.exchange_factory import ExchangeFactory
 from exchanges.multi_exchange_manager import MultiExchangeManager
+from core.sharding import ShardSupervisor
 
 # Initialize logger
 logger = get_logger("main", "main.log")
 
 # Global instances
 multi_exchange_manager: Optional[MultiExchangeManager] = None
+shard_supervisor: Optional[ShardSupervisor] = None
+breaker_event_writer: Optional[BreakerEventWriter] = None
+equity_curve_writer: Optional[EquityCurveWriter] = None
+row_writer: Optional[RowWriter] = None
+rollup_manager: Optional[RollupManager] = None
+fill_sync: Optional[FillSync] = None
+balance_snapshotter: Optional[BalanceSnapshotter] = None
+metrics_aggregator: Optional[MetricsAggregator] = None
+push_hub: Optional[PushHub] = None
+response_encoder: Optional[ResponseEncoder] = None
+market_catalog: Optional[MarketCatalog] = None
+api_hub: Optional[HubServer] = None
 app_config: Dict = {}
 app_secrets: Dict = {}
 
@@ -39,8 +67,9 @@ class OrderCreateRequest(BaseModel):
     symbol: str
     side: str  # buy/sell
     type: str  # limit/market
-    amount: float
+    amount: Optional[float] = None  # None = usar el sizing dinámico
     price: Optional[float] = None
+    level: int = 0  # nivel del ladder cuando se usa el sizing dinámico
 
 
 class RiskModeUpdate(BaseModel):
@@ -120,14 +149,34 @@ from contextlib import asynccontextmanager
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifespan context manager for startup and shutdown events"""
-    global multi_exchange_manager
+    global multi_exchange_manager, shard_supervisor, breaker_event_writer, equity_curve_writer, row_writer
+    global rollup_manager, fill_sync, balance_snapshotter, metrics_aggregator, push_hub, market_catalog, api_hub
     
     # Startup
     logger.info("Starting MarketMaker Pro v4.2...")
     
     # Initialize database
-    init_db()
-    logger.info("Database initialized")
+    persistence_config = app_config.get("market_maker_v4_2", {}).get("persistence", {})
+    configure_sqlite(persistence_config.get("sqlite", {}))
+    schema_changed = init_db()
+    logger.info(f"Database initialized ({'schema updated' if schema_changed else 'schema up to date'})")
+    
+    # Write-behind queue for trade and metric inserts (disabled = commit inside the request)
+    write_behind = persistence_config.get("write_behind", {})
+    if write_behind.get("enabled", True):
+        row_writer = RowWriter(
+            "write_behind",
+            SessionLocal,
+            use_copy=write_behind.get("copy", True),
+            queue_size=write_behind.get("queue_size", 50000),
+            batch_size=write_behind.get("batch_size", 500),
+            flush_interval=write_behind.get("flush_interval", 0.5)
+        )
+        row_writer.start()
+    
+    # Time-series rollups and retention for metrics/health/balance tables
+    rollup_manager = RollupManager(app_config, SessionLocal)
+    asyncio.create_task(rollup_manager.start())
     
     # Create multi-exchange manager
     logger.info("Creating multi-exchange manager...")
@@ -143,9 +192,89 @@ async def lifespan(app: FastAPI):
         logger.error(f"Exception type: {type(e).__name__}")
         raise
     
-    # Start health monitoring in background
-    asyncio.create_task(multi_exchange_manager.start_health_monitoring())
-    logger.info("Health monitoring started")
+    # Breaker state is read from the breaker table at scrape time
+    telemetry.watch_breakers(multi_exchange_manager.circuit_breaker_manager)
+    
+    # Persist circuit breaker transitions in background batches
+    breaker_event_writer = BreakerEventWriter(SessionLocal, app_config)
+    multi_exchange_manager.circuit_breaker_manager.add_listener(breaker_event_writer.on_transition)
+    breaker_event_writer.start()
+    
+    # Persist the downsampled equity curve
+    equity_curve_writer = EquityCurveWriter(SessionLocal, app_config)
+    multi_exchange_manager.equity_tracker.add_listener(equity_curve_writer.submit)
+    equity_curve_writer.start()
+    
+    sharding_config = app_config.get("market_maker_v4_2", {}).get("sharding", {})
+    if sharding_config.get("enabled", False):
+        # Sharded runtime: background loops and exchange calls run in worker
+        # processes, this process aggregates their snapshots
+        shard_supervisor = ShardSupervisor(app_config, app_secrets)
+        # Breaker transitions happen in the shards; persist them here
+        shard_supervisor.add_transition_listener(breaker_event_writer.submit)
+        await shard_supervisor.start()
+        asyncio.create_task(shard_supervisor.start_monitoring())
+        shard_supervisor.attach(multi_exchange_manager)
+        shard_supervisor.add_snapshot_listener(
+            lambda snapshot: multi_exchange_manager.equity_tracker.on_tops(snapshot.get("books", {}))
+        )
+        shard_supervisor.add_snapshot_listener(
+            lambda snapshot: multi_exchange_manager.sizing_engine.apply_inputs(snapshot.get("sizing", {}))
+        )
+        logger.info(f"Sharded runtime started with {len(shard_supervisor.shards)} workers")
+    else:
+        # Start health monitoring in background
+        asyncio.create_task(multi_exchange_manager.start_health_monitoring())
+        logger.info("Health monitoring started")
+        
+        # Start volatility feed in background
+        asyncio.create_task(multi_exchange_manager.start_volatility_monitoring())
+        logger.info("Volatility monitoring started")
+        
+        # Start funding monitor in background
+        asyncio.create_task(multi_exchange_manager.start_funding_monitoring())
+        logger.info("Funding monitoring started")
+        
+        # Start live book feed (spread/depth breakers) in background
+        asyncio.create_task(multi_exchange_manager.start_book_monitoring())
+        logger.info("Book monitoring started")
+    
+    # Equity reconcile runs here in both modes: drawdown is account-wide
+    asyncio.create_task(multi_exchange_manager.start_equity_monitoring())
+    logger.info("Equity monitoring started")
+    
+    # Incremental fill reconciliation into the trades table (both modes)
+    if app_config.get("market_maker_v4_2", {}).get("fill_sync", {}).get("enabled", True):
+        fill_sync = FillSync(app_config, multi_exchange_manager, SessionLocal)
+        asyncio.create_task(fill_sync.start())
+        logger.info("Fill sync started")
+    
+    # Diff-only balance history from the balances cached by health checks/reconcile
+    balance_snapshotter = BalanceSnapshotter(app_config, multi_exchange_manager, SessionLocal)
+    asyncio.create_task(balance_snapshotter.start())
+    logger.info("Balance snapshots started")
+    
+    # /api/v1/metrics is served from a snapshot refreshed (and persisted) on its own cadence
+    metrics_aggregator = MetricsAggregator(app_config, multi_exchange_manager, SessionLocal, row_writer)
+    asyncio.create_task(metrics_aggregator.start())
+    logger.info("Metrics aggregator started")
+    
+    # Indexed market catalog from the markets ccxt already loaded, reloaded in background
+    market_catalog = MarketCatalog(app_config, multi_exchange_manager)
+    market_catalog.load_all()
+    asyncio.create_task(market_catalog.start())
+    logger.info("Market catalog started")
+    
+    # WebSocket push: one sampler shared by every client, conflated per subscriber
+    push_hub = PushHub(app_config, multi_exchange_manager, metrics_aggregator, shard_supervisor)
+    asyncio.create_task(push_hub.start())
+    logger.info("Push hub started")
+    
+    # Multi-worker deployment: stateless HTTP workers read snapshots from (and forward commands to) this process
+    if app_config.get("market_maker_v4_2", {}).get("api", {}).get("workers", 1) > 1:
+        api_hub = HubServer(app_config, app)
+        await api_hub.start()
+        logger.info("API hub started")
     
     # Send startup alert
     await multi_exchange_manager.alert_manager.alert_system_startup("4.2")
@@ -157,33 +286,52 @@ async def lifespan(app: FastAPI):
     # Shutdown
     logger.info("Shutting down MarketMaker Pro...")
     
+    if api_hub:
+        await api_hub.stop()
+    
+    if shard_supervisor:
+        await shard_supervisor.stop()
+    
     if multi_exchange_manager:
         await multi_exchange_manager.alert_manager.alert_system_shutdown()
         await multi_exchange_manager.shutdown()
     
+    if breaker_event_writer:
+        await breaker_event_writer.stop()
+    
+    if equity_curve_writer:
+        await equity_curve_writer.stop()
+    
+    if row_writer:
+        await row_writer.stop()
+    
+    await async_engine.dispose()
+    
     logger.info("Shutdown complete")
 
 
 def create_app():
     """Create FastAPI application"""
-    global app_config, app_secrets
+    global app_config, app_secrets, response_encoder
     app_config, app_secrets = load_config()
     
+    # Prometheus registry first: exchange wrappers, writers and alerts bind their label children on creation
+    telemetry.configure(app_config)
+    
+    # Negotiated JSON/MessagePack, compression and pre-serialized reference data
+    response_encoder = ResponseEncoder(app_config)
+    
     app = FastAPI(
         title="MarketMaker Pro API",
         version="4.2",
         description="Advanced Market Making Bot with Multi-Exchange Support",
+        default_response_class=FastJSONResponse,
         lifespan=lifespan
     )
     
     # Add CORS middleware
-    app.add_middleware(
-        CORSMiddleware,
-        allow_origins=["http://localhost:5173", "https://localhost:5173", "http://localhost:3000"],
-        allow_credentials=True,
-        allow_methods=["*"],
-        allow_headers=["*"],
-    )
+    app.add_middleware(CORSMiddleware, **CORS_OPTIONS)
+    app.add_middleware(HTTPMetricsMiddleware)
     
     return app
 
@@ -216,24 +364,59 @@ async def health():
     }
 
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus exposition (monitoring.prometheus_enabled)"""
+    if not telemetry.enabled:
+        raise HTTPException(status_code=404, detail="Prometheus exporter disabled")
+    body, content_type = telemetry.render()
+    return Response(content=body, headers={"Content-Type": content_type})
+
+
 @app.get("/config")
-async def get_config():
-    """Get current configuration (without secrets)"""
+async def get_config(request: Request):
+    """Get current configuration (without secrets); rebuilt per request, 304 while unchanged"""
     if not multi_exchange_manager:
         raise HTTPException(status_code=503, detail="System not initialized")
     
-    return {
-        "exchanges": list(multi_exchange_manager.exchanges.keys()),
-        "healthy_exchanges": multi_exchange_manager.get_healthy_exchanges(),
-        "risk_mode": app_config.get("market_maker_v4_2", {}).get("risk_mode"),
-        "symbols": app_config.get("market_maker_v4_2", {}).get("symbols", [])
-    }
+    async def build():
+        return {
+            "exchanges": list(multi_exchange_manager.exchanges.keys()),
+            "healthy_exchanges": multi_exchange_manager.get_healthy_exchanges(),
+            "risk_mode": app_config.get("market_maker_v4_2", {}).get("risk_mode"),
+            "symbols": app_config.get("market_maker_v4_2", {}).get("symbols", [])
+        }
+    
+    # Cheap to build and changes with exchange health: ETag only, no reuse window
+    return await response_encoder.cached(request, "config", build, ttl=0)
 
 
 # ============================================================================
 # MARKET DATA ENDPOINTS
 # ============================================================================
 
+def _get_volatility(symbol: str) -> Optional[float]:
+    """Realized volatility from the local estimator or the shard snapshots"""
+    if shard_supervisor:
+        method = multi_exchange_manager.volatility_estimator.default_method
+        return shard_supervisor.get_snapshot()["volatility"].get(symbol, {}).get(method)
+    return multi_exchange_manager.volatility_estimator.get(symbol)
+
+
+async def _persist_row(db: AsyncSession, model, **fields):
+    """Queue the insert on the write-behind writer; commit it now when disabled or full"""
+    if row_writer and row_writer.submit_row(model, fields):
+        return
+    await add_row(db, model, **fields)
+
+
+def _is_quoting_paused(exchange_name: str, symbol: str) -> bool:
+    """Spread/depth breaker open for this symbol on this venue"""
+    if shard_supervisor:
+        return shard_supervisor.is_paused(exchange_name, symbol)
+    return multi_exchange_manager.book_monitor.is_paused(exchange_name, symbol)
+
+
 @app.get("/api/v1/market-data")
 async def get_market_data():
     """Get real-time market data from all exchanges"""
@@ -268,7 +451,7 @@ async def get_market_data():
                 "change24h": ticker.get('percentage', 0),
                 "volume": ticker.get('quoteVolume', 0),
                 "spread": spread,
-                "volatility": 0,  # TODO: Calculate from OHLCV
+                "volatility": _get_volatility(symbol) or 0,
                 "bid": bid,
                 "ask": ask,
                 "timestamp": datetime.now().isoformat()
@@ -281,6 +464,62 @@ async def get_market_data():
     return market_data
 
 
+@app.get("/api/v1/volatility")
+async def get_volatility():
+    """Get realized volatility for all tracked symbols"""
+    if not multi_exchange_manager:
+        raise HTTPException(status_code=503, detail="System not initialized")
+    
+    if shard_supervisor:
+        estimator = multi_exchange_manager.volatility_estimator
+        return {
+            "window": estimator.window,
+            "timeframe": estimator.timeframe,
+            "symbols": shard_supervisor.get_snapshot()["volatility"]
+        }
+    
+    return multi_exchange_manager.volatility_estimator.get_status()
+
+
+@app.get("/api/v1/funding")
+async def get_funding():
+    """Get cached funding rates for all monitored symbols"""
+    if not multi_exchange_manager:
+        raise HTTPException(status_code=503, detail="System not initialized")
+    
+    status = multi_exchange_manager.funding_monitor.get_status()
+    if shard_supervisor:
+        status["rates"] = shard_supervisor.get_snapshot()["funding"]
+    
+    return status
+
+
+@app.get("/api/v1/equity")
+async def get_equity(limit: int = 100):
+    """Get mark-to-market equity, drawdown and the recent equity curve"""
+    if not multi_exchange_manager:
+        raise HTTPException(status_code=503, detail="System not initialized")
+    
+    tracker = multi_exchange_manager.equity_tracker
+    status = tracker.get_status()
+    status["curve"] = tracker.get_curve(limit)
+    status["drawdown_breaker_open"] = multi_exchange_manager.circuit_breaker_manager.is_open("drawdown")
+    return status
+
+
+@app.get("/api/v1/books")
+async def get_books():
+    """Get live top of book, spread/depth and paused symbols per exchange"""
+    if not multi_exchange_manager:
+        raise HTTPException(status_code=503, detail="System not initialized")
+    
+    if shard_supervisor:
+        snapshot = shard_supervisor.get_snapshot()
+        return {"books": snapshot["books"], "paused": snapshot["paused"]}
+    
+    return multi_exchange_manager.book_monitor.get_status()
+
+
 @app.get("/api/v1/orderbook/{symbol}")
 async def get_orderbook(symbol: str, limit: int = 20):
     """Get order book for a symbol"""
@@ -310,44 +549,52 @@ async def get_orderbook(symbol: str, limit: int = 20):
 # POSITION ENDPOINTS
 # ============================================================================
 
+def _exchange_status_header(response: Response, result):
+    """Per-venue fan-out state (ok/stale/timeout/error) for list endpoints"""
+    response.headers["X-Exchange-Status"] = ", ".join(
+        f"{name}={state}" for name, state in result.states().items()
+    )
+
+
+def _snapshot_status_header(response: Response, snapshot, kind: str):
+    """Per-venue fan-out state recorded by the metrics aggregator"""
+    response.headers["X-Exchange-Status"] = ", ".join(
+        f"{name}={states.get(kind)}" for name, states in snapshot.venues.items()
+    )
+
+
 @app.get("/api/v1/positions")
-async def get_positions(db: Session = Depends(get_db)):
-    """Get all open positions"""
+async def get_positions(response: Response, source: str = Query("live", regex="^(live|snapshot)$")):
+    """
+    Get all open positions (venues past their deadline serve their last known positions)
+    
+    source=snapshot serves the metrics aggregator's last snapshot instead of querying the venues.
+    """
     if not multi_exchange_manager:
         raise HTTPException(status_code=503, detail="System not initialized")
     
-    all_positions = []
+    if source == "snapshot" and metrics_aggregator:
+        snapshot = await metrics_aggregator.get_snapshot()
+        _snapshot_status_header(response, snapshot, "positions")
+        return list(snapshot.positions)
     
-    for exchange_name, exchange in multi_exchange_manager.get_all_exchanges().items():
-        try:
-            positions = await exchange.fetch_positions()
-            
-            for pos in positions:
-                contracts = pos.get('contracts', 0)
-                if contracts == 0:
-                    continue
-                
-                all_positions.append({
-                    "symbol": pos.get('symbol'),
-                    "side": 'long' if pos.get('side') == 'long' else 'short',
-                    "size": abs(contracts),
-                    "entryPrice": pos.get('entryPrice', 0),
-                    "markPrice": pos.get('markPrice', 0),
-                    "liquidationPrice": pos.get('liquidationPrice'),
-                    "leverage": pos.get('leverage', 1),
-                    "pnl": pos.get('realizedPnl', 0),
-                    "unrealizedPnl": pos.get('unrealizedPnl', 0),
-                    "exchange": exchange_name,
-                    "timestamp": datetime.now().isoformat()
-                })
-        except Exception as e:
-            logger.error(f"Error fetching positions from {exchange_name}: {e}")
+    result = await multi_exchange_manager.fan_out(
+        "positions", lambda name, exchange: exchange.fetch_positions()
+    )
+    _exchange_status_header(response, result)
+    
+    all_positions = []
+    for exchange_name, positions in result.values.items():
+        for pos in positions or []:
+            formatted = format_position(exchange_name, pos)
+            if formatted:
+                all_positions.append(formatted)
     
     return all_positions
 
 
 @app.post("/api/v1/positions/{symbol}/close")
-async def close_position(symbol: str, db: Session = Depends(get_db)):
+async def close_position(symbol: str, db: AsyncSession = Depends(get_async_db)):
     """Close a specific position"""
     if not multi_exchange_manager:
         raise HTTPException(status_code=503, detail="System not initialized")
@@ -405,37 +652,35 @@ async def close_position(symbol: str, db: Session = Depends(get_db)):
 # ============================================================================
 
 @app.get("/api/v1/orders")
-async def get_orders():
-    """Get all open orders"""
+async def get_orders(response: Response, source: str = Query("live", regex="^(live|snapshot)$")):
+    """
+    Get all open orders (venues past their deadline serve their last known orders)
+    
+    source=snapshot serves the metrics aggregator's last snapshot instead of querying the venues.
+    """
     if not multi_exchange_manager:
         raise HTTPException(status_code=503, detail="System not initialized")
     
-    all_orders = []
+    if source == "snapshot" and metrics_aggregator:
+        snapshot = await metrics_aggregator.get_snapshot()
+        _snapshot_status_header(response, snapshot, "orders")
+        return list(snapshot.orders)
     
-    for exchange_name, exchange in multi_exchange_manager.get_all_exchanges().items():
-        try:
-            orders = await exchange.fetch_open_orders()
-            
-            for order in orders:
-                all_orders.append({
-                    "id": order.id,
-                    "symbol": order.symbol,
-                    "side": order.side.value,
-                    "type": order.type.value,
-                    "amount": order.amount,
-                    "price": order.price,
-                    "status": order.status,
-                    "timestamp": order.timestamp,
-                    "exchange": exchange_name
-                })
-        except Exception as e:
-            logger.error(f"Error fetching orders from {exchange_name}: {e}")
+    result = await multi_exchange_manager.fan_out(
+        "orders", lambda name, exchange: exchange.fetch_open_orders()
+    )
+    _exchange_status_header(response, result)
+    
+    all_orders = []
+    for exchange_name, orders in result.values.items():
+        for order in orders or []:
+            all_orders.append(format_order(exchange_name, order))
     
     return all_orders
 
 
 @app.post("/api/v1/orders/create")
-async def create_order(request: OrderCreateRequest, db: Session = Depends(get_db)):
+async def create_order(request: OrderCreateRequest, db: AsyncSession = Depends(get_async_db)):
     """Create a new order"""
     if not multi_exchange_manager:
         raise HTTPException(status_code=503, detail="System not initialized")
@@ -445,32 +690,51 @@ async def create_order(request: OrderCreateRequest, db: Session = Depends(get_db
         if not exchange:
             raise HTTPException(status_code=404, detail=f"No exchange supports {request.symbol}")
         
+        if multi_exchange_manager.circuit_breaker_manager.is_open("drawdown"):
+            raise CircuitBreakerOpenError("Drawdown breaker open, new orders blocked")
+        
+        if _is_quoting_paused(exchange.exchange_name, request.symbol):
+            raise CircuitBreakerOpenError(
+                f"Quoting paused for {request.symbol} on {exchange.exchange_name} (spread/depth breaker open)"
+            )
+        
         from exchanges.exchange_factory import OrderType, OrderSide
         
         order_type = OrderType.LIMIT if request.type == "limit" else OrderType.MARKET
         order_side = OrderSide.BUY if request.side == "buy" else OrderSide.SELL
         
+        amount = request.amount
+        if amount is None:
+            size = multi_exchange_manager.sizing_engine.get_size(
+                request.symbol, exchange.exchange_name, request.level
+            )
+            if not size:
+                raise InvalidOrderError(
+                    f"No sizing available for {request.symbol} on {exchange.exchange_name} (level {request.level})"
+                )
+            amount = size["amount"]
+        
         order = await exchange.create_order(
             symbol=request.symbol,
             type=order_type,
             side=order_side,
-            amount=request.amount,
+            amount=amount,
             price=request.price
         )
         
         # Save to database
-        trade = Trade(
+        await _persist_row(
+            db, Trade,
             order_id=order.id,
             exchange=exchange.exchange_name,
             symbol=request.symbol,
             side=request.side,
             type=request.type,
-            amount=request.amount,
+            amount=amount,
             price=request.price or 0,
-            status="open"
+            status="open",
+            timestamp=datetime.utcnow()
         )
-        db.add(trade)
-        db.commit()
         
         logger.info(f"Order created: {order.id}")
         
@@ -480,7 +744,7 @@ async def create_order(request: OrderCreateRequest, db: Session = Depends(get_db
             "symbol": request.symbol,
             "side": request.side,
             "type": request.type,
-            "amount": request.amount,
+            "amount": amount,
             "price": request.price
         }
         
@@ -488,11 +752,22 @@ async def create_order(request: OrderCreateRequest, db: Session = Depends(get_db
         raise HTTPException(status_code=400, detail=str(e))
     except InsufficientBalanceError as e:
         raise HTTPException(status_code=402, detail=str(e))
+    except CircuitBreakerOpenError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         logger.error(f"Error creating order: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/v1/sizing")
+async def get_sizing():
+    """Get current order sizes per symbol, exchange and ladder level"""
+    if not multi_exchange_manager:
+        raise HTTPException(status_code=503, detail="System not initialized")
+    
+    return multi_exchange_manager.sizing_engine.compute().to_dict()
+
+
 @app.post("/api/v1/orders/{order_id}/cancel")
 async def cancel_order(order_id: str, symbol: str):
     """Cancel an order"""
@@ -524,63 +799,55 @@ async def cancel_order(order_id: str, symbol: str):
 # ============================================================================
 
 @app.get("/api/v1/metrics")
-async def get_metrics(db: Session = Depends(get_db)):
-    """Get system metrics"""
-    if not multi_exchange_manager:
+async def get_metrics():
+    """Get system metrics (latest aggregated snapshot)"""
+    if not multi_exchange_manager or not metrics_aggregator:
         raise HTTPException(status_code=503, detail="System not initialized")
     
     try:
-        # Get positions and calculate PnL
-        positions = await get_positions(db)
-        orders = await get_orders()
-        
-        total_equity = 0
-        total_pnl = 0
-        unrealized_pnl = 0
-        
-        for pos in positions:
-            unrealized_pnl += pos['unrealizedPnl']
-            total_pnl += pos['pnl']
-        
-        # Get balance from exchanges
-        for exchange_name, exchange in multi_exchange_manager.get_all_exchanges().items():
-            try:
-                balance = await exchange.fetch_balance()
-                total_equity += balance.get('total', {}).get('USDT', 0)
-            except:
-                pass
-        
-        health = multi_exchange_manager.get_exchange_health()
-        healthy_count = len([h for h in health.values() if h.connected])
-        
-        open_circuits = multi_exchange_manager.circuit_breaker_manager.get_open_count()
-        
-        metrics = {
-            "equity": total_equity,
-            "totalPnl": total_pnl,
-            "dailyPnl": unrealized_pnl,
-            "totalFees": 0,  # TODO: Track fees
-            "openOrders": len(orders),
-            "openPositions": len(positions),
-            "healthyExchanges": healthy_count,
-            "totalExchanges": len(multi_exchange_manager.exchanges),
-            "openCircuits": open_circuits,
-            "riskMode": app_config.get("market_maker_v4_2", {}).get("risk_mode", "conservative"),
-            "timestamp": datetime.now().isoformat()
-        }
-        
-        # Save to database
-        metric_record = SystemMetric(**metrics)
-        db.add(metric_record)
-        db.commit()
-        
-        return metrics
+        snapshot = await metrics_aggregator.get_snapshot()
+        return snapshot.payload
         
     except Exception as e:
         logger.error(f"Error getting metrics: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# ============================================================================
+# PUSH API
+# ============================================================================
+
+@app.websocket("/api/v1/ws")
+async def push_socket(websocket: WebSocket):
+    """
+    Push API: subscribe to ticker, book, orders, positions, metrics or breakers.
+    
+    Each topic starts with a full snapshot, then sends deltas against the last
+    version this client received, at most max_rate times per second (latest value wins).
+    """
+    await websocket.accept()
+    if not push_hub:
+        await websocket.close(code=1013)
+        return
+    
+    subscriber = push_hub.connect(websocket.send_text)
+    sender = asyncio.create_task(subscriber.run())
+    try:
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+            except ValueError:
+                message = None
+            await subscriber.send(json.dumps(push_hub.handle(subscriber, message), default=str))
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"Push socket error: {e}")
+    finally:
+        sender.cancel()
+        push_hub.disconnect(subscriber)
+
+
 # ============================================================================
 # SYSTEM STATUS ENDPOINTS
 # ============================================================================
@@ -595,22 +862,65 @@ async def get_system_status():
     circuit_breakers = multi_exchange_manager.circuit_breaker_manager.get_status()
     alert_stats = multi_exchange_manager.alert_manager.get_stats()
     
-    return {
+    exchanges = {
+        name: {
+            "connected": h.connected,
+            "latency_ms": h.latency_ms,
+            "success_rate": h.success_rate,
+            "error_count": h.error_count,
+            "last_ping": h.last_ping
+        }
+        for name, h in health.items()
+    }
+    
+    status = {
         "connected": multi_exchange_manager.is_system_healthy(),
         "timestamp": datetime.now().isoformat(),
-        "exchanges": {
-            name: {
-                "connected": h.connected,
-                "latency_ms": h.latency_ms,
-                "success_rate": h.success_rate,
-                "error_count": h.error_count,
-                "last_ping": h.last_ping
-            }
-            for name, h in health.items()
-        },
+        "exchanges": exchanges,
         "circuit_breakers": circuit_breakers,
         "alerts": alert_stats
     }
+    
+    if breaker_event_writer:
+        status["breaker_event_writer"] = breaker_event_writer.get_stats()
+    if equity_curve_writer:
+        status["equity_curve_writer"] = equity_curve_writer.get_stats()
+    if row_writer:
+        status["write_behind"] = row_writer.get_stats()
+    if rollup_manager:
+        status["rollups"] = rollup_manager.get_status()
+    if fill_sync:
+        status["fill_sync"] = fill_sync.get_status()
+    if balance_snapshotter:
+        status["balance_snapshots"] = balance_snapshotter.get_status()
+    if metrics_aggregator:
+        status["metrics_aggregator"] = metrics_aggregator.get_status()
+    if push_hub:
+        status["push"] = push_hub.get_status()
+    if response_encoder:
+        status["responses"] = response_encoder.get_status()
+    if market_catalog:
+        status["market_catalog"] = market_catalog.get_status()
+    if api_hub:
+        status["api_hub"] = api_hub.get_status()
+    
+    if shard_supervisor:
+        snapshot = shard_supervisor.get_snapshot()
+        for name, h in snapshot["exchanges"].items():
+            exchanges[name] = {key: h[key] for key in ("connected", "latency_ms", "success_rate", "error_count", "last_ping")}
+        status["circuit_breakers"] = {"api": circuit_breakers, "shards": snapshot["circuit_breakers"]}
+        status["shards"] = shard_supervisor.get_status()
+    
+    return status
+
+
+@app.get("/api/v1/system/shards")
+async def get_shards():
+    """Get sharded runtime status"""
+    if not shard_supervisor:
+        return {"enabled": False}
+    
+    return {"enabled": True, **shard_supervisor.get_status(), "risk_state": shard_supervisor.risk_state()}
 
 
 @app.put("/api/v1/risk/mode")
@@ -623,6 +933,10 @@ async def update_risk_mode(request: RiskModeUpdate):
     # Update in config
     app_config["market_maker_v4_2"]["risk_mode"] = request.mode
     
+    # Propagate to shard workers
+    if shard_supervisor:
+        shard_supervisor.broadcast_risk_state()
+    
     logger.info(f"Risk mode updated to: {request.mode}")
     
     return {
@@ -732,36 +1046,88 @@ async def kucoin_test_proxy(request: KuCoinTestRequest):
 
 
 # ============================================================================
-# HISTORY ENDPOINTS
+# MARKET CATALOG ENDPOINTS
 # ============================================================================
 
+async def _catalog_page(request: Request, exchange_name: str, endpoint: str, shape, limit: int,
+                        cursor: Optional[str], fields: Optional[str] = None, **filters) -> Response:
+    """Query the market catalog and serve the page through the pre-serialized ETag cache"""
+    if not market_catalog:
+        raise HTTPException(status_code=503, detail="System not initialized")
+    
+    catalog = market_catalog.get(exchange_name)
+    if catalog is None:
+        raise HTTPException(status_code=404, detail=f"No markets loaded for {exchange_name}")
+    
+    projection = [field.strip() for field in fields.split(",") if field.strip()] if fields else None
+    try:
+        rows, total, next_cursor = catalog.query(
+            fields=projection, limit=market_catalog.clamp_limit(limit), cursor=cursor, **filters
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    async def build():
+        return shape(catalog, rows, total, next_cursor)
+    
+    # The catalog version is part of the key: a refresh with changes never serves old bytes
+    key = (endpoint, exchange_name, catalog.version, str(request.query_params))
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return await response_encoder.cached(request, key, build, ttl=market_catalog.refresh_interval, headers=headers)
+
+
+@app.get("/api/v1/markets/{exchange_name}")
+async def get_markets(
+    request: Request,
+    exchange_name: str,
+    quote: Optional[str] = None,
+    base: Optional[str] = None,
+    type: Optional[str] = None,
+    active: Optional[bool] = None,
+    q: Optional[str] = None,
+    fields: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None
+):
+    """Query any connected exchange's market catalog; pass X-Next-Cursor back as ?cursor="""
+    def shape(catalog, rows, total, next_cursor):
+        return {
+            "exchange": exchange_name,
+            "version": catalog.version,
+            "total": total,
+            "markets": rows,
+            "next_cursor": next_cursor
+        }
+    
+    return await _catalog_page(request, exchange_name, "markets", shape, limit, cursor, fields=fields,
+                               quote=quote, base=base, market_type=type, active=active, prefix=q)
+
+
 # ============================================================================
 # KUCOIN INFORMATION ENDPOINTS
 # ============================================================================
 
 @app.get("/api/v1/kucoin/symbols")
-async def get_kucoin_symbols():
-    """Get all available symbols from KuCoin"""
-    try:
-        if not multi_exchange_manager:
-            raise HTTPException(status_code=503, detail="System not initialized")
-
-        # Get KuCoin exchange from manager
-        exchange = multi_exchange_manager.exchanges.get("kucoin")
-
-        markets = await exchange.fetch_markets()
-        usdt_symbols = [m for m in markets if m.get('quote') == 'USDT' and m.get('active')]
-
+async def get_kucoin_symbols(
+    request: Request,
+    q: Optional[str] = None,
+    fields: Optional[str] = None,
+    limit: int = 50,
+    cursor: Optional[str] = None
+):
+    """Get active USDT symbols from KuCoin's market catalog; pass X-Next-Cursor back as ?cursor="""
+    def shape(catalog, rows, total, next_cursor):
         return {
             "success": True,
             "exchange": "kucoin",
-            "total_symbols": len(usdt_symbols),
-            "symbols": usdt_symbols[:50],  # Limit to first 50 for performance
+            "total_symbols": total,
+            "symbols": rows,
+            "next_cursor": next_cursor,
             "timestamp": datetime.utcnow().isoformat()
         }
-    except Exception as e:
-        logger.error(f"Error getting KuCoin symbols: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+    
+    return await _catalog_page(request, "kucoin", "kucoin_symbols", shape, limit, cursor,
+                               fields=fields, quote="USDT", active=True, prefix=q)
 
 @app.get("/api/v1/kucoin/ticker/{symbol}")
 async def get_kucoin_ticker(symbol: str):
@@ -879,95 +1245,85 @@ async def get_kucoin_orderbook(symbol: str, limit: int = 20):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/v1/kucoin/status")
-async def get_kucoin_status():
-    """Get KuCoin exchange status and information"""
+async def get_kucoin_status(request: Request):
+    """Get KuCoin exchange status and information (ETag / 304, reused for reference_ttl seconds)"""
     try:
         if not multi_exchange_manager:
             raise HTTPException(status_code=503, detail="System not initialized")
 
-        # Get KuCoin exchange from manager
-        exchange = multi_exchange_manager.exchanges.get("kucoin")
-        if not exchange:
-            logger.warning("KuCoin exchange not found in manager, creating temporary exchange")
-            # Create temporary exchange for this request
-            full_config = {
-                "api_key": app_secrets["exchanges"]["kucoin"]["api_key"],
-                "api_secret": app_secrets["exchanges"]["kucoin"]["api_secret"],
-                "passphrase": app_secrets["exchanges"]["kucoin"]["passphrase"],
-                "api_timeout": 30,
-                "rate_limit": 600,
-                "default_type": "future",
-                "hedge_mode": False,
-                "testnet": False
+        async def build():
+            # Get KuCoin exchange from manager
+            exchange = multi_exchange_manager.exchanges.get("kucoin")
+            if not exchange:
+                logger.warning("KuCoin exchange not found in manager, creating temporary exchange")
+                # Create temporary exchange for this request
+                full_config = {
+                    "api_key": app_secrets["exchanges"]["kucoin"]["api_key"],
+                    "api_secret": app_secrets["exchanges"]["kucoin"]["api_secret"],
+                    "passphrase": app_secrets["exchanges"]["kucoin"]["passphrase"],
+                    "api_timeout": 30,
+                    "rate_limit": 600,
+                    "default_type": "future",
+                    "hedge_mode": False,
+                    "testnet": False
+                }
+                exchange = ExchangeFactory.create_exchange("kucoin", full_config)
+                await exchange.connect()
+
+            # Get basic exchange info
+            exchange_info = {
+                "id": exchange.exchange.id,
+                "name": exchange.exchange.name,
+                "countries": exchange.exchange.countries,
+                "rateLimit": exchange.exchange.rateLimit,
+                "has": exchange.exchange.has,
+                "timeframes": list(exchange.exchange.timeframes.keys()) if hasattr(exchange.exchange, 'timeframes') else [],
+                "urls": exchange.exchange.urls
             }
-            exchange = ExchangeFactory.create_exchange("kucoin", full_config)
-            await exchange.connect()
 
-        # Get basic exchange info
-        exchange_info = {
-            "id": exchange.exchange.id,
-            "name": exchange.exchange.name,
-            "countries": exchange.exchange.countries,
-            "rateLimit": exchange.exchange.rateLimit,
-            "has": exchange.exchange.has,
-            "timeframes": list(exchange.exchange.timeframes.keys()) if hasattr(exchange.exchange, 'timeframes') else [],
-            "urls": exchange.exchange.urls
-        }
+            return {
+                "success": True,
+                "exchange": "kucoin",
+                "status": "connected",
+                "exchange_info": exchange_info,
+                "timestamp": datetime.utcnow().isoformat()
+            }
 
-        return {
-            "success": True,
-            "exchange": "kucoin",
-            "status": "connected",
-            "exchange_info": exchange_info,
-            "timestamp": datetime.utcnow().isoformat()
-        }
+        return await response_encoder.cached(request, "kucoin_status", build)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting KuCoin status: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/v1/kucoin/markets")
-async def get_kucoin_markets(limit: int = 100):
-    """Get all available markets from KuCoin"""
-    try:
-        if not multi_exchange_manager:
-            raise HTTPException(status_code=503, detail="System not initialized")
-
-        # Get KuCoin exchange from manager
-        exchange = multi_exchange_manager.exchanges.get("kucoin")
-        if not exchange:
-            logger.warning("KuCoin exchange not found in manager, creating temporary exchange")
-            # Create temporary exchange for this request
-            full_config = {
-                "api_key": app_secrets["exchanges"]["kucoin"]["api_key"],
-                "api_secret": app_secrets["exchanges"]["kucoin"]["api_secret"],
-                "passphrase": app_secrets["exchanges"]["kucoin"]["passphrase"],
-                "api_timeout": 30,
-                "rate_limit": 600,
-                "default_type": "future",
-                "hedge_mode": False,
-                "testnet": False
-            }
-            exchange = ExchangeFactory.create_exchange("kucoin", full_config)
-            await exchange.connect()
-
-        markets = await exchange.fetch_markets()
-
-        # Filter and organize markets
-        spot_markets = [m for m in markets if m.get('spot') and m.get('active')]
-        futures_markets = [m for m in markets if m.get('future') and m.get('active')]
-
+async def get_kucoin_markets(
+    request: Request,
+    quote: Optional[str] = None,
+    base: Optional[str] = None,
+    type: Optional[str] = None,
+    active: Optional[bool] = None,
+    q: Optional[str] = None,
+    fields: Optional[str] = None,
+    limit: int = 100,
+    cursor: Optional[str] = None
+):
+    """Get KuCoin markets from the catalog (filters, prefix search, projection, cursor paging)"""
+    def shape(catalog, rows, total, next_cursor):
         return {
             "success": True,
             "exchange": "kucoin",
-            "total_markets": len(markets),
-            "spot_markets": len(spot_markets),
-            "futures_markets": len(futures_markets),
-            "markets": markets[:limit],  # Limit for performance
+            "total_markets": len(catalog),
+            "spot_markets": catalog.count(market_type="spot", active=True),
+            "futures_markets": catalog.count(market_type="future", active=True),
+            "matching_markets": total,
+            "markets": rows,
+            "next_cursor": next_cursor,
             "timestamp": datetime.utcnow().isoformat()
         }
-    except Exception as e:
-        logger.error(f"Error getting KuCoin markets: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+    
+    return await _catalog_page(request, "kucoin", "kucoin_markets", shape, limit, cursor, fields=fields,
+                               quote=quote, base=base, market_type=type, active=active, prefix=q)
 
 @app.get("/api/v1/kucoin/ohlcv/{symbol}")
 async def get_kucoin_ohlcv(symbol: str, timeframe: str = "1m", limit: int = 100):
@@ -1025,17 +1381,23 @@ async def get_kucoin_funding_rates(symbol: str):
         if not multi_exchange_manager:
             raise HTTPException(status_code=503, detail="System not initialized")
 
-        # Get KuCoin exchange from manager
-        exchange = multi_exchange_manager.exchanges.get("kucoin")
+        # Served from the funding monitor cache (refreshed in background)
+        funding_monitor = multi_exchange_manager.funding_monitor
+        funding_rates = funding_monitor.get_history("kucoin", symbol, limit=100)
+        source = "cache"
 
-        # Get funding rate history
-        funding_rates = await exchange.fetch_funding_rate_history(symbol, limit=100)
+        if not funding_rates:
+            exchange = multi_exchange_manager.exchanges.get("kucoin")
+            funding_rates = await exchange.fetch_funding_rate_history(symbol, limit=100)
+            source = "exchange"
 
         return {
             "success": True,
             "exchange": "kucoin",
             "symbol": symbol,
             "funding_rates": funding_rates,
+            "latest": funding_monitor.get_latest("kucoin", symbol),
+            "source": source,
             "timestamp": datetime.utcnow().isoformat()
         }
     except Exception as e:
@@ -1046,75 +1408,159 @@ async def get_kucoin_funding_rates(symbol: str):
 # HISTORY ENDPOINTS
 # ============================================================================
 
+TRADE_HISTORY_COLUMNS = (
+    "id", "order_id", "exchange", "symbol", "side", "type", "amount",
+    "price", "filled", "fee", "pnl", "status", "timestamp"
+)
+
+BREAKER_HISTORY_COLUMNS = (
+    "id", "timestamp", "exchange", "symbol", "breaker_type", "trigger_value",
+    "threshold", "duration_seconds", "is_resolved", "resolved_at"
+)
+
+# Largest page a history endpoint will return
+HISTORY_MAX_LIMIT = 1000
+
+
+def _isoformat_rows(rows: List[Dict[str, Any]], *columns: str) -> List[Dict[str, Any]]:
+    for row in rows:
+        for column in columns:
+            if row[column] is not None:
+                row[column] = row[column].isoformat()
+    return rows
+
+
 @app.get("/api/v1/history/trades")
 async def get_trade_history(
-    limit: int = 100,
+    request: Request,
+    limit: int = Query(100, ge=1, le=HISTORY_MAX_LIMIT),
     exchange: Optional[str] = None,
     symbol: Optional[str] = None,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get trade history"""
-    query = db.query(Trade).order_by(Trade.timestamp.desc())
-    
-    if exchange:
-        query = query.filter(Trade.exchange == exchange)
-    if symbol:
-        query = query.filter(Trade.symbol == symbol)
-    
-    trades = query.limit(limit).all()
-    
-    return [
-        {
-            "id": t.id,
-            "order_id": t.order_id,
-            "exchange": t.exchange,
-            "symbol": t.symbol,
-            "side": t.side,
-            "type": t.type,
-            "amount": t.amount,
-            "price": t.price,
-            "filled": t.filled,
-            "fee": t.fee,
-            "pnl": t.pnl,
-            "status": t.status,
-            "timestamp": t.timestamp.isoformat() if t.timestamp else None
-        }
-        for t in trades
-    ]
+    """Get trade history, newest first; pass X-Next-Cursor back as ?cursor= for the next page"""
+    try:
+        rows, next_cursor = await keyset_page(
+            db, Trade, TRADE_HISTORY_COLUMNS, limit, cursor, exchange=exchange, symbol=symbol
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return response_encoder.render(request, rows, headers=headers)
+
+
+@app.get("/api/v1/history/trades/export")
+async def export_trade_history(
+    format: str = "ndjson",
+    gzip: bool = False,
+    exchange: Optional[str] = None,
+    symbol: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None
+):
+    """Stream the full trade history (oldest first) as NDJSON or CSV, optionally gzipped"""
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {format}")
+    
+    async def body():
+        # Own session: it must outlive the handler while the response streams
+        async with AsyncSessionLocal() as db:
+            rows = stream_rows(
+                db, Trade, TRADE_HISTORY_COLUMNS, since, until, exchange=exchange, symbol=symbol
+            )
+            async for chunk in encode_rows(rows, TRADE_HISTORY_COLUMNS, format, gzip):
+                yield chunk
+    
+    filename = f"trades.{format}" + (".gz" if gzip else "")
+    return StreamingResponse(
+        body(),
+        media_type="application/gzip" if gzip else EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@app.get("/api/v1/history/series")
+async def get_series_history(
+    source: str,
+    metric: str,
+    start: datetime,
+    end: Optional[datetime] = None,
+    step: str = "1m",
+    series: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get min/max/avg/last buckets for a metric from the coarsest rollup that fits the step"""
+    if not rollup_manager:
+        raise HTTPException(status_code=503, detail="System not initialized")
+    
+    step_seconds = RESOLUTIONS.get(step)
+    if step_seconds is None:
+        try:
+            step_seconds = int(step)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid step: {step}")
+    
+    try:
+        return await rollup_manager.query_range(
+            db, source, metric, start, end or datetime.utcnow(), step_seconds, series
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @app.get("/api/v1/history/circuit-breakers")
 async def get_circuit_breaker_history(
-    limit: int = 50,
+    response: Response,
+    limit: int = Query(50, ge=1, le=HISTORY_MAX_LIMIT),
     breaker_type: Optional[str] = None,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get circuit breaker event history"""
-    query = db.query(CircuitBreakerEvent).order_by(CircuitBreakerEvent.timestamp.desc())
-    
-    if breaker_type:
-        query = query.filter(CircuitBreakerEvent.breaker_type == breaker_type)
-    
-    events = query.limit(limit).all()
-    
-    return [
-        {
-            "id": e.id,
-            "timestamp": e.timestamp.isoformat() if e.timestamp else None,
-            "exchange": e.exchange,
-            "breaker_type": e.breaker_type,
-            "trigger_value": e.trigger_value,
-            "threshold": e.threshold,
-            "duration_seconds": e.duration_seconds,
-            "is_resolved": e.is_resolved,
-            "resolved_at": e.resolved_at.isoformat() if e.resolved_at else None
-        }
-        for e in events
-    ]
+    """Get circuit breaker event history, newest first; paged with X-Next-Cursor"""
+    try:
+        rows, next_cursor = await keyset_page(
+            db, CircuitBreakerEvent, BREAKER_HISTORY_COLUMNS, limit, cursor, breaker_type=breaker_type
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    
+    return _isoformat_rows(rows, "timestamp", "resolved_at")
 
 
 if __name__ == "__main__":
     import uvicorn
-    logger.info("Starting MarketMaker Pro API Server...")
-    uvicorn.run(app, host="0.0.0.0", port=8000, log_level="info")
+    api_config = app_config.get("market_maker_v4_2", {}).get("api", {})
+    host = api_config.get("host", "0.0.0.0")
+    port = api_config.get("port", 8000)
+    workers = api_config.get("workers", 1)
+    
+    if workers <= 1:
+        logger.info("Starting MarketMaker Pro API Server...")
+        uvicorn.run(app, host=host, port=port, log_level="info")
+    else:
+        import secrets
+        import subprocess
+        import sys
+        
+        # Shared key for the hub socket, inherited by the worker processes
+        os.environ.setdefault("MARKETMAKER_HUB_AUTHKEY", secrets.token_hex(32))
+        # Workers import only core.api_worker (no ccxt, no database)
+        workers_process = subprocess.Popen([
+            sys.executable, "-m", "uvicorn", "core.api_worker:app",
+            "--host", str(host), "--port", str(port), "--workers", str(workers)
+        ])
+        
+        # This process is the hub: exchanges, background loops, database and the WebSocket API
+        hub_port = api_config.get("hub_port", 8001)
+        logger.info(f"Starting MarketMaker Pro hub on port {hub_port} with {workers} API workers on port {port}...")
+        try:
+            uvicorn.run(app, host=api_config.get("hub_host", "127.0.0.1"), port=hub_port, log_level="info")
+        finally:
+            workers_process.terminate()
+            workers_process.wait(10)
 